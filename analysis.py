@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# Batch analysis of many positions, e.g. for puzzle mining or game annotation.
+# Run "python3 analysis.py positions.txt --depth 4" with one FEN per line ("-" reads stdin)
+# and every result is written as a JSON line as soon as it is ready.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Iterable, Iterator, Any
+from board import ChessBoard
+from evaluate import ChessEngine, MAX_DEPTH
+from timecontrol import TimeManager
+from tablebase import SyzygyTablebase
+from searchcache import SearchCache, SEARCH_CACHE_PATH, DEFAULT_MAX_ENTRIES
+from uci import to_uci_move
+
+JOBS_PER_WORKER = 4  # Positions queued per worker, so workers never wait while the input is read lazily
+
+worker_engine: Optional[ChessEngine] = None  # Engine of a worker process, kept between positions
+
+
+def init_worker(hash_size_mb: int, use_book: bool, syzygy_path: Optional[str] = None,
+                cache_path: Optional[str] = None, cache_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+    """Create the engine of a worker process. Its book handle, transposition table, tablebase
+    and search cache are reused by all its positions."""
+    global worker_engine
+    worker_engine = ChessEngine(hash_size_mb=hash_size_mb)
+    worker_engine.polyFlag = use_book
+    worker_engine.set_tablebase_path(syzygy_path)
+    worker_engine.set_search_cache(cache_path, cache_entries)
+
+
+def analyse_position(index: int, fen: str, depth: Optional[int], movetime: Optional[float], use_book: bool) -> Dict[str, Any]:
+    """Search a single position on a worker process and return its result."""
+    engine: ChessEngine = worker_engine
+    board = ChessBoard()
+    try:
+        board.from_fen(fen)
+    except (ValueError, IndexError, KeyError, AttributeError) as error:
+        return {"index": index, "fen": fen, "error": f"invalid FEN: {error}"}
+    position_error: Optional[str] = board.position_error()
+    if position_error:
+        return {"index": index, "fen": fen, "error": f"illegal position: {position_error}"}
+    board.record_position()
+
+    engine.polyFlag = use_book
+    time_manager: Optional[TimeManager] = TimeManager(movetime=movetime) if movetime else None
+    start_time = time.perf_counter()
+    try:
+        move: Optional[str] = engine.find_best_move(board, depth or MAX_DEPTH, time_manager)
+    except Exception as error:
+        # A failure of one position must not abort the batch and lose the results of the others
+        engine.transposition_table.clear()
+        return {"index": index, "fen": fen, "error": f"search failed: {type(error).__name__}: {error}"}
+    elapsed_time = time.perf_counter() - start_time
+
+    result: Dict[str, Any] = {"index": index, "fen": fen, "bestmove": to_uci_move(move)}
+    if engine.polyFlag and move:
+        result["book"] = True  # The move comes from the opening book, there is no score
+    elif engine.last_iteration:
+        completed_depth, score, best_move = engine.last_iteration
+        result["depth"] = completed_depth
+        result["score_cp"] = engine.centipawns(score)
+        if engine.mate_in(score) is not None:
+            result["mate"] = engine.mate_in(score)  # Moves to a forced mate, negative if the side to move is mated
+        result["pv"] = engine.principal_variation(board, best_move, completed_depth)
+        result["nodes"] = engine.nodes
+    result["time"] = round(elapsed_time, 3)
+    return result
+
+
+def analyse_many(fens: Iterable[str], depth: Optional[int] = None, movetime: Optional[float] = None,
+                 workers: Optional[int] = None, hash_size_mb: int = 16, use_book: bool = False,
+                 syzygy_path: Optional[str] = None, cache_path: Optional[str] = None,
+                 cache_entries: int = DEFAULT_MAX_ENTRIES) -> Iterator[Dict[str, Any]]:
+    """Analyse the positions concurrently on a pool of worker processes and yield a result
+    for each one as soon as it is ready (not in input order, every result has the "index" of its FEN).
+    depth: depth of every search, movetime: seconds per position (at least one of them must be given).
+    syzygy_path: directory of Syzygy tablebase files probed by the searches (needs python-chess).
+    cache_path: SQLite file of the persistent search cache, positions already searched at least as deep by an
+    earlier run aren't searched again (only with a depth, a movetime search fills the cache but never reads
+    a result from it), cache_entries: number of results it keeps.
+    The input is read lazily, so it can be a file or a generator of any length."""
+    if depth is None and movetime is None:
+        raise ValueError("analyse_many needs a depth or a movetime.")
+    workers = workers or os.cpu_count() or 1
+    if syzygy_path:
+        SyzygyTablebase(syzygy_path).close()  # Fail here rather than in every worker if the tables can't be opened
+    if cache_path:
+        SearchCache(cache_path, cache_entries).close()  # Same for the cache, and its table exists before the workers start
+
+    # Spawned workers don't inherit the locks of the caller's threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                             initargs=(hash_size_mb, use_book, syzygy_path, cache_path, cache_entries)) as pool:
+        pending: set[Future] = set()
+        for index, fen in enumerate(fens):
+            pending.add(pool.submit(analyse_position, index, fen.strip(), depth, movetime, use_book))
+            if len(pending) >= workers * JOBS_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def read_fens(path: str) -> Iterator[str]:
+    """Yield the non-empty lines of a file ("-" for stdin), skipping comments that start with "#"."""
+    stream = sys.stdin if path == "-" else open(path)
+    try:
+        for line in stream:
+            if line.strip() and not line.startswith("#"):
+                yield line.strip()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse many positions and write the results as JSON lines.")
+    parser.add_argument("input", help="file with one FEN per line, - for stdin")
+    parser.add_argument("--depth", type=int, help="search depth of every position")
+    parser.add_argument("--movetime", type=float, help="seconds per position")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of cores)")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size of every worker in MB (default: 16)")
+    parser.add_argument("--book", action="store_true", help="play book moves when the position is in the opening book")
+    parser.add_argument("--syzygy", default=None, help="directory of Syzygy tablebase files (needs python-chess)")
+    parser.add_argument("--cache", nargs="?", const=SEARCH_CACHE_PATH, default=None,
+                        help=f"reuse the results of earlier --depth runs from a persistent cache file (default: {SEARCH_CACHE_PATH})")
+    parser.add_argument("--cache-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f"results kept in the cache, the least recently used are removed first (default: {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--output", default="-", help="output file, - for stdout (default)")
+
+    args = parser.parse_args()
+    if args.depth is None and args.movetime is None:
+        parser.error("one of --depth and --movetime is required")
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in analyse_many(read_fens(args.input), args.depth, args.movetime, args.workers, args.hash, args.book,
+                                   args.syzygy, args.cache, args.cache_entries):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+# Benchmark suite of the engine. Run "python3 benchmark.py perft" to check the move generator
+# against known node counts and measure its speed in nodes per second, "python3 benchmark.py search"
+# to measure the time the engine needs to reach a depth with one or more threads, or "python3 benchmark.py pgn"
+# to measure how many games per second the PGN reader and writer handle.
+
+import argparse
+import io
+import random
+import sys
+import time
+from typing import Optional, Dict, Tuple, List
+from board import ChessBoard
+from evaluate import ChessEngine
+from pgn import read_games, format_game
+
+
+# Standard perft positions with their known node counts for depths 1, 2, 3, ...
+PERFT_POSITIONS = [
+    ("Start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609]),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("Position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("Position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def run_perft(depth: int, divide: bool = False) -> bool:
+    """Run perft on every standard position up to the given depth, compare the node counts
+    with the known values and print the speed. Returns True if every count is correct."""
+    all_correct = True
+    total_nodes = 0
+    total_time = 0.0
+
+    for name, fen, expected_counts in PERFT_POSITIONS:
+        board = ChessBoard()
+        board.from_fen(fen)
+        position_depth: int = min(depth, len(expected_counts))
+
+        start_time = time.perf_counter()
+        if divide:
+            counts = board.divide(position_depth)
+            nodes = sum(counts.values())
+        else:
+            nodes = board.perft(position_depth)
+        elapsed_time = time.perf_counter() - start_time
+
+        expected: int = expected_counts[position_depth - 1]
+        status = "ok" if nodes == expected else f"FAILED (expected {expected})"
+        all_correct = all_correct and nodes == expected
+        total_nodes += nodes
+        total_time += elapsed_time
+
+        print(f"{name:<15} depth {position_depth}  nodes {nodes:>10}  time {elapsed_time:8.2f}s  nps {nodes / max(elapsed_time, 1e-9):>10.0f}  {status}")
+        if divide:
+            for move, count in sorted(counts.items()):
+                print(f"    {move}: {count}")
+
+    print(f"{'Total':<15}          nodes {total_nodes:>10}  time {total_time:8.2f}s  nps {total_nodes / max(total_time, 1e-9):>10.0f}")
+    return all_correct
+
+
+def run_search(depth: int, thread_counts: List[int], root_split: bool = False,
+               pvs: bool = True, null_move: bool = True, lmr: bool = True) -> None:
+    """Search every standard position to the given depth with each number of threads
+    and print the time to depth, the nodes and the speedup over the first number of threads.
+    root_split: split the root moves over the threads instead of Lazy SMP.
+    pvs, null_move, lmr: switch the search techniques on or off to compare them."""
+    base_time: Optional[float] = None
+
+    for threads in thread_counts:
+        engine = ChessEngine()
+        engine.polyFlag = False
+        engine.set_threads(threads, root_split)
+        engine.pvs_enabled, engine.null_move_enabled, engine.lmr_enabled = pvs, null_move, lmr
+        total_time = 0.0
+        total_nodes = 0
+
+        try:
+            for name, fen, _ in PERFT_POSITIONS:
+                board = ChessBoard()
+                board.from_fen(fen)
+                engine.transposition_table.clear()
+                engine.polyFlag = False
+
+                start_time = time.perf_counter()
+                move = engine.find_best_move(board, depth)
+                elapsed_time = time.perf_counter() - start_time
+                total_time += elapsed_time
+                total_nodes += engine.nodes
+                print(f"threads {threads:>3}  {name:<15} depth {depth}  time {elapsed_time:8.2f}s  nodes {engine.nodes:>9}  move {move}")
+        finally:
+            engine.close()
+
+        if base_time is None:
+            base_time = total_time
+        print(f"threads {threads:>3}  {'Total':<15}          time {total_time:8.2f}s  nodes {total_nodes:>9}  speedup {base_time / max(total_time, 1e-9):.2f}x")
+
+
+def sample_games(count: int, max_plies: int = 80, seed: int = 1) -> List[Tuple[Dict[str, str], List[int]]]:
+    """Play games of random legal moves (the same ones for a seed) and return their headers and moves."""
+    generator = random.Random(seed)
+    games: list[Tuple[Dict[str, str], list[int]]] = []
+    for number in range(count):
+        board = ChessBoard()
+        moves: list[int] = []
+        for _ in range(generator.randint(max_plies // 2, max_plies)):
+            legal_moves = board.generate_moves(board.turn)
+            if not legal_moves:
+                break
+            move: int = generator.choice(legal_moves)
+            board.make_compact_move(move)
+            moves.append(move)
+        games.append(({'Event': "Benchmark", 'Round': str(number + 1)}, moves))
+    return games
+
+
+def run_pgn(path: Optional[str], game_count: int) -> None:
+    """Measure the games per second of the PGN reader on a file, or of the writer and the reader
+    on game_count generated games if there is no file."""
+    if path:
+        stream = open(path, encoding='utf-8', errors='replace')
+    else:
+        sample = sample_games(game_count)
+        start_time = time.perf_counter()
+        texts: list[str] = [format_game(headers, moves) for headers, moves in sample]
+        elapsed_time = time.perf_counter() - start_time
+        print(f"write  games {len(texts):>8}  time {elapsed_time:8.2f}s  games/s {len(texts) / max(elapsed_time, 1e-9):>10.0f}")
+        stream = io.StringIO(''.join(texts))
+
+    games = 0
+    moves_count = 0
+    start_time = time.perf_counter()
+    try:
+        for _, moves in read_games(stream):
+            games += 1
+            moves_count += len(moves)
+    finally:
+        stream.close()
+    elapsed_time = time.perf_counter() - start_time
+    print(f"read   games {games:>8}  time {elapsed_time:8.2f}s  games/s {games / max(elapsed_time, 1e-9):>10.0f}  "
+          f"moves/s {moves_count / max(elapsed_time, 1e-9):>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the chess engine.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    perft_parser = subparsers.add_parser("perft", help="check and time the move generator")
+    perft_parser.add_argument("--depth", type=int, default=3, help="perft depth (default: 3)")
+    perft_parser.add_argument("--divide", action="store_true", help="print the node count below every root move")
+
+    search_parser = subparsers.add_parser("search", help="measure the time to depth of the search")
+    search_parser.add_argument("--depth", type=int, default=3, help="search depth (default: 3)")
+    search_parser.add_argument("--threads", type=lambda value: [int(count) for count in value.split(',')], default=[1],
+                               help="comma-separated numbers of threads to compare (default: 1)")
+    search_parser.add_argument("--root-split", action="store_true", help="split the root moves over the threads instead of Lazy SMP")
+    search_parser.add_argument("--no-pvs", action="store_true", help="search every move with the full window")
+    search_parser.add_argument("--no-null-move", action="store_true", help="disable the null move pruning")
+    search_parser.add_argument("--no-lmr", action="store_true", help="disable the late move reductions")
+
+    pgn_parser = subparsers.add_parser("pgn", help="measure the games per second of the PGN reader and writer")
+    pgn_parser.add_argument("input", nargs="?", default=None, help="PGN file to read (default: generated games)")
+    pgn_parser.add_argument("--games", type=int, default=200, help="number of generated games without a file (default: 200)")
+
+    args = parser.parse_args()
+    if args.command == "perft":
+        if not run_perft(args.depth, args.divide):
+            sys.exit(1)
+    elif args.command == "search":
+        run_search(args.depth, args.threads, args.root_split, not args.no_pvs, not args.no_null_move, not args.no_lmr)
+    elif args.command == "pgn":
+        run_pgn(args.input, args.games)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Contains the bitboard primitives used by the chess board.
+# Squares are indexed like the Polyglot format: 0 for a1, 7 for h1 and 63 for h8 (index = y * 8 + x).
+
+import marshal
+import os
+from typing import Iterator, Tuple, Dict, Optional, List
+
+PIECE_TYPES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+COLORS = ('white', 'black')
+
+FULL_BOARD = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+NOT_FILE_AB = FULL_BOARD ^ (FILE_A | FILE_B)
+NOT_FILE_GH = FULL_BOARD ^ (FILE_G | FILE_H)
+
+# File with the precomputed attack tables, rebuilt when ATTACK_CACHE_VERSION changes
+ATTACK_CACHE_VERSION = 1
+ATTACK_CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                                 'chess-engine', f'attack-tables-{ATTACK_CACHE_VERSION}.marshal')
+
+# (dx, dy) directions of the sliding pieces
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def square_index(position: Tuple[int, int]) -> int:
+    """Convert (x, y) board coordinates to a square index, e.g. (4, 1) -> 12 (e2)."""
+    return position[1] * 8 + position[0]
+
+
+def square_position(square: int) -> Tuple[int, int]:
+    """Convert a square index to (x, y) board coordinates, e.g. 12 (e2) -> (4, 1)."""
+    return square & 7, square >> 3
+
+
+def iter_squares(bitboard: int) -> Iterator[int]:
+    """Yield the index of every set bit of the bitboard, from a1 to h8."""
+    while bitboard:
+        lsb = bitboard & -bitboard
+        yield lsb.bit_length() - 1
+        bitboard ^= lsb
+
+
+def popcount(bitboard: int) -> int:
+    """Count the set bits of the bitboard."""
+    return bin(bitboard).count('1')
+
+
+def knight_attacks(bitboard: int) -> int:
+    """Return the squares attacked by all the knights of the bitboard."""
+    return (((bitboard << 17) & NOT_FILE_A) | ((bitboard << 15) & NOT_FILE_H) |
+            ((bitboard << 10) & NOT_FILE_AB) | ((bitboard << 6) & NOT_FILE_GH) |
+            ((bitboard >> 17) & NOT_FILE_H) | ((bitboard >> 15) & NOT_FILE_A) |
+            ((bitboard >> 10) & NOT_FILE_GH) | ((bitboard >> 6) & NOT_FILE_AB)) & FULL_BOARD
+
+
+def king_attacks(bitboard: int) -> int:
+    """Return the squares attacked by all the kings of the bitboard."""
+    sideways = ((bitboard << 1) & NOT_FILE_A) | ((bitboard >> 1) & NOT_FILE_H)
+    row = bitboard | sideways
+    return (sideways | (row << 8) | (row >> 8)) & FULL_BOARD
+
+
+def pawn_attacks(bitboard: int, color: str) -> int:
+    """Return the squares attacked by all the pawns of the given color of the bitboard."""
+    if color == 'white':
+        return (((bitboard << 9) & NOT_FILE_A) | ((bitboard << 7) & NOT_FILE_H)) & FULL_BOARD
+    return ((bitboard >> 7) & NOT_FILE_A) | ((bitboard >> 9) & NOT_FILE_H)
+
+
+def sliding_attacks(square: int, occupied: int, directions: Tuple[Tuple[int, int], ...]) -> int:
+    """Walk every direction from the square until the edge of the board or the first blocker (included)."""
+    attacks = 0
+    start_x, start_y = square & 7, square >> 3
+    for dx, dy in directions:
+        x, y = start_x + dx, start_y + dy
+        while 0 <= x <= 7 and 0 <= y <= 7:
+            bit = 1 << (y * 8 + x)
+            attacks |= bit
+            if occupied & bit:
+                break  # Found a blocker
+            x, y = x + dx, y + dy
+    return attacks
+
+
+def ray_tables() -> Tuple[List[List[int]], List[List[int]]]:
+    """Build the BETWEEN and LINE tables for every pair of squares on the same rank, file or diagonal."""
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for start in range(64):
+        for directions in (BISHOP_DIRECTIONS, ROOK_DIRECTIONS):
+            for direction in directions:
+                ray: int = sliding_attacks(start, 0, (direction,))
+                opposite_ray: int = sliding_attacks(start, 0, ((-direction[0], -direction[1]),))
+                for end in iter_squares(ray):
+                    between[start][end] = ray & sliding_attacks(end, 0, ((-direction[0], -direction[1]),))
+                    line[start][end] = ray | opposite_ray | (1 << start)
+    return between, line
+
+
+def relevant_occupancy(square: int, directions: Tuple[Tuple[int, int], ...]) -> int:
+    """Return the squares whose occupancy changes the attacks of a slider on the square: its rays
+    without the last square of each one, since a piece on the edge never hides anything."""
+    mask = 0
+    for direction in directions:
+        ray: int = sliding_attacks(square, 0, (direction,))
+        if ray:
+            last: int = ray.bit_length() - 1 if direction[1] > 0 or (direction[1] == 0 and direction[0] > 0) else (ray & -ray).bit_length() - 1
+            mask |= ray ^ (1 << last)
+    return mask
+
+
+def slider_tables(directions: Tuple[Tuple[int, int], ...]) -> Tuple[List[int], List[Dict[int, int]]]:
+    """Build the relevant occupancy mask of every square and the attacks for every subset of it."""
+    masks = []
+    tables = []
+    for square in range(64):
+        mask: int = relevant_occupancy(square, directions)
+        table: Dict[int, int] = {}
+        subset = 0
+        while True:  # Enumerate every subset of the mask (carry-rippler)
+            table[subset] = sliding_attacks(square, subset, directions)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+def build_attack_tables() -> Tuple:
+    """Compute every attack table (see load_attack_tables())."""
+    knight = [knight_attacks(1 << square) for square in range(64)]
+    king = [king_attacks(1 << square) for square in range(64)]
+    pawn = {color: [pawn_attacks(1 << square, color) for square in range(64)] for color in COLORS}
+    bishop_masks, bishop_tables = slider_tables(BISHOP_DIRECTIONS)
+    rook_masks, rook_tables = slider_tables(ROOK_DIRECTIONS)
+    between, line = ray_tables()
+    return knight, king, pawn, bishop_masks, bishop_tables, rook_masks, rook_tables, between, line
+
+
+def load_attack_tables(cache_path: Optional[str] = ATTACK_CACHE_PATH) -> Tuple:
+    """Return the attack tables, read from the cache file if it exists, otherwise computed
+    and written to it. Building the slider tables takes a while in Python, reading them back doesn't.
+    cache_path: None to always compute the tables."""
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as cache:
+                version, tables = marshal.loads(cache.read())
+            if version == ATTACK_CACHE_VERSION and len(tables) == 9:
+                return tables
+        except (OSError, EOFError, ValueError, TypeError):
+            pass  # A damaged or foreign cache file is rebuilt
+
+    tables = build_attack_tables()
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'wb') as cache:
+                marshal.dump((ATTACK_CACHE_VERSION, tables), cache)
+            os.replace(temporary_path, cache_path)  # Other processes never see a partial file
+        except OSError:
+            pass  # The cache is optional, e.g. on a read-only file system
+    return tables
+
+
+# Attack tables by square index: KNIGHT_ATTACKS[square], KING_ATTACKS[square], PAWN_ATTACKS[color][square],
+# the slider attacks BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] (same for rooks),
+# BETWEEN[a][b]: squares strictly between a and b, LINE[a][b]: the whole line through a and b (0 if they aren't aligned)
+(KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BISHOP_MASKS, BISHOP_TABLES,
+ ROOK_MASKS, ROOK_TABLES, BETWEEN, LINE) = load_attack_tables()
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    """Return the squares attacked by a bishop on the square."""
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    """Return the squares attacked by a rook on the square."""
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    """Return the squares attacked by a queen on the square."""
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] | ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+# Compact 16-bit moves, laid out like Polyglot moves: the end square in bits 0-5, the start square in bits 6-11
+# and the promotion piece in bits 12-14 with the Polyglot codes. The codes Polyglot doesn't use mark the special
+# moves (a castling move goes to the king's destination, not to the rook like in Polyglot) and bit 15 marks captures.
+PROMOTION_CODES = {'knight': 1, 'bishop': 2, 'rook': 3, 'queen': 4}
+PROMOTION_TYPES = (None, 'knight', 'bishop', 'rook', 'queen')
+CASTLING_FLAG = 5
+EN_PASSANT_FLAG = 6
+DOUBLE_PUSH_FLAG = 7
+CAPTURE_FLAG = 1 << 15
+
+
+def encode_move(start: int, end: int, kind: int = 0, capture: bool = False) -> int:
+    """Pack a move between two square indices into a compact 16-bit integer.
+    kind: promotion code (1-4) or special move flag (5-7), capture: whether the move takes a piece."""
+    return end | start << 6 | kind << 12 | (CAPTURE_FLAG if capture else 0)
+
+
+def move_start(move: int) -> int:
+    """Return the start square index of a compact move."""
+    return (move >> 6) & 63
+
+
+def move_end(move: int) -> int:
+    """Return the end square index of a compact move."""
+    return move & 63
+
+
+def move_kind(move: int) -> int:
+    """Return the promotion code or special move flag of a compact move (0 for a normal move)."""
+    return (move >> 12) & 7
+
+
+def move_promotion(move: int) -> Optional[str]:
+    """Return the piece type a compact move promotes to, or None."""
+    kind: int = (move >> 12) & 7
+    return PROMOTION_TYPES[kind] if kind <= 4 else None
+
+
+def is_capture(move: int) -> bool:
+    """Check if a compact move takes a piece (en passant included)."""
+    return bool(move & CAPTURE_FLAG)
+
+
+def move_to_uci(move: int) -> str:
+    """Convert a compact move to UCI "e2e4" format, with the promotion letter for promotions ("e7e8q")."""
+    start: int = (move >> 6) & 63
+    end: int = move & 63
+    kind: int = (move >> 12) & 7
+    uci_move = f"{chr(97 + (start & 7))}{(start >> 3) + 1}{chr(97 + (end & 7))}{(end >> 3) + 1}"
+    return uci_move + "nbrq"[kind - 1] if 1 <= kind <= 4 else uci_move
@@ -1,5 +1,6 @@
 
-from typing import Optional, Dict, Tuple
+from array import array
+from typing import Optional, Dict, Tuple, Union, List
 from pieces.piece import ChessPiece
 from pieces.pawn import Pawn
 from pieces.rook import Rook
@@ -8,42 +9,84 @@ from pieces.bishop import Bishop
 from pieces.queen import Queen
 from pieces.king import King
 from utils import parse_position, to_square_notation
-from polyglot import Polyglot
-from copy import deepcopy
+from psqt import PIECE_SQUARE_SCORES
+from polyglot import Polyglot, ZOBRIST_PIECE_KEYS, ZOBRIST_CASTLING_KEYS, ZOBRIST_EN_PASSANT_KEYS, ZOBRIST_TURN_KEY
+from bitboard import (PIECE_TYPES, FULL_BOARD, RANK_1, RANK_8, BETWEEN, LINE, square_index, square_position, iter_squares,
+                      KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, pawn_attacks, bishop_attacks, rook_attacks, queen_attacks,
+                      encode_move, move_start, move_end, move_kind, move_to_uci, PROMOTION_CODES, PROMOTION_TYPES,
+                      CASTLING_FLAG, EN_PASSANT_FLAG, DOUBLE_PUSH_FLAG, CAPTURE_FLAG, popcount)
+
+# Pieces a pawn can be promoted to by make_move()
+PROMOTION_PIECES = {'queen': Queen, 'rook': Rook, 'bishop': Bishop, 'knight': Knight}
+PROMOTION_CHOICES = ('queen', 'rook', 'bishop', 'knight')
+
+FIFTY_MOVE_PLIES = 100  # Halfmoves without a capture or a pawn move after which the game is a draw (fifty moves each)
+
+# Squares of the king and the rook whose move or capture takes away each castling right
+CASTLING_SQUARES = {'K': ((4, 0), (7, 0)), 'Q': ((4, 0), (0, 0)), 'k': ((4, 7), (7, 7)), 'q': ((4, 7), (0, 7))}
+CASTLING_MASKS = {flag: (1 << square_index(king)) | (1 << square_index(rook)) for flag, (king, rook) in CASTLING_SQUARES.items()}
 
 
 class ChessBoard:
     def __init__(self) -> None:
-        self.board = [[None] * 8 for _ in range(8)]
-        self.pieces = {'white': {}, 'black': {}}  # Track all pieces by color and position
-        self.setup_board()
+        self.squares = [None] * 64  # Mailbox with the piece on every square index (0 for a1 and 63 for h8)
+        self.bitboards = {color: {piece_type: 0 for piece_type in PIECE_TYPES} for color in ('white', 'black')}  # One bitboard per piece type and color
+        self.occupancy = {'white': 0, 'black': 0}  # Squares occupied by each color
+        self.occupied = 0  # Squares occupied by any piece
+        self._board_view = None  # Cached column-major view of the mailbox
+        self._pieces_view = None  # Cached view of the pieces by color and position
+        self.zobrist_key = 0  # Polyglot Zobrist hash of the position, updated incrementally
+        self.psqt_scores = {'white': 0, 'black': 0}  # Running material and piece-square totals of each color (see psqt.py)
         self.white_king_position = (4, 0)
         self.black_king_position = (4, 7)
+        self.setup_board()
         self.turn = 'white'
         self.castling_rights = {'K': True, 'Q': True, 'k': True, 'q': True}
         self.en_passant_square = None  # Square where an en passant capture is possible
         self.halfmove_clock = 0  # Number of halfmoves since the last capture or pawn advance
         self.fullmove_number = 1  #How many turns have been played
         self.repetition_count = {}  # Hash map to track board state frequencies
-        self.polyglotObj = Polyglot()  # Polyglot object to call zobristHash() to check for threefold repetition draw
+        self.polyglotObj = Polyglot()  # Polyglot object to call zobristHash() to compute the hash of a new position
         self.fen_stack = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"]  # Stack to store FEN strings for undoing moves
         self.stalemate = False  # Flag that checks if the current position is a stalemate
+        self.undo_stack = []  # Stack with the information needed to take back the moves played by make_move()
+        self.key_history = []  # Zobrist keys of the positions before the moves played by make_move(), for repetitions
+        self.zobrist_key = self.compute_zobrist_key()
+
+    @property
+    def board(self) -> List[List[Optional[ChessPiece]]]:
+        """Column-major 8x8 view of the mailbox (board[x][y]), kept for compatibility. It is read-only,
+        pieces are placed with set_piece()."""
+        if self._board_view is None:
+            self._board_view = [self.squares[x::8] for x in range(8)]
+        return self._board_view
+
+    @property
+    def pieces(self) -> Dict[str, Dict[Tuple[int, int], ChessPiece]]:
+        """View of all pieces by color and position, kept for compatibility."""
+        if self._pieces_view is None:
+            pieces = {'white': {}, 'black': {}}
+            for square, piece in enumerate(self.squares):
+                if piece:
+                    pieces[piece.color][square_position(square)] = piece
+            self._pieces_view = pieces
+        return self._pieces_view
 
     def clone(self) -> 'ChessBoard':
-        """Create a deep copy of the chess board."""
-        new_board = ChessBoard()
-        new_board.board = [row[:] for row in self.board]
-        new_board.pieces = {color: pieces.copy() for color, pieces in self.pieces.items()}
-        new_board.white_king_position = self.white_king_position
-        new_board.black_king_position = self.black_king_position
-        new_board.turn = self.turn
+        """Create a deep copy of the chess board without setting up a new board."""
+        new_board: ChessBoard = ChessBoard.__new__(ChessBoard)
+        new_board.__dict__.update(self.__dict__)
+        new_board.squares = self.squares[:]
+        new_board.bitboards = {color: bitboards.copy() for color, bitboards in self.bitboards.items()}
+        new_board.occupancy = self.occupancy.copy()
+        new_board.psqt_scores = self.psqt_scores.copy()
+        new_board._board_view = None
+        new_board._pieces_view = None
         new_board.castling_rights = self.castling_rights.copy()
-        new_board.en_passant_square = self.en_passant_square
-        new_board.halfmove_clock = self.halfmove_clock
-        new_board.fullmove_number = self.fullmove_number
         new_board.repetition_count = self.repetition_count.copy()
         new_board.fen_stack = self.fen_stack[:]
-        new_board.stalemate = self.stalemate
+        new_board.undo_stack = self.undo_stack[:]
+        new_board.key_history = self.key_history[:]
         return new_board
 
     # Getter for pieces
@@ -55,6 +98,7 @@ class ChessBoard:
         valid_keys = {'K', 'Q', 'k', 'q'}
         if all(key in valid_keys for key in castling_rights.keys()):
             key: str
+            self.zobrist_key ^= self.castling_key(self.castling_rights) ^ self.castling_key(castling_rights)
             self.castling_rights = castling_rights
         else:
             raise ValueError("Invalid castling rights keys.")
@@ -62,6 +106,10 @@ class ChessBoard:
     # Setter for en passant square
     def setEnPassantSquare(self, square: str) -> None:
         if square is None or isinstance(square, str):
+            if self.en_passant_square:
+                self.zobrist_key ^= ZOBRIST_EN_PASSANT_KEYS[ord(self.en_passant_square[0]) - ord('a')]
+            if square:
+                self.zobrist_key ^= ZOBRIST_EN_PASSANT_KEYS[ord(square[0]) - ord('a')]
             self.en_passant_square = square
         else:
             raise ValueError("En passant square must be None or a valid square string.")
@@ -83,6 +131,7 @@ class ChessBoard:
     def updateTurn(self) -> str:
         """Update the turn after a move is made."""
         self.turn = 'black' if self.turn == 'white' else 'white'
+        self.zobrist_key ^= ZOBRIST_TURN_KEY
         return self.turn
 
     def updateCastlingRights(self, color: str, start: Tuple[int, int], end: Tuple[int, int]) -> None:
@@ -121,6 +170,7 @@ class ChessBoard:
 
         # Clear repetition count history if castling rights change
         if (prev_castling_rights != self.castling_rights):
+            self.zobrist_key ^= self.castling_key(prev_castling_rights) ^ self.castling_key(self.castling_rights)
             self.repetition_count.clear()
 
     def updateEnPassantSquare(self, color: str, last_move: Tuple[Tuple[int, int], Tuple[int, int], ChessPiece]) -> None:
@@ -132,7 +182,7 @@ class ChessBoard:
                 for dx in [-1, 1]:
                     neighbor_x: int = last_move[1][0] + dx
                     if (0 <= neighbor_x < 8):
-                        neighbor_piece: ChessPiece = self.board[neighbor_x][last_move[1][1]]
+                        neighbor_piece: ChessPiece = self.squares[square_index((neighbor_x, last_move[1][1]))]
                         if (isinstance(neighbor_piece, Pawn) and neighbor_piece.color == color):
                             self.setEnPassantSquare(to_square_notation((last_move[1][0], (last_move[0][1] + last_move[1][1]) // 2)))
                             return
@@ -146,21 +196,49 @@ class ChessBoard:
         """Increment the fullmove number after blacks's move."""
         self.fullmove_number += 1
 
-    def update_piece_position(self, start: Tuple[int, int], end: Tuple[int, int]) -> None:
-        """Update the pieces dictionary after a move."""
-        piece: ChessPiece = self.board[end[0]][end[1]]
+    def set_piece(self, position: Tuple[int, int], piece: Optional[ChessPiece]) -> None:
+        """Place a piece (or None to empty the square) at the given position, replacing any piece already there."""
+        square: int = square_index(position)
+        if self.squares[square]:
+            self._remove_piece(square)
+        if piece:
+            self._put_piece(square, piece)
+
+    def _put_piece(self, square: int, piece: ChessPiece) -> None:
+        """Place a piece on an empty square and update the bitboards and the evaluation totals."""
+        bit = 1 << square
         color: str = piece.color
-        if start in self.pieces[color]:
-            del self.pieces[color][start]
-        self.pieces[color][end] = piece
-
-        # Remove captured piece from the opponent's dictionary, if any
-        opponent_color = 'black' if color == 'white' else 'white'
-        if end in self.pieces[opponent_color]:
-            del self.pieces[opponent_color][end]
+        self.squares[square] = piece
+        self.zobrist_key ^= ZOBRIST_PIECE_KEYS[color][piece.piece_type][square]
+        self.bitboards[color][piece.piece_type] |= bit
+        self.occupancy[color] |= bit
+        self.occupied |= bit
+        self.psqt_scores[color] += PIECE_SQUARE_SCORES[piece.piece_type][square]
+        self._board_view = None
+        self._pieces_view = None
+        if piece.piece_type == 'king':
+            if color == 'white':
+                self.white_king_position = square_position(square)
+            else:
+                self.black_king_position = square_position(square)
+
+    def _remove_piece(self, square: int) -> ChessPiece:
+        """Remove the piece from a square, update the bitboards and the evaluation totals and return the removed piece."""
+        bit = 1 << square
+        piece: ChessPiece = self.squares[square]
+        self.squares[square] = None
+        self.zobrist_key ^= ZOBRIST_PIECE_KEYS[piece.color][piece.piece_type][square]
+        self.bitboards[piece.color][piece.piece_type] ^= bit
+        self.occupancy[piece.color] ^= bit
+        self.occupied ^= bit
+        self.psqt_scores[piece.color] -= PIECE_SQUARE_SCORES[piece.piece_type][square]
+        self._board_view = None
+        self._pieces_view = None
+        return piece
 
     def updateFENstack(self) -> None:
-        """Save the current state to the FEN stack."""
+        """Save the current state to the FEN stack, used by undo_moves() to take back the moves of a game.
+        The search doesn't use it, the repetitions are detected with the Zobrist keys (see is_repetition())."""
         current_fen: str = self.to_fen()
         self.fen_stack.append(current_fen)
 
@@ -198,17 +276,13 @@ class ChessBoard:
     def setup_board(self) -> None:
         """Sets up the chess board with pieces in their initial positions."""
         for i in range(8):
-            self.board[i][1] = Pawn('white')
-            self.pieces['white'][(i, 1)] = self.board[i][1]
-            self.board[i][6] = Pawn('black')
-            self.pieces['black'][(i, 6)] = self.board[i][6]
+            self._put_piece(square_index((i, 1)), Pawn('white'))
+            self._put_piece(square_index((i, 6)), Pawn('black'))
 
         placements = [Rook, Knight, Bishop, Queen, King, Bishop, Knight, Rook]
         for i, piece in enumerate(placements):
-            self.board[i][0] = piece('white')
-            self.pieces['white'][(i, 0)] = self.board[i][0]
-            self.board[i][7] = piece('black')
-            self.pieces['black'][(i, 7)] = self.board[i][7]
+            self._put_piece(square_index((i, 0)), piece('white'))
+            self._put_piece(square_index((i, 7)), piece('black'))
 
     def display(self) -> None:
         """Prints the chess board after every move."""
@@ -223,30 +297,44 @@ class ChessBoard:
 
     def checkThreefoldRepetition(self, engineFlag=False) -> bool:
         """Check if the current board state has occurred three times."""
-        # Change the format and unpack the variables
-        pieces, pawns = self.changePiecesFormat(self.pieces)
-        pieces: Dict[Tuple[int, int], Tuple[str, str]]
-        pawns: Dict[Tuple[int, int], str]
-        castling_rights: str = self.changeCastlingRightsFormat(self.castling_rights)
-        ep_square: Tuple[int, int] = self.changeEnPassantSquareFormat(self.en_passant_square)
-        current_state: int = self.polyglotObj.zobristHash(self.board, pieces, castling_rights, ep_square, self.turn, pawns)  # Unique int value representing the board state
+        # The engine searches with make_move()/unmake_move() so it must not record the positions of the search
+        # in the game history, it only checks if the position repeats
+        if engineFlag:
+            return self.is_repetition()
+
+        # Check if this is the third time this position occurres
+        if self.record_position() >= 3:
+            print("Draw by threefold repetition.")
+            return True
+        return False
+
+    def is_repetition(self) -> bool:
+        """Check if the position is a draw by repetition for the search: it occurred twice in the game already
+        or once earlier in the line played with make_move(). Only the Zobrist keys since the last capture or
+        pawn move are scanned, with the same side to move."""
+        key: int = self.zobrist_key
+        history: list[int] = self.key_history
+        oldest: int = max(len(history) - self.halfmove_clock, 0)
+        for index in range(len(history) - 2, oldest - 1, -2):
+            if history[index] == key:
+                return True
+        return self.repetition_count.get(key, 0) >= 2
+
+    def record_position(self, current_state: Optional[int] = None) -> int:
+        """Add the current position to the game history and return how many times it has occurred."""
+        if current_state is None:
+            current_state = self.zobrist_key
 
         # Update the Hash map
         if current_state in self.repetition_count:
             self.repetition_count[current_state] += 1
         else:
             self.repetition_count[current_state] = 1
-
-        # Check if this is the third time this position occurres
-        if self.repetition_count.get(current_state, 0) >= 3:
-            if not engineFlag:
-                print("Draw by threefold repetition.")
-            return True
-        return False
+        return self.repetition_count[current_state]
 
     def checkFiftyMoveRule(self, engineFlag=False) -> bool:
         """Check if the game has reached a draw by the fifty-move rule."""
-        if (self.halfmove_clock >= 50):
+        if (self.halfmove_clock >= FIFTY_MOVE_PLIES):
             if not engineFlag:
                 print("Draw by fifty-move rule.")
             return True
@@ -331,7 +419,7 @@ class ChessBoard:
 
             # Iterate over each column within the current row
             for x in range(8):
-                piece = self.board[x][y]  # Access each "row" as a column in column-major order
+                piece = self.squares[y * 8 + x]  # Access the mailbox square index of (x, y)
 
                 if piece is None:
                     empty_count += 1
@@ -370,8 +458,9 @@ class ChessBoard:
 
         # Piece positions
         rows = parts[0].split('/')
-        self.board = [[None] * 8 for _ in range(8)]  # Reset the board
-        self.pieces = {'white': {}, 'black': {}}  # Reset the pieces dictionary
+        for square, piece in enumerate(self.squares):  # Reset the board and the bitboards
+            if piece:
+                self._remove_piece(square)
 
         for y, row in enumerate(rows):
             x = 0
@@ -380,14 +469,8 @@ class ChessBoard:
                     x += int(char)
                 else:
                     piece: ChessPiece = self.create_piece_from_fen(char)
-                    self.board[x][7 - y] = piece
                     if piece:
-                        self.pieces[piece.color][(x, 7 - y)] = piece  # Add the piece to the pieces dictionary
-                        if isinstance(piece, King):
-                            if (piece.color == 'white'):
-                                self.white_king_position = (x, 7 - y)
-                            else:
-                                self.black_king_position = (x, 7 - y)
+                        self._put_piece(square_index((x, 7 - y)), piece)  # Also tracks the king positions
                     x += 1
 
         # Turn
@@ -402,8 +485,13 @@ class ChessBoard:
             'q': 'q' in castling_rights
         }
 
-        # En passant target square
+        # En passant target square (only kept if a pawn can capture en passant, like updateEnPassantSquare() does)
         self.en_passant_square = parts[3] if parts[3] != '-' else None
+        if self.en_passant_square:
+            opponent_color = 'black' if self.turn == 'white' else 'white'
+            en_passant_bit = 1 << square_index(parse_position(self.en_passant_square))
+            if not pawn_attacks(en_passant_bit, opponent_color) & self.bitboards[self.turn]['pawn']:
+                self.en_passant_square = None
 
         # Halfmove clock
         self.halfmove_clock = int(parts[4])
@@ -411,6 +499,26 @@ class ChessBoard:
         # Fullmove number
         self.fullmove_number = int(parts[5])
 
+        self.undo_stack = []
+        self.key_history = []
+        self.zobrist_key = self.compute_zobrist_key()
+
+    def compute_zobrist_key(self) -> int:
+        """Compute the Polyglot Zobrist hash of the position from scratch. The board keeps zobrist_key
+        up to date incrementally, this is used to initialize it."""
+        pieces, pawns = self.changePiecesFormat(self.pieces)
+        castling_rights: str = self.changeCastlingRightsFormat(self.castling_rights)
+        ep_square: Tuple[int, int] = self.changeEnPassantSquareFormat(self.en_passant_square)
+        return self.polyglotObj.zobristHash(self.board, pieces, castling_rights, ep_square, self.turn, pawns)
+
+    def castling_key(self, castling_rights: Dict[str, bool]) -> int:
+        """Return the part of the Zobrist hash that depends on the castling rights."""
+        key = 0
+        for flag, available in castling_rights.items():
+            if available:
+                key ^= ZOBRIST_CASTLING_KEYS[flag]
+        return key
+
     def create_piece_for_fen(self, piece: ChessPiece) -> str:
         """Create the piece character representation for a FEN."""
         char = None
@@ -453,21 +561,110 @@ class ChessBoard:
     def is_square_under_attack(self, square: Tuple[int, int], color: str) -> bool:
         """Check if a square is under attack by any piece of the opponent's color."""
         opponent_color = 'black' if color == 'white' else 'white'
-        x, y = square
+        return self.attackers_to(square_index(square), opponent_color) != 0
+
+    def attackers_to(self, square: int, color: str, occupied: Optional[int] = None, captured: int = 0) -> int:
+        """Return the bitboard of the pieces of the given color that attack the square index.
+        occupied: occupancy to use for the sliding pieces instead of the current one.
+        captured: bitboard of pieces that have been captured and must be ignored."""
+        if occupied is None:
+            occupied = self.occupied
+        pieces: Dict[str, int] = self.bitboards[color]
+        opponent_color = 'black' if color == 'white' else 'white'
 
-        # Iterate over all opponent's pieces to check if any can move to the target square
-        for pos, piece in self.pieces[opponent_color].items():
-            pos: Tuple[int, int]
-            piece: ChessPiece
+        # A square is attacked by a piece if the same piece standing on the square would attack it back
+        attackers: int = PAWN_ATTACKS[opponent_color][square] & pieces['pawn']
+        attackers |= KNIGHT_ATTACKS[square] & pieces['knight']
+        attackers |= KING_ATTACKS[square] & pieces['king']
+        attackers |= bishop_attacks(square, occupied) & (pieces['bishop'] | pieces['queen'])
+        attackers |= rook_attacks(square, occupied) & (pieces['rook'] | pieces['queen'])
+        return attackers & ~captured
+
+    def is_in_check(self, color: str) -> bool:
+        """Determine if the king of the given color is in check."""
+        king: int = self.bitboards[color]['king']
+        if not king:
+            raise ValueError(f"Expected a {color} King on the board but found none")
+        opponent_color = 'black' if color == 'white' else 'white'
+        return self.attackers_to(king.bit_length() - 1, opponent_color) != 0
+
+    def castling_targets(self, color: str) -> int:
+        """Return the bitboard of the squares the king of the given color can castle to. The king can't castle
+        out of, through or into check, and the squares between the king and the rook must be empty."""
+        targets = 0
+        rank: int = 0 if color == 'white' else 56  # Square index of a1 or a8
+        kingside, queenside = ('K', 'Q') if color == 'white' else ('k', 'q')
+        opponent_color = 'black' if color == 'white' else 'white'
+        rooks: int = self.bitboards[color]['rook']
+        occupied: int = self.occupied
+
+        if not (self.bitboards[color]['king'] >> (rank + 4)) & 1:
+            return 0
+        if self.castling_rights[kingside] and (rooks >> (rank + 7)) & 1 and not (occupied >> (rank + 5)) & 3:
+            if not any(self.attackers_to(rank + file, opponent_color) for file in (4, 5, 6)):
+                targets |= 1 << (rank + 6)
+        if self.castling_rights[queenside] and (rooks >> rank) & 1 and not (occupied >> (rank + 1)) & 7:
+            if not any(self.attackers_to(rank + file, opponent_color) for file in (4, 3, 2)):
+                targets |= 1 << (rank + 2)
+        return targets
+
+    def piece_targets(self, square: int, piece_type: str, color: str) -> int:
+        """Return the bitboard of the squares a piece can move to from the square index, without checking
+        whether the move leaves its own king in check (pseudo-legal moves)."""
+        bit = 1 << square
+        own: int = self.occupancy[color]
+
+        if piece_type == 'pawn':
+            empty: int = ~self.occupied
+            enemies: int = self.occupancy['black' if color == 'white' else 'white']
+            if self.en_passant_square:
+                en_passant: Tuple[int, int] = parse_position(self.en_passant_square)
+                if en_passant[1] == (5 if color == 'white' else 2):
+                    enemies |= 1 << square_index(en_passant)
+            if color == 'white':
+                single: int = (bit << 8) & empty
+                double: int = ((single & (RANK_1 << 16)) << 8) & empty
+            else:
+                single: int = (bit >> 8) & empty
+                double: int = ((single & (RANK_8 >> 16)) >> 8) & empty
+            return single | double | (PAWN_ATTACKS[color][square] & enemies)
+        if piece_type == 'knight':
+            return KNIGHT_ATTACKS[square] & ~own
+        if piece_type == 'bishop':
+            return bishop_attacks(square, self.occupied) & ~own
+        if piece_type == 'rook':
+            return rook_attacks(square, self.occupied) & ~own
+        if piece_type == 'queen':
+            return queen_attacks(square, self.occupied) & ~own
+        return (KING_ATTACKS[square] & ~own) | self.castling_targets(color)
+
+    def is_legal_move(self, start: int, end: int, color: str) -> bool:
+        """Check that a pseudo-legal move between two square indices doesn't leave the king in check.
+        The board is not modified, the move is replayed on the occupancy bitboards only."""
+        piece: ChessPiece = self.squares[start]
+        opponent_color = 'black' if color == 'white' else 'white'
+        end_bit = 1 << end
 
-            if piece.is_valid_move(pos, (x, y), self.board):
-                return True
-        return False
+        if piece.piece_type == 'king':
+            if abs(start - end) == 2:
+                return True  # Castling squares are already checked by castling_targets()
+            king_square: int = end
+        else:
+            king_square: int = self.bitboards[color]['king'].bit_length() - 1
 
-    def move_piece(self, start: Tuple[int, int], end: Tuple[int, int], color: str, flag=False, engineFlag=False) -> bool:
+        captured: int = end_bit & self.occupancy[opponent_color]
+        occupied: int = (self.occupied ^ (1 << start)) | end_bit
+        if (piece.piece_type == 'pawn' and not captured and (start - end) % 8):
+            # En passant capture, the captured pawn stands next to the starting square
+            captured = 1 << ((start & ~7) | (end & 7))
+            occupied ^= captured
+        return self.attackers_to(king_square, opponent_color, occupied, captured) == 0
+
+    def move_piece(self, start: Tuple[int, int], end: Tuple[int, int], color: str, flag=False, engineFlag=False, promotion: Optional[str] = None) -> bool:
         """Moves a piece from the start position to the end position if it is a valid move.
         flag: is used to check if the move is valid before playing it (for the generate_legal_moves()).
-        engineFlag: is used to check if the move is made by the engine (in case pawn promotion needed)."""
+        engineFlag: is used to check if the move is made by the engine (in case pawn promotion needed).
+        promotion: the piece type a pawn is promoted to, the player is asked only if it is None and engineFlag isn't set."""
         if (start == end):
             return False
 
@@ -477,393 +674,239 @@ class ChessBoard:
         if (start_x < 0 or start_x > 7 or start_y < 0 or start_y > 7 or end_x < 0 or end_x > 7 or end_y < 0 or end_y > 7):
             return False
 
-        piece: ChessPiece = self.board[start_x][start_y]  # Piece at the start square
-        target_piece: ChessPiece = self.board[end_x][end_y]  # Piece at the target square(if any)
+        start_square: int = square_index(start)
+        end_square: int = square_index(end)
+        piece: ChessPiece = self.squares[start_square]  # Piece at the start square
+        target_piece: ChessPiece = self.squares[end_square]  # Piece at the target square(if any)
 
         # Check if the destination square contains a piece of the same color
         if (target_piece and target_piece.color == color):
             return False
 
         # Check if the piece at the start square is of the correct color
-        if (piece and piece.color == color):
-            if isinstance(piece, King):
-                if piece.is_valid_move(start, end, self.board, self):
-                    if self.move_piece_helper(start, end, self.board, color, flag, engineFlag):
-                        if not flag:
-                            # Update fullmove number
-                            if (color == 'black'):
-                                self.updateFullMoveNumber()
-                            self.updateHalfMoveClock()  # Increment halfmove clock
-                            self.updateCastlingRights(color, start, end)  # Update castling rights because the king moved
-                        return True
-                return False
-            # Check for en passant capture
-            en_passant_target_pawn: ChessPiece = self.board[end_x][start_y]  # Pawn that can be captured en passant (if any)
-            if (self.en_passant_square and isinstance(piece, Pawn) and self.en_passant_square == to_square_notation(end) and piece.is_valid_move(start, end, self.board, self)):
-                if self.move_piece_helper(start, end, self.board, color, flag, engineFlag):
-                    if flag:
-                        # Restore the enemy pawn that was captured en passant
-                        self.board[end_x][start_y] = en_passant_target_pawn
-                    else:
-                        # Remove the captured pawn from the pieces dictionary
-                        opponent_color = 'black' if color == 'white' else 'white'
-                        del self.getPieces()[opponent_color][(end_x, start_y)]
-
-                        # Update fullmove number
-                        if (color == 'black'):
-                            self.updateFullMoveNumber()
-
-                        # Reset halfmove clock because a pawn was moved
-                        self.halfmove_clock = 0
-
-                        # Clear repetition count history after an en passant capture
-                        self.repetition_count.clear()
-                    return True
-                # Restore the enemy pawn that was captured en passant
-                self.board[end_x][start_y] = en_passant_target_pawn
-                return False
-            if piece.is_valid_move(start, end, self.board):
-                if self.move_piece_helper(start, end, self.board, color, flag, engineFlag):
-                    if not flag:
-                        self.updateHalfMoveClock()  # Increment halfmove clock
-
-                        # Check for pawn promotion
-                        if isinstance(piece, Pawn):
-                            # Clear repetition count history after a pawn move
-                            self.repetition_count.clear()
-
-                            # Reset halfmove clock because a pawn was moved
-                            self.halfmove_clock = 0
-                            if (color == 'white' and end_y == 7) or (color == 'black' and end_y == 0):
-                                if engineFlag:
-                                    self.board[end_x][end_y] = Queen(color)
-                                    self.pieces[color][end] = self.board[end_x][end_y]
-                                else:
-                                    piece.promote_pawn((end_x, end_y), color, self)
-
-                        # Update fullmove number
-                        if (color == 'black'):
-                            self.updateFullMoveNumber()
-
-                        # Update castling rights because a rook moved or was captured
-                        if (isinstance(piece, Rook) or end == (0, 0) or end == (7, 0) or end == (0, 7) or end == (7, 7)):
-                            self.updateCastlingRights(color, start, end)
-                    return True
-        return False
+        if not (piece and piece.color == color):
+            return False
 
-    def move_piece_helper(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]], color: str, flag: bool, engineFlag: bool) -> bool:
-        """Check if a move is legal before playing it and update the board accordingly."""
-        opponent_color = 'black' if color == 'white' else 'white'
+        # Check the move against the bitboards and make sure it doesn't leave the king in check
+        if not (self.piece_targets(start_square, piece.piece_type, color) >> end_square) & 1:
+            return False
+        if not self.is_legal_move(start_square, end_square, color):
+            return False
+        if flag:
+            return True
+
+        self.move_piece_helper(start, end, self.board, color, flag, engineFlag, promotion)
+        return True
+
+    def move_piece_helper(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]], color: str, flag: bool, engineFlag: bool, promotion: Optional[str] = None) -> bool:
+        """Play a move that has already been validated and update the board accordingly."""
         start_x, start_y = start
         end_x, end_y = end
-        piece: ChessPiece = self.board[start_x][start_y]  # Piece at the start square
-        target_piece: ChessPiece = self.board[end_x][end_y]  # Piece at the target square(if any)
+        start_square: int = square_index(start)
+        end_square: int = square_index(end)
+        piece: ChessPiece = self.squares[start_square]  # Piece at the start square
+        target_piece: Optional[ChessPiece] = self.squares[end_square]  # Piece at the target square(if any)
 
-        # Save the state of the board for check validation
-        if isinstance(piece, King):
-            king_position: Tuple[int, int] = (end_x, end_y)
-            king_positionPrev: Tuple[int, int] = self.white_king_position if color == 'white' else self.black_king_position
-            if color == 'white':
-                self.white_king_position = king_position
+        if target_piece:
+            self._remove_piece(end_square)
+        elif isinstance(piece, Pawn) and start_x != end_x:
+            # Remove the pawn that was captured en passant
+            target_piece = self._remove_piece(square_index((end_x, start_y)))
+        self._remove_piece(start_square)
+        self._put_piece(end_square, piece)
+
+        # Castling move
+        if isinstance(piece, King) and abs(start_x - end_x) == 2:
+            rook_start, rook_end = ((7, start_y), (5, start_y)) if end_x == 6 else ((0, start_y), (3, start_y))
+            self._put_piece(square_index(rook_end), self._remove_piece(square_index(rook_start)))
+
+        self.updateHalfMoveClock()  # Increment halfmove clock
+        if isinstance(piece, Pawn) or target_piece:
+            # Clear repetition count history after a pawn move or a capture
+            self.repetition_count.clear()
+
+            # Reset halfmove clock because a pawn was moved or a piece was captured
+            self.halfmove_clock = 0
+
+        # Check for pawn promotion
+        if isinstance(piece, Pawn) and ((color == 'white' and end_y == 7) or (color == 'black' and end_y == 0)):
+            if promotion:
+                self.set_piece(end, PROMOTION_PIECES[promotion](color))
+            elif engineFlag:
+                self.set_piece(end, Queen(color))
             else:
-                self.black_king_position = king_position
+                piece.promote_pawn((end_x, end_y), color, self)
+
+        # Update fullmove number
+        if (color == 'black'):
+            self.updateFullMoveNumber()
+
+        # Update castling rights because the king or a rook moved or a rook was captured
+        self.updateCastlingRights(color, start, end)
+        return True
+
+    def make_move(self, start: Tuple[int, int], end: Tuple[int, int], promotion: str = 'queen') -> None:
+        """Play a legal move for the side to move and push everything needed to take it back on the undo stack.
+        Unlike move_piece() the move is not validated, the turn is switched and the repetition history is left untouched.
+        promotion: the piece type a pawn reaching the last rank is promoted to."""
+        self.make_compact_move(self.compact_move(square_index(start), square_index(end), promotion))
+
+    def compact_move(self, start: int, end: int, promotion: str = 'queen') -> int:
+        """Encode the move between two square indices in the current position with its promotion,
+        special move and capture flags, like generate_moves() does."""
+        piece: ChessPiece = self.squares[start]
+        capture: bool = self.squares[end] is not None
+        kind = 0
+        if piece.piece_type == 'pawn':
+            if end >> 3 in (0, 7):
+                kind = PROMOTION_CODES[promotion]
+            elif abs(end - start) == 16:
+                kind = DOUBLE_PUSH_FLAG
+            elif (start ^ end) & 7 and not capture:
+                kind, capture = EN_PASSANT_FLAG, True
+        elif piece.piece_type == 'king' and abs(end - start) == 2:
+            kind = CASTLING_FLAG
+        return encode_move(start, end, kind, capture)
+
+    def make_compact_move(self, move: int) -> None:
+        """Play a legal move in the compact format of generate_moves(), see make_move().
+        The promotion piece, en passant and castling are read from the flags of the move."""
+        start_square: int = move_start(move)
+        end_square: int = move_end(move)
+        kind: int = move_kind(move)
+        start_x, start_y = start_square & 7, start_square >> 3
+        end_x, end_y = end_square & 7, end_square >> 3
+        color: str = self.turn
+        piece: ChessPiece = self.squares[start_square]
+        captured: Optional[ChessPiece] = self.squares[end_square]
+        captured_square: int = end_square
+        if kind == EN_PASSANT_FLAG:
+            # En passant capture, the captured pawn stands next to the starting square
+            captured_square = start_y * 8 + end_x
+            captured = self.squares[captured_square]
+
+        self.undo_stack.append((start_square, end_square, piece, captured, captured_square, self.castling_rights,
+                                self.en_passant_square, self.halfmove_clock, self.fullmove_number,
+                                self.white_king_position, self.black_king_position, self.stalemate, self.zobrist_key))
+        self.key_history.append(self.zobrist_key)
+
+        if captured:
+            self._remove_piece(captured_square)
+        self._remove_piece(start_square)
+        if 1 <= kind <= 4:
+            self._put_piece(end_square, PROMOTION_PIECES[PROMOTION_TYPES[kind]](color))
         else:
-            king_position: Tuple[int, int] = self.white_king_position if color == 'white' else self.black_king_position
+            self._put_piece(end_square, piece)
 
-        # Change the board and pieces(temporarily)
-        self.board[end_x][end_y] = piece
-        self.board[start_x][start_y] = None
-        del self.pieces[color][start]
-        self.pieces[color][end] = piece
-        
-        # Get the king instance for the current player
-        king: King = self.board[king_position[0]][king_position[1]]
-
-        # Ensure the king is correctly retrieved
-        if not isinstance(king, King):
-            raise ValueError(f"Expected a King at position {king_position} but found {type(king).__name__}")
-
-        # Check if this move leaves the king in check
-        if (target_piece and target_piece.color != color):
-            del self.pieces[opponent_color][end]
-        if king.is_in_check(color, self):
-            # Revert move if it results in check
-            self.board[start_x][start_y] = piece
-            self.board[end_x][end_y] = target_piece
-            self.pieces[color][start] = piece
-            del self.pieces[color][end]
-            if (target_piece and target_piece.color != color):
-                self.pieces[opponent_color][end] = target_piece
-            if isinstance(piece, King):
-                if color == 'white':
-                    self.white_king_position = king_positionPrev
-                else:
-                    self.black_king_position = king_positionPrev
-            return False
+        # Castling move
+        if kind == CASTLING_FLAG:
+            rook_start, rook_end = (start_square + 3, start_square + 1) if end_x == 6 else (start_square - 4, start_square - 1)
+            self._put_piece(rook_end, self._remove_piece(rook_start))
 
-        if flag:
-            self.board[start_x][start_y] = piece
-            self.board[end_x][end_y] = target_piece
-            self.pieces[color][start] = piece
-            del self.pieces[color][end]
-            if (target_piece and target_piece.color != color):
-                self.pieces[opponent_color][end] = target_piece
-            if isinstance(piece, King):
-                if color == 'white':
-                    self.white_king_position = king_positionPrev
-                else:
-                    self.black_king_position = king_positionPrev
+        # Update the clocks
+        if piece.piece_type == 'pawn' or captured:
+            self.halfmove_clock = 0
         else:
-            # Update the has_move atributes for the player's color in case the player played a move
-            # Engine's has_move atributes are been updated inside the game loop in the main() function
-            if (isinstance(piece, King)):
-                if not engineFlag:
-                    piece.has_moved = True
-                # Castling move
-                if abs(start[0] - end[0]) == 2:
-                    row = start[1]
-                    if end[0] == 6:  # Kingside
-                        self.board[5][row] = self.board[7][row]
-                        self.board[7][row] = None
-                        if (color == 'white'):
-                            rook: Rook = self.pieces[color][(7, 0)]
-                            del self.pieces[color][(7, 0)]
-                            self.pieces[color][(5, 0)] = rook
-                        else:
-                            rook: Rook = self.pieces[color][(7, 7)]
-                            del self.pieces[color][(7, 7)]
-                            self.pieces[color][(5, 7)] = rook
-                    elif end[0] == 2:  # Queenside
-                        self.board[3][row] = self.board[0][row]
-                        self.board[0][row] = None
-                        if (color == 'white'):
-                            rook: Rook = self.pieces[color][(0, 0)]
-                            del self.pieces[color][(0, 0)]
-                            self.pieces[color][(3, 0)] = rook
-                        else:
-                            rook: Rook = self.pieces[color][(0, 7)]
-                            del self.pieces[color][(0, 7)]
-                            self.pieces[color][(3, 7)] = rook
-                    if not engineFlag:
-                        rook.has_moved = True
-            if (isinstance(piece, Rook) and not engineFlag):
-                piece.has_moved = True
-
-            # Reset halfmove clock because a piece is captured
-            if (target_piece and target_piece.color != color):
-                self.halfmove_clock = 0
-            self.update_piece_position(start, end)
-        return True
+            self.halfmove_clock += 1
+        if (color == 'black'):
+            self.fullmove_number += 1
+
+        # Update castling rights without touching the dictionary that is saved on the undo stack
+        castling_rights: Dict[str, bool] = self.castling_rights
+        move_mask: int = (1 << start_square) | (1 << end_square)
+        for flag, squares in CASTLING_MASKS.items():
+            if castling_rights[flag] and move_mask & squares:
+                if castling_rights is self.castling_rights:
+                    castling_rights = castling_rights.copy()
+                castling_rights[flag] = False
+                self.zobrist_key ^= ZOBRIST_CASTLING_KEYS[flag]
+        self.castling_rights = castling_rights
+
+        self.turn = 'black' if color == 'white' else 'white'
+        self.zobrist_key ^= ZOBRIST_TURN_KEY
+        self.updateEnPassantSquare(self.turn, ((start_x, start_y), (end_x, end_y), piece))
+
+    def unmake_move(self) -> None:
+        """Take back the last move played by make_move()."""
+        (start_square, end_square, piece, captured, captured_square, castling_rights, en_passant_square, halfmove_clock,
+         fullmove_number, white_king_position, black_king_position, stalemate, zobrist_key) = self.undo_stack.pop()
+
+        # Castling move
+        if piece.piece_type == 'king' and abs(start_square - end_square) == 2:
+            rook_start, rook_end = (start_square + 3, start_square + 1) if end_square > start_square else (start_square - 4, start_square - 1)
+            self._put_piece(rook_start, self._remove_piece(rook_end))
+
+        self._remove_piece(end_square)  # The moved piece or the piece a pawn was promoted to
+        self._put_piece(start_square, piece)
+        if captured:
+            self._put_piece(captured_square, captured)
+
+        self.turn = piece.color
+        self.castling_rights = castling_rights
+        self.en_passant_square = en_passant_square
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self.white_king_position = white_king_position
+        self.black_king_position = black_king_position
+        self.stalemate = stalemate
+        self.zobrist_key = zobrist_key
+        self.key_history.pop()
+
+    def make_null_move(self) -> None:
+        """Pass the turn without moving, for the null move pruning of the search. The en passant square is
+        cleared and the halfmove clock restarts, so no repetition is found across the null move.
+        Its undo entry is a 3-tuple, see unmake_to()."""
+        self.undo_stack.append((self.en_passant_square, self.halfmove_clock, self.zobrist_key))
+        self.key_history.append(self.zobrist_key)
+        self.setEnPassantSquare(None)
+        self.halfmove_clock = 0
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        self.zobrist_key ^= ZOBRIST_TURN_KEY
+
+    def unmake_null_move(self) -> None:
+        """Take back the last null move played by make_null_move()."""
+        self.en_passant_square, self.halfmove_clock, self.zobrist_key = self.undo_stack.pop()
+        self.key_history.pop()
+        self.turn = 'black' if self.turn == 'white' else 'white'
+
+    def position_error(self) -> Optional[str]:
+        """Return why the position can't be played (a missing or extra king, pawns on the first or last rank,
+        the side that isn't to move in check), or None if it is a legal position."""
+        for color in ('white', 'black'):
+            if popcount(self.bitboards[color]['king']) != 1:
+                return f"{color} must have exactly one king"
+            if self.bitboards[color]['pawn'] & (RANK_1 | RANK_8):
+                return f"{color} has a pawn on the first or last rank"
+        if self.is_in_check('black' if self.turn == 'white' else 'white'):
+            return "the side that isn't to move is in check"
+        return None
+
+    def unmake_to(self, length: int) -> None:
+        """Take back the moves and the null moves played until the undo stack has the given length, e.g. when
+        a search is stopped in the middle of a line. The entries of null moves are the short ones."""
+        while len(self.undo_stack) > length:
+            if len(self.undo_stack[-1]) == 3:
+                self.unmake_null_move()
+            else:
+                self.unmake_move()
 
     def has_legal_moves(self, color: str, engineFlag=False) -> bool:
         """Determine if the player has any legal moves remaining.
-        If the king is in check, check if there is a way to escape check (either by moving the king,
-        blocking the check, or capturing the checking piece). If no escape is possible, declare checkmate.
+        If the king is in check and no legal move escapes it, declare checkmate.
         If the player has no legal moves but isn't in check, declare stalemate."""
-        # Get the king instance for the current player
-        king_position: Tuple[int, int] = self.white_king_position if color == 'white' else self.black_king_position
-        king: King = self.board[king_position[0]][king_position[1]]
-        opponent_color = 'black' if color == 'white' else 'white'
-
-        # Ensure the king is correctly retrieved
-        if not isinstance(king, King):
-            self.display()
-            raise ValueError(f"Expected a King at position {king_position} but found {type(king).__name__}")
+        in_check: bool = self.is_in_check(color)
 
-        # Check if the king is currently in check 
-        in_check: bool = king.is_in_check(color, self)
-        protected_piece = False  # Flag to check if the piece that is checking the king is protected
+        if self.generate_moves(color):
+            if (in_check and not engineFlag):
+                print(f"{color.capitalize()} is in check.")
+            return True
 
-        # Check if the king can escape check by moving to a different square
         if in_check:
-            # Identify the piece that is checking the king
-            checking_position, checking_piece = king.get_checking_piece(king_position, opponent_color, self)
-            checking_position: Tuple[int, int]
-            checking_piece: ChessPiece
-
-            # Generate all possible moves for the king (1 square in each direction)
-            king_x, king_y = king_position
-            for dx, dy in [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]:
-                new_x, new_y = king_x + dx, king_y + dy
-                # Check if the square that the king is trying to move to is inside the board
-                if (0 <= new_x <= 7 and 0 <= new_y <= 7):
-                    # Checks if the square that the king is trying to move to is blocked
-                    if self.board[new_x][new_y] is None or self.board[new_x][new_y].color == opponent_color:
-                        # Move the king to that square temporarily
-                        piece: ChessPiece = self.board[new_x][new_y]
-                        self.board[new_x][new_y] = self.board[king_x][king_y]
-                        self.board[king_x][king_y] = None
-
-                        # Temporarily update the king position
-                        king_position: Tuple[int, int] = new_x, new_y
-                        if (color == 'white'):
-                            self.white_king_position = king_position
-                        else:
-                            self.black_king_position = king_position
-
-                        # Check if this move takes the king out of check
-                        if not king.is_in_check(color, self):
-                            # Undo the move and return True (legal escape found)
-                            self.board[king_x][king_y] = self.board[new_x][new_y]
-                            self.board[new_x][new_y] = piece
-
-                            # Change the king position back to the original value
-                            king_position = king_x, king_y
-                            if (color == 'white'):
-                                self.white_king_position = king_position
-                            else:
-                                self.black_king_position = king_position
-
-                            if not engineFlag:
-                                print(f"{color.capitalize()} is in check.")
-                            return True
-
-                        # Undo the move
-                        self.board[king_x][king_y] = self.board[new_x][new_y]
-                        self.board[new_x][new_y] = piece
-
-                        # Change the king position back to the original value
-                        king_position = king_x, king_y
-                        if (color == 'white'):
-                            self.white_king_position = king_position
-                        else:
-                            self.black_king_position = king_position
-
-            # Check if we can capture the checking piece
-            for pos, piece in self.pieces[color].items():
-                pos: Tuple[int, int]
-                piece: ChessPiece
-
-                if piece.is_valid_move(pos, checking_position, self.board):
-                    # Temporarily update the king position
-                    if isinstance(piece, King):
-                        king_positionPrev: Tuple[int, int] = self.white_king_position if color == 'white' else self.black_king_position
-                        if (color == 'white'):
-                            self.white_king_position = checking_position
-                        else:
-                            self.black_king_position = checking_position
-
-                    # Temporarily make the capture
-                    captured_piece: ChessPiece = self.board[checking_position[0]][checking_position[1]]
-                    self.board[checking_position[0]][checking_position[1]] = piece
-                    self.board[pos[0]][pos[1]] = None
-                    del self.pieces[opponent_color][checking_position]
-
-                    if not king.is_in_check(color, self):
-                        # Undo move and return True (legal move found)
-                        self.board[pos[0]][pos[1]] = piece
-                        self.board[checking_position[0]][checking_position[1]] = captured_piece
-                        self.pieces[opponent_color][checking_position] = captured_piece
-
-                        # Change the king position back to the original value
-                        if isinstance(piece, King):
-                            if (color == 'white'):
-                                self.white_king_position = king_positionPrev
-                            else:
-                                self.black_king_position = king_positionPrev
-
-                        if not engineFlag:
-                            print(f"{color.capitalize()} is in check.")
-                        return True
-
-                    # Undo the move
-                    self.board[pos[0]][pos[1]] = piece
-                    self.board[checking_position[0]][checking_position[1]] = captured_piece
-                    self.pieces[opponent_color][checking_position] = captured_piece
-
-                    # Change the king position back to the original value
-                    if isinstance(piece, King):
-                        if (color == 'white'):
-                            self.white_king_position = king_positionPrev
-                        else:
-                            self.black_king_position = king_positionPrev
-
-            # Check if we can block the check by moving a piece between the king and the checking piece
-            if isinstance(checking_piece, (Rook, Bishop, Queen)):
-                blocking_squares: list[Tuple[int, int]] = king.get_blocking_squares(king_position, checking_position)
-                for pos, piece in self.pieces[color].items():
-                    pos: Tuple[int, int]
-                    piece: ChessPiece
-
-                    for square in blocking_squares:
-                        square: Tuple[int, int]
-
-                        if not isinstance(piece, King) and piece.is_valid_move(pos, square, self.board):
-                            # Temporarily make the block
-                            original_piece: ChessPiece = self.board[square[0]][square[1]]
-                            self.board[square[0]][square[1]] = piece
-                            self.board[pos[0]][pos[1]] = None
-
-                            if not king.is_in_check(color, self):
-                                # Undo move and return True (legal move found)
-                                self.board[pos[0]][pos[1]] = piece
-                                self.board[square[0]][square[1]] = original_piece
-
-                                if not engineFlag:
-                                    print(f"{color.capitalize()} is in check.")
-                                return True
-
-                            # Undo the move
-                            self.board[pos[0]][pos[1]] = piece
-                            self.board[square[0]][square[1]] = original_piece
-
             # No legal moves were found and the king is in check, so it's checkmate
             if not engineFlag:
                 print(f"Checkmate! {('Black' if color == 'white' else 'White')} wins!")
             return False
 
-        # If not in check, check for any legal moves (stalemate)
-        for pos, piece in self.pieces[color].items():
-            pos: Tuple[int, int]
-            piece: ChessPiece
-
-            for dx in range(8):
-                for dy in range(8):
-                    if piece.is_valid_move(pos, (dx, dy), self.board):
-                        # Temporarily update the king position
-                        if isinstance(piece, King):
-                            king_positionPrev: Tuple[int, int] = self.white_king_position if color == 'white' else self.black_king_position
-                            if (color == 'white'):
-                                self.white_king_position = (dx, dy)
-                            else:
-                                self.black_king_position = (dx, dy)
-
-                        # Temporarily make the move
-                        target_piece: ChessPiece = self.board[dx][dy]
-                        self.board[dx][dy] = piece
-                        self.board[pos[0]][pos[1]] = None
-                        if (target_piece and target_piece.color == opponent_color and not isinstance(target_piece, King)):
-                            del self.pieces[opponent_color][(dx, dy)]
-
-                        # Check if this move leaves the king in check
-                        if not king.is_in_check(color, self):
-                            # Undo the move and return True (legal move found)
-                            self.board[pos[0]][pos[1]] = piece
-                            self.board[dx][dy] = target_piece
-                            if target_piece and target_piece.color == opponent_color and not isinstance(target_piece, King):
-                                self.pieces[opponent_color][(dx, dy)] = target_piece
-                            
-                            # Change the king position back to the original value
-                            if isinstance(piece, King):
-                                if (color == 'white'):
-                                    self.white_king_position = king_positionPrev
-                                else:
-                                    self.black_king_position = king_positionPrev
-                            return True
-
-                        # Undo the move
-                        self.board[pos[0]][pos[1]] = piece
-                        self.board[dx][dy] = target_piece
-                        if (target_piece and target_piece.color == opponent_color and not isinstance(target_piece, King)):
-                            self.pieces[opponent_color][(dx, dy)] = target_piece
-
-                        # Change the king position back to the original value
-                        if isinstance(piece, King):
-                            if (color == 'white'):
-                                self.white_king_position = king_positionPrev
-                            else:
-                                self.black_king_position = king_positionPrev
-
         # No legal moves were found and the king is not in check, so it's stalemate
         if not engineFlag:
             print("Stalemate! The game is a draw.")
@@ -871,58 +914,171 @@ class ChessBoard:
             self.stalemate = True
         return False
 
-    def generate_legal_moves(self, color: str, flag=False) -> list[Dict[str, Tuple[int, int]]]:
+    def generate_moves(self, color: str, captures_only: bool = False, moves: Optional[array] = None) -> array:
+        """Generate the legal moves of the given color as compact 16-bit integers (see bitboard.encode_move())
+        in an array('H'). The squares of every piece come from the attack bitboards, and the moves are made legal with
+        the checkers and the pinned pieces, so no move is played to test it. Only the king moves and
+        the en passant captures, which can uncover an attack along the rank, are tested on the bitboards.
+        A promotion is generated once per piece, the queen first.
+        captures_only: generate only the captures (en passant included) and the queen promotions.
+        moves: array the moves are written to instead of a new one (its content is replaced), so the search can
+        reuse a buffer per ply."""
+        if moves is None:
+            moves = array('H')
+        else:
+            del moves[:]
+        opponent_color = 'black' if color == 'white' else 'white'
+        own: int = self.occupancy[color]
+        enemies: int = self.occupancy[opponent_color]
+        occupied: int = self.occupied
+        opponent: Dict[str, int] = self.bitboards[opponent_color]
+        king_square: int = self.bitboards[color]['king'].bit_length() - 1
+        targets_mask: int = enemies if captures_only else FULL_BOARD
+
+        # The king can go to any square that isn't attacked once it has left its square
+        without_king: int = occupied ^ (1 << king_square)
+        for end in iter_squares(KING_ATTACKS[king_square] & ~own & targets_mask):
+            if not self.attackers_to(end, opponent_color, without_king):
+                moves.append(end | king_square << 6 | (CAPTURE_FLAG if (enemies >> end) & 1 else 0))
+
+        checkers: int = self.attackers_to(king_square, opponent_color)
+        if checkers & (checkers - 1):
+            return moves  # Double check, only the king can move
+
+        if checkers:
+            # The other pieces must capture the checking piece or block its line
+            evasion_mask: int = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            evasion_mask: int = FULL_BOARD
+            if not captures_only:
+                for end in iter_squares(self.castling_targets(color)):
+                    moves.append(encode_move(king_square, end, CASTLING_FLAG))
+
+        # A piece is pinned if it is the only piece between the king and an enemy slider
+        pinned = 0
+        snipers: int = ((rook_attacks(king_square, enemies) & (opponent['rook'] | opponent['queen'])) |
+                        (bishop_attacks(king_square, enemies) & (opponent['bishop'] | opponent['queen'])))
+        for sniper in iter_squares(snipers):
+            blockers: int = BETWEEN[king_square][sniper] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+
+        en_passant_bit = 0
+        if self.en_passant_square:
+            en_passant_bit = 1 << square_index(parse_position(self.en_passant_square))
+        promotion_rank: int = RANK_8 if color == 'white' else RANK_1
+        promotion_kinds: Tuple[int, ...] = (4,) if captures_only else (4, 1, 3, 2)  # Queen, knight, rook, bishop
+
+        for piece_type, bitboard in self.bitboards[color].items():
+            piece_type: str
+            bitboard: int
+
+            if piece_type == 'king':
+                continue
+            for start in iter_squares(bitboard):
+                targets: int = self.piece_targets(start, piece_type, color)
+                en_passant: int = 0
+                if piece_type == 'pawn':
+                    en_passant = targets & en_passant_bit
+                    targets &= (targets_mask | promotion_rank) & ~en_passant_bit
+                else:
+                    targets &= targets_mask
+                targets &= evasion_mask
+                if (pinned >> start) & 1:
+                    targets &= LINE[king_square][start]  # A pinned piece can only move along the pin
+
+                origin: int = start << 6
+                if piece_type != 'pawn':
+                    for end in iter_squares(targets):
+                        moves.append(end | origin | (CAPTURE_FLAG if (enemies >> end) & 1 else 0))
+                    continue
+
+                for end in iter_squares(targets):
+                    move: int = end | origin | (CAPTURE_FLAG if (enemies >> end) & 1 else 0)
+                    if (promotion_rank >> end) & 1:
+                        for kind in promotion_kinds:
+                            moves.append(move | kind << 12)
+                    elif abs(end - start) == 16:
+                        moves.append(move | DOUBLE_PUSH_FLAG << 12)
+                    else:
+                        moves.append(move)
+                if en_passant:
+                    end: int = en_passant.bit_length() - 1
+                    if self.is_legal_move(start, end, color):
+                        moves.append(encode_move(start, end, EN_PASSANT_FLAG, True))
+        return moves
+
+    def generate_legal_moves(self, color: str, flag=False) -> List[Dict[str, Tuple[int, int]]]:
         """Generate all legal moves for the given color and returns them 
         as a list in the format {'start': (x1, y1), 'end': (x2, y2)}."""
-        legal_moves = []
-
-        # Determine the active pieces for the color and create a deep copy of them to avoid modifications during the loop
-        active_pieces: Dict[Tuple[int, int], ChessPiece] = deepcopy(self.pieces['white'] if color == 'white' else self.pieces['black'])
-
-        # Iterate over each piece type and their positions
-        for pos, piece in active_pieces.items():
-            pos: Tuple[int, int]
-            piece: ChessPiece
-
-            if not piece:
-                continue
-
-            # Check all the possible moves for the each piece type
-            for move in piece.legal_moves(pos, color):
-                move: Tuple[int, int]
+        return [{'start': square_position(move_start(move)), 'end': square_position(move_end(move))}
+                for move in self.generate_moves(color) if not 1 <= move_kind(move) <= 3]
+
+    def generate_captures(self, color: str, moves: Optional[array] = None) -> array:
+        """Generate the legal captures (en passant included) and queen promotions for the given color as compact integers.
+        Used by the quiescence search, the quiet moves and the underpromotions are never generated."""
+        return self.generate_moves(color, True, moves)
+
+    def promotion_choices(self, move: Union[int, Dict[str, Tuple[int, int]]]) -> Tuple[str, ...]:
+        """Return the pieces a move (compact or {'start', 'end'}) can promote to, ('queen',) for moves that aren't promotions."""
+        if isinstance(move, dict):
+            move = encode_move(square_index(move['start']), square_index(move['end']))
+        piece: ChessPiece = self.squares[move_start(move)]
+        if piece.piece_type == 'pawn' and move_end(move) >> 3 in (0, 7):
+            return PROMOTION_CHOICES
+        return ('queen',)
+
+    def perft(self, depth: int) -> int:
+        """Count the leaf nodes of the tree of legal moves of the given depth (every promotion piece counts).
+        It is used to check the move generator against known node counts and to measure its speed."""
+        if depth == 0:
+            return 1
+        moves: array = self.generate_moves(self.turn)
+        if depth == 1:
+            return len(moves)  # Every leaf is a legal move, no need to play it
+
+        nodes = 0
+        for move in moves:
+            self.make_compact_move(move)
+            nodes += self.perft(depth - 1)
+            self.unmake_move()
+        return nodes
+
+    def divide(self, depth: int) -> Dict[str, int]:
+        """Return the perft node count below every legal move, in UCI "e2e4" format."""
+        result = {}
+        for move in self.generate_moves(self.turn):
+            move: int
 
-                # Make the move temporarily to check for legality
-                if self.move_piece(pos, move, color, True):
-                    legal_moves.append({'start': pos, 'end': move})
-        return legal_moves
+            self.make_compact_move(move)
+            result[move_to_uci(move)] = self.perft(depth - 1)
+            self.unmake_move()
+        return result
 
     def undo_move(self, start: Tuple[int, int], end: Tuple[int, int], color: str, target_piece: Optional[ChessPiece]) -> None:
         """Undo a move that was made."""
         start_x, start_y = start
         end_x, end_y = end
-        piece: ChessPiece = self.board[end_x][end_y]
-        self.board[end_x][end_y] = None
-        self.board[start_x][start_y] = piece
+        piece: ChessPiece = self._remove_piece(square_index(end))
+        self._put_piece(square_index(start), piece)
 
         # Check if the was a piece at the end square
         if target_piece:
-            self.board[end_x][end_y] = target_piece
+            self._put_piece(square_index(end), target_piece)
 
         # Check for castling move
         if isinstance(piece, King) and abs(start_x - end_x) == 2 and start_y == end_y:
             # Kingside castling
             if (end_x == 6):
-                self.board[7][start_y] = self.board[5][start_y]
-                self.board[5][start_y] = None
+                self._put_piece(square_index((7, start_y)), self._remove_piece(square_index((5, start_y))))
             # Queenside castling
             elif (end_x == 2):
-                self.board[0][start_y] = self.board[3][start_y]
-                self.board[3][start_y] = None
+                self._put_piece(square_index((0, start_y)), self._remove_piece(square_index((3, start_y))))
 
         # Check for en passant move
         if (isinstance(piece, Pawn) and start_x != end_x and not target_piece):
             opponent_color = 'black' if color == 'white' else 'white'
-            self.board[end_x][start_y] = Pawn(opponent_color)
+            self._put_piece(square_index((end_x, start_y)), Pawn(opponent_color))
 
     def undo_moves(self) -> None:
         """This method restores the board to its previous states using the FEN stack. It's slower than undo_move."""
@@ -932,4 +1088,3 @@ class ChessBoard:
         # Pop the last FEN string and restore the board state
         last_fen: str = self.fen_stack.pop()
         self.from_fen(last_fen)
- 
\ No newline at end of file
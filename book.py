@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+# Builds Polyglot opening books from PGN game collections and merges existing books.
+# Run "python3 book.py build games.pgn -o book.bin" to count the moves played in the first plies of the games,
+# or "python3 book.py merge a.bin b.bin -o book.bin" to combine books. The games are parsed on all cores and the
+# counts are sorted externally (sorted runs on disk merged at the end), so inputs of any size fit in memory.
+
+import argparse
+import heapq
+import multiprocessing
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from itertools import groupby
+from typing import Optional, Dict, Tuple, Iterable, Iterator, List, Set
+from bitboard import move_start, move_end, move_kind, CASTLING_FLAG
+from board import ChessBoard
+from pgn import split_games, parse_game, start_board, parse_san
+from polyglot import Polyglot
+
+DEFAULT_MAX_PLY = 30  # Moves played after this ply aren't counted
+DEFAULT_MIN_COUNT = 1  # Moves played fewer times in a position are left out of the book
+DEFAULT_CHUNK_ENTRIES = 2_000_000  # Distinct (position, move) counts held in memory before a sorted run is written
+GAMES_PER_JOB = 500  # Games sent to a worker at once
+JOBS_PER_WORKER = 4  # Jobs queued per worker, so workers never wait while the input is read
+MERGE_FAN_IN = 64  # Runs merged at once, more runs are merged in several passes
+MAX_WEIGHT = 0xFFFF  # Weights are 16-bit, the most played move of a position gets this weight when counts overflow
+
+RUN_ENTRY = struct.Struct('>QHI')  # Zobrist key, Polyglot move and count of a sorted run
+RUN_BLOCK_ENTRIES = 4096  # Entries read from a run at once
+
+worker_board: Optional[ChessBoard] = None  # Board of a worker process, reused by all its games
+
+
+def polyglot_move(move: int) -> int:
+    """Convert a compact move to a Polyglot move: the same squares and promotion code, with castling encoded as
+    the king taking its own rook (e1h1 instead of e1g1)."""
+    start: int = move_start(move)
+    end: int = move_end(move)
+    kind: int = move_kind(move)
+    if kind == CASTLING_FLAG:
+        end = (end & 56) | (7 if end & 7 == 6 else 0)
+    return end | start << 6 | (kind << 12 if 1 <= kind <= 4 else 0)
+
+
+def count_positions(texts: List[str], max_ply: int) -> Dict[Tuple[int, int], int]:
+    """Count the (Zobrist key, Polyglot move) pairs of the first max_ply plies of the games on a worker process.
+    A game is counted up to its first move that can't be parsed."""
+    global worker_board
+    if worker_board is None:
+        worker_board = ChessBoard()
+    board: ChessBoard = worker_board
+    counts: Dict[Tuple[int, int], int] = {}
+    for text in texts:
+        headers, san_moves = parse_game(text)
+        try:
+            start_board(headers, board)
+            for san in san_moves[:max_ply]:
+                move: int = parse_san(board, san)
+                entry: Tuple[int, int] = (board.zobrist_key, polyglot_move(move))
+                counts[entry] = counts.get(entry, 0) + 1
+                board.make_compact_move(move)
+        except (ValueError, IndexError, KeyError):
+            continue
+    return counts
+
+
+def write_run(counts: Dict[Tuple[int, int], int], directory: str) -> str:
+    """Write the counts sorted by key and move to a new run file in the directory and return its path."""
+    descriptor, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    with os.fdopen(descriptor, 'wb') as run:
+        pack = RUN_ENTRY.pack
+        for (key, move), count in sorted(counts.items()):
+            run.write(pack(key, move, count))
+    return path
+
+
+def read_run(path: str) -> Iterator[Tuple[int, int, int]]:
+    """Yield the (key, move, count) entries of a run file, a block at a time."""
+    with open(path, 'rb') as run:
+        while True:
+            block: bytes = run.read(RUN_ENTRY.size * RUN_BLOCK_ENTRIES)
+            if not block:
+                break
+            yield from RUN_ENTRY.iter_unpack(block)
+
+
+def sum_counts(entries: Iterable[Tuple[int, int, int]]) -> Iterator[Tuple[int, int, int]]:
+    """Add up the counts of the consecutive entries with the same key and move (the entries are sorted)."""
+    for (key, move), group in groupby(entries, key=lambda entry: (entry[0], entry[1])):
+        yield key, move, sum(entry[2] for entry in group)
+
+
+def merge_runs(paths: List[str], directory: str) -> Iterator[Tuple[int, int, int]]:
+    """Merge the sorted runs into one sorted stream of entries with the counts of equal entries added up.
+    Beyond MERGE_FAN_IN runs, groups of runs are first merged into larger runs so few files are open at once."""
+    while len(paths) > MERGE_FAN_IN:
+        merged: list[str] = []
+        for first in range(0, len(paths), MERGE_FAN_IN):
+            group: list[str] = paths[first:first + MERGE_FAN_IN]
+            descriptor, path = tempfile.mkstemp(suffix='.run', dir=directory)
+            with os.fdopen(descriptor, 'wb') as run:
+                for entry in sum_counts(heapq.merge(*(read_run(run_path) for run_path in group))):
+                    run.write(RUN_ENTRY.pack(*entry))
+            for run_path in group:
+                os.remove(run_path)
+            merged.append(path)
+        paths = merged
+    return sum_counts(heapq.merge(*(read_run(path) for path in paths)))
+
+
+def scale_weights(weights: Dict[int, float]) -> Dict[int, int]:
+    """Convert the weights of the moves of a position to 16-bit weights. They are kept as they are if they fit,
+    otherwise scaled so the heaviest move gets MAX_WEIGHT. A move with a positive weight keeps at least 1."""
+    heaviest: float = max(weights.values(), default=0)
+    if heaviest <= MAX_WEIGHT and all(float(weight).is_integer() for weight in weights.values()):
+        return {move: int(weight) for move, weight in weights.items()}
+    return {move: max(1, round(weight * MAX_WEIGHT / heaviest)) if weight > 0 else 0 for move, weight in weights.items()}
+
+
+def write_book(positions: Iterable[Tuple[int, Dict[int, float]]], output_path: str) -> int:
+    """Write the positions (key and weight of every move, sorted by key) as a Polyglot book and return the number
+    of entries. The moves of a position are written heaviest first. The book is written to a temporary file
+    and renamed, so readers never see a partial book."""
+    entry_count = 0
+    temporary_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as book:
+        pack = Polyglot.ENTRY_FORMAT.pack
+        for key, weights in positions:
+            for move, weight in sorted(scale_weights(weights).items(), key=lambda item: (-item[1], item[0])):
+                book.write(pack(key, move, weight, 0))
+                entry_count += 1
+    os.replace(temporary_path, output_path)
+    return entry_count
+
+
+def read_book(path: str) -> Iterator[Tuple[int, int, int]]:
+    """Yield the (key, move, weight) entries of a Polyglot book in file order (sorted by key)."""
+    with open(path, 'rb') as book:
+        while True:
+            block: bytes = book.read(Polyglot.ENTRY_SIZE * RUN_BLOCK_ENTRIES)
+            if len(block) < Polyglot.ENTRY_SIZE:
+                break
+            for key, move, weight, _ in Polyglot.ENTRY_FORMAT.iter_unpack(block[:len(block) - len(block) % Polyglot.ENTRY_SIZE]):
+                yield key, move, weight
+
+
+def read_pgn_games(paths: Iterable[str]) -> Iterator[str]:
+    """Yield the text of every game of the PGN files ("-" for stdin), one game at a time."""
+    for path in paths:
+        stream = sys.stdin if path == "-" else open(path, encoding='utf-8', errors='replace')
+        try:
+            yield from split_games(stream)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def build_book(pgn_paths: List[str], output_path: str, max_ply: int = DEFAULT_MAX_PLY, min_count: int = DEFAULT_MIN_COUNT,
+               workers: Optional[int] = None, chunk_entries: int = DEFAULT_CHUNK_ENTRIES) -> int:
+    """Build a Polyglot book of the moves played in the first max_ply plies of the games of the PGN files and
+    return its number of entries. The weight of a move is the number of games it was played in, moves
+    played fewer than min_count times are left out.
+    The games are parsed on a pool of worker processes. The counts are gathered in memory up to chunk_entries
+    distinct entries, then written as a sorted run to a temporary directory, and the runs are merged into the book."""
+    workers = workers or os.cpu_count() or 1
+    directory: str = tempfile.mkdtemp(prefix='book-', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        runs: list[str] = []
+        counts: Dict[Tuple[int, int], int] = {}
+
+        def gather(done: Set[Future]) -> None:
+            for future in done:
+                for entry, count in future.result().items():
+                    counts[entry] = counts.get(entry, 0) + count
+            if len(counts) >= chunk_entries:
+                runs.append(write_run(counts, directory))
+                counts.clear()
+
+        # Spawned workers don't inherit the locks of the caller's threads
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pending: set[Future] = set()
+            batch: list[str] = []
+            for text in read_pgn_games(pgn_paths):
+                batch.append(text)
+                if len(batch) >= GAMES_PER_JOB:
+                    pending.add(pool.submit(count_positions, batch, max_ply))
+                    batch = []
+                    if len(pending) >= workers * JOBS_PER_WORKER:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        gather(done)
+            if batch:
+                pending.add(pool.submit(count_positions, batch, max_ply))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                gather(done)
+        if counts:
+            runs.append(write_run(counts, directory))
+            counts.clear()
+
+        positions = ((key, {move: count for _, move, count in group if count >= min_count})
+                     for key, group in groupby(merge_runs(runs, directory), key=lambda entry: entry[0]))
+        return write_book(((key, weights) for key, weights in positions if weights), output_path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def merge_books(book_paths: List[str], output_path: str, book_weights: Optional[List[float]] = None) -> int:
+    """Merge Polyglot books into one and return its number of entries. The weights of every position are
+    normalized in each book (they add up to 1), so books with large counts don't drown the others, then
+    multiplied by the weight of the book and added up. The books are read as sorted streams, in constant memory."""
+    book_weights = book_weights or [1.0] * len(book_paths)
+    if len(book_weights) != len(book_paths):
+        raise ValueError("merge_books needs one weight per book.")
+
+    def tagged(index: int) -> Iterator[Tuple[int, int, int, int]]:
+        for key, move, weight in read_book(book_paths[index]):
+            yield key, index, move, weight
+
+    def positions() -> Iterator[Tuple[int, Dict[int, float]]]:
+        entries = heapq.merge(*(tagged(index) for index in range(len(book_paths))), key=lambda entry: entry[0])
+        for key, position in groupby(entries, key=lambda entry: entry[0]):
+            weights: Dict[int, float] = {}
+            for index, book_entries in groupby(sorted(position, key=lambda entry: entry[1]), key=lambda entry: entry[1]):
+                book_entries = list(book_entries)
+                total: int = sum(entry[3] for entry in book_entries)
+                for _, _, move, weight in book_entries:
+                    share: float = book_weights[index] * weight / total if total else 0.0
+                    weights[move] = weights.get(move, 0.0) + share
+            if any(weights.values()):
+                yield key, weights
+
+    return write_book(positions(), output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build Polyglot opening books from PGN files or merge books.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="build a book from PGN game collections")
+    build_parser.add_argument("pgn", nargs="+", help="PGN files, - for stdin")
+    build_parser.add_argument("-o", "--output", required=True, help="Polyglot book to write")
+    build_parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY,
+                              help=f"count the moves of the first plies of every game only (default: {DEFAULT_MAX_PLY})")
+    build_parser.add_argument("--min-count", type=int, default=DEFAULT_MIN_COUNT,
+                              help=f"leave out the moves played fewer times in a position (default: {DEFAULT_MIN_COUNT})")
+    build_parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of cores)")
+    build_parser.add_argument("--chunk-entries", type=int, default=DEFAULT_CHUNK_ENTRIES,
+                              help=f"counts held in memory before a sorted run is written to disk (default: {DEFAULT_CHUNK_ENTRIES})")
+
+    merge_parser = commands.add_parser("merge", help="merge Polyglot books with normalized weights")
+    merge_parser.add_argument("books", nargs="+", help="Polyglot books to merge")
+    merge_parser.add_argument("-o", "--output", required=True, help="Polyglot book to write")
+    merge_parser.add_argument("--weights", type=lambda value: [float(weight) for weight in value.split(',')], default=None,
+                              help="comma-separated weight of every book (default: 1 each)")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        entry_count = build_book(args.pgn, args.output, args.max_ply, args.min_count, args.workers, args.chunk_entries)
+    else:
+        if args.weights and len(args.weights) != len(args.books):
+            parser.error("--weights needs one weight per book")
+        entry_count = merge_books(args.books, args.output, args.weights)
+    print(f"{entry_count} entries written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
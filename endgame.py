@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+
+# Endgame tables of a few material sets (KQK, KRK, KPK and KBNK), generated by retrograde analysis.
+# Every position of a table is one byte: 0 for a draw, 255 for an illegal position, otherwise the number of plies
+# to the end of the won line plus one, for the side to move (the stronger side wins, the lone king loses).
+# The end is the checkmate in the pawnless tables and the promotion to a winning queen or rook in KPK.
+# All tables are written to one binary file, memory-mapped by the engine and probed in O(1) during the search.
+# Run "python3 endgame.py" once to generate them (KBNK takes a few minutes).
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Optional, Dict, Tuple, Iterable, List, Set
+from bitboard import (ATTACK_CACHE_PATH, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, bishop_attacks, rook_attacks,
+                      queen_attacks, iter_squares, popcount)
+from board import ChessBoard
+
+# Pieces of the stronger side (besides its king) in every table, the weaker side only has its king
+ENDGAME_TABLES: Dict[str, Tuple[str, ...]] = {
+    'KQK': ('queen',),
+    'KRK': ('rook',),
+    'KPK': ('pawn',),
+    'KBNK': ('bishop', 'knight'),
+}
+ENDGAME_MAX_PIECES = 4  # Positions with more pieces (kings included) are never in a table
+
+ENDGAME_TABLE_VERSION = 1
+ENDGAME_TABLE_PATH = os.path.join(os.path.dirname(ATTACK_CACHE_PATH), f'endgame-tables-{ENDGAME_TABLE_VERSION}.bin')
+FILE_MAGIC = b'CEGT'
+FILE_HEADER = struct.Struct('<4sII')  # Magic, version and number of tables
+TABLE_HEADER = struct.Struct('<8sBQQ')  # Name, whether the distance is to mate, offset and size of the table
+
+DRAW = 0
+ILLEGAL = 255
+ESCAPE = 255  # Move counter of a position where the lone king can take a piece, so it is never lost
+
+WHITE, BLACK = 0, 1  # Side to move in the index, the stronger side is always white in the tables
+
+# The 8 symmetries of the board (mirror of the files, of the ranks and of the a1-h8 diagonal) as square maps
+SYMMETRIES: List[List[int]] = []
+for transpose in (False, True):
+    for flip_x in (False, True):
+        for flip_y in (False, True):
+            symmetry = []
+            for square in range(64):
+                x, y = square & 7, square >> 3
+                if transpose:
+                    x, y = y, x
+                symmetry.append((7 - x if flip_x else x) + 8 * (7 - y if flip_y else y))
+            SYMMETRIES.append(symmetry)
+MIRROR_FILES: List[int] = SYMMETRIES[2]  # a <-> h, kept by the tables with pawns
+
+# In the pawnless tables the stronger king is moved to the a1-d1-d4 triangle, which holds 10 squares
+TRIANGLE = [x + 8 * y for y in range(4) for x in range(y, 4)]
+TRIANGLE_INDEX: Dict[int, int] = {square: index for index, square in enumerate(TRIANGLE)}
+KING_SYMMETRIES: List[List[List[int]]] = [[symmetry for symmetry in SYMMETRIES if symmetry[square] in TRIANGLE_INDEX]
+                                          for square in range(64)]
+
+
+def piece_attacks(piece_type: str, square: int, occupied: int) -> int:
+    """Return the squares a white piece attacks."""
+    if piece_type == 'pawn':
+        return PAWN_ATTACKS['white'][square]
+    if piece_type == 'knight':
+        return KNIGHT_ATTACKS[square]
+    if piece_type == 'bishop':
+        return bishop_attacks(square, occupied)
+    if piece_type == 'rook':
+        return rook_attacks(square, occupied)
+    return queen_attacks(square, occupied)
+
+
+class EndgameTable:
+    """Index of the positions of one material set. A position is the tuple (white king, black king, pieces...)
+    of its squares with the side to move, the symmetric positions share one index."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.pieces: Tuple[str, ...] = ENDGAME_TABLES[name]  # Pieces of the stronger side besides its king
+        self.has_pawns: bool = 'pawn' in self.pieces
+        self.distance_to_mate: bool = not self.has_pawns  # KPK counts the plies to the promotion instead
+        pieces_size: int = 64 ** len(self.pieces)
+        # Without pawns the white king is in the triangle, with a pawn the pawn is on the files a-d and ranks 2-7
+        self.size: int = 2 * (10 * 64 * pieces_size if not self.has_pawns else 64 * 64 * 24)
+
+    def index(self, squares: Tuple[int, ...], side: int) -> int:
+        """Return the index of a position (see the class) and its symmetric positions."""
+        if self.has_pawns:
+            if squares[2] & 7 > 3:
+                squares = tuple(MIRROR_FILES[square] for square in squares)
+            pawn: int = squares[2]
+            return ((side * 64 + squares[0]) * 64 + squares[1]) * 24 + ((pawn >> 3) - 1) * 4 + (pawn & 7)
+
+        # Every symmetry that puts the white king in the triangle gives a candidate, the smallest index is kept
+        best: Optional[int] = None
+        for symmetry in KING_SYMMETRIES[squares[0]]:
+            index: int = side * 10 + TRIANGLE_INDEX[symmetry[squares[0]]]
+            for square in squares[1:]:
+                index = index * 64 + symmetry[square]
+            if best is None or index < best:
+                best = index
+        return best
+
+    def position(self, index: int) -> Tuple[Tuple[int, ...], int]:
+        """Return the squares and the side to move of an index, the inverse of index() for the stored symmetry."""
+        if self.has_pawns:
+            index, pawn = divmod(index, 24)
+            index, black_king = divmod(index, 64)
+            side, white_king = divmod(index, 64)
+            return (white_king, black_king, (pawn >> 2) * 8 + 8 + (pawn & 3)), side
+
+        pieces = []
+        for _ in self.pieces:
+            index, square = divmod(index, 64)
+            pieces.append(square)
+        index, black_king = divmod(index, 64)
+        side, white_king = divmod(index, 10)
+        return (TRIANGLE[white_king], black_king, *reversed(pieces)), side
+
+    def white_attacks(self, squares: Tuple[int, ...], occupied: int, skip: int = -1) -> int:
+        """Return the squares attacked by white, without the piece on the square skip (captured)."""
+        attacks: int = KING_ATTACKS[squares[0]]
+        for piece_type, square in zip(self.pieces, squares[2:]):
+            if square != skip:
+                attacks |= piece_attacks(piece_type, square, occupied)
+        return attacks
+
+    def is_legal(self, squares: Tuple[int, ...], side: int) -> bool:
+        """Check that the pieces are on different squares, the kings aren't next to each other, the pawns are
+        on the ranks 2-7 and the side that isn't to move isn't in check."""
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        if popcount(occupied) != len(squares) or KING_ATTACKS[squares[0]] >> squares[1] & 1:
+            return False
+        if self.has_pawns and not 8 <= squares[2] < 56:
+            return False
+        return side == BLACK or not self.white_attacks(squares, occupied) >> squares[1] & 1
+
+    def black_moves(self, squares: Tuple[int, ...]) -> Tuple[List[int], bool, bool]:
+        """Return the squares the black king can move to without taking, whether it can take a piece
+        (which draws, the stronger side can't win with what is left) and whether it is in check."""
+        black_king: int = squares[1]
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        without_king: int = occupied ^ (1 << black_king)
+        attacked: int = self.white_attacks(squares, without_king)
+
+        can_take = False
+        for square in squares[2:]:
+            if KING_ATTACKS[black_king] >> square & 1 and not self.white_attacks(squares, without_king, square) >> square & 1:
+                can_take = True
+        targets: list[int] = list(iter_squares(KING_ATTACKS[black_king] & ~occupied & ~attacked))
+        return targets, can_take, bool(attacked >> black_king & 1)
+
+    def generate(self, promotion_tables: Optional[Dict[str, bytearray]] = None, log=None) -> bytearray:
+        """Build the table by retrograde analysis and return it.
+        The checkmates (and in KPK the winning promotions) are found first, then the analysis goes back one ply
+        at a time: a white position is won if a move reaches a lost black position, and a black position
+        is lost when all its moves reach won white positions.
+        promotion_tables: the generated KQK and KRK tables, needed by KPK."""
+        values = bytearray(self.size)
+        counters = bytearray(self.size)  # Moves of a black position that don't reach a won position yet, 0 before counting
+        lost: list[int] = []  # Black positions lost at the current ply
+        won: list[int] = []  # White positions won in one ply by a promotion
+
+        queen_table = EndgameTable('KQK')
+        rook_table = EndgameTable('KRK')
+        for index in range(self.size):
+            squares, side = self.position(index)
+            if self.index(squares, side) != index or not self.is_legal(squares, side):
+                values[index] = ILLEGAL  # Illegal, or a symmetric position stored at another index
+            elif side == BLACK:
+                targets, can_take, in_check = self.black_moves(squares)
+                if in_check and not targets and not can_take:
+                    values[index] = 1  # Checkmate
+                    lost.append(index)
+            elif self.has_pawns and squares[2] >= 48:
+                # A promotion that reaches a lost KQK or KRK position wins
+                white_king, black_king, pawn = squares
+                if not (1 << (pawn + 8)) & ((1 << white_king) | (1 << black_king)):
+                    for table, table_values in ((queen_table, promotion_tables['KQK']), (rook_table, promotion_tables['KRK'])):
+                        child: int = table.index((white_king, black_king, pawn + 8), BLACK)
+                        if values_lost(table_values[child]):
+                            values[index] = 2
+                            won.append(index)
+                            break
+
+        plies = 0
+        while lost or won:
+            if log:
+                log(f"{self.name}: {len(lost)} positions lost in {plies} plies")
+
+            # White positions that reach a lost position with one move are won one ply later
+            for index in lost:
+                squares, _ = self.position(index)
+                for predecessor in self.white_predecessors(squares):
+                    if values[predecessor] == DRAW:
+                        values[predecessor] = plies + 2
+                        won.append(predecessor)
+
+            # Black positions whose moves all reach won positions are lost two plies later
+            lost = []
+            for index in won:
+                squares, _ = self.position(index)
+                for predecessor in self.black_predecessors(squares):
+                    if values[predecessor] != DRAW or counters[predecessor] == ESCAPE:
+                        continue
+                    if counters[predecessor] == 0:
+                        counters[predecessor] = self.count_moves(predecessor)
+                        if counters[predecessor] == ESCAPE:
+                            continue
+                    counters[predecessor] -= 1
+                    if counters[predecessor] == 0:
+                        values[predecessor] = plies + 3
+                        lost.append(predecessor)
+            won = []
+            plies += 2
+        return values
+
+    def count_moves(self, index: int) -> int:
+        """Return the number of different positions (up to symmetry) the black king can move to, or ESCAPE
+        if it can take a piece."""
+        squares, _ = self.position(index)
+        targets, can_take, _ = self.black_moves(squares)
+        if can_take:
+            return ESCAPE
+        return len({self.index((squares[0], target, *squares[2:]), WHITE) for target in targets})
+
+    def white_predecessors(self, squares: Tuple[int, ...]) -> Set[int]:
+        """Return the indices of the legal white to move positions that reach the black to move position with one
+        white move. Moves are taken back along the attacks of the piece, which are symmetric, and pawns go back."""
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        empty: int = ~occupied
+        predecessors = set()
+
+        for origin in iter_squares(KING_ATTACKS[squares[0]] & empty):
+            predecessor: Tuple[int, ...] = (origin, *squares[1:])
+            if self.is_legal(predecessor, WHITE):
+                predecessors.add(self.index(predecessor, WHITE))
+
+        for piece, piece_type in enumerate(self.pieces, 2):
+            square: int = squares[piece]
+            if piece_type == 'pawn':
+                origins = []
+                if square >= 16 and empty >> (square - 8) & 1:
+                    origins.append(square - 8)
+                    if square >> 3 == 3 and empty >> (square - 16) & 1:
+                        origins.append(square - 16)  # Double push
+            else:
+                origins = iter_squares(piece_attacks(piece_type, square, occupied) & empty)
+            for origin in origins:
+                predecessor = squares[:piece] + (origin,) + squares[piece + 1:]
+                if self.is_legal(predecessor, WHITE):
+                    predecessors.add(self.index(predecessor, WHITE))
+        return predecessors
+
+    def black_predecessors(self, squares: Tuple[int, ...]) -> Set[int]:
+        """Return the indices of the black to move positions that reach the white to move position with one king move."""
+        occupied = 0
+        for square in squares:
+            occupied |= 1 << square
+        origins: int = KING_ATTACKS[squares[1]] & ~occupied & ~KING_ATTACKS[squares[0]]
+        return {self.index((squares[0], origin, *squares[2:]), BLACK) for origin in iter_squares(origins)}
+
+
+def values_lost(value: int) -> bool:
+    """Check if a table value of a black to move position is a loss."""
+    return value != DRAW and value != ILLEGAL
+
+
+def generate_endgame_tables(names: Iterable[str] = ENDGAME_TABLES, path: str = ENDGAME_TABLE_PATH, log=None) -> None:
+    """Generate the tables and write them to one file (atomically, other processes never see a partial file).
+    KPK needs the KQK and KRK tables, which are generated for it if they aren't requested."""
+    names = list(names)
+    generated: Dict[str, bytearray] = {}
+    for name in sorted(set(names) | ({'KQK', 'KRK'} if 'KPK' in names else set()), key=list(ENDGAME_TABLES).index):
+        start_time = time.perf_counter()
+        generated[name] = EndgameTable(name).generate(generated, log)
+        if log:
+            log(f"{name}: generated in {time.perf_counter() - start_time:.1f}s")
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as output:
+        offset: int = FILE_HEADER.size + TABLE_HEADER.size * len(names)
+        output.write(FILE_HEADER.pack(FILE_MAGIC, ENDGAME_TABLE_VERSION, len(names)))
+        for name in names:
+            output.write(TABLE_HEADER.pack(name.encode(), EndgameTable(name).distance_to_mate, offset, len(generated[name])))
+            offset += len(generated[name])
+        for name in names:
+            output.write(generated[name])
+    os.replace(temporary_path, path)
+
+
+class EndgameTables:
+    """The tables of a file written by generate_endgame_tables(), memory-mapped and probed in O(1)."""
+
+    def __init__(self, path: str = ENDGAME_TABLE_PATH) -> None:
+        with open(path, 'rb') as table_file:
+            self.data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != FILE_MAGIC or version != ENDGAME_TABLE_VERSION:
+            self.data.close()
+            raise ValueError(f"{path} isn't an endgame table file of version {ENDGAME_TABLE_VERSION}.")
+
+        # Tables by the sorted piece types of the stronger side, with their offset in the file
+        self.tables: Dict[Tuple[str, ...], Tuple[EndgameTable, int]] = {}
+        for number in range(count):
+            name, _, offset, size = TABLE_HEADER.unpack_from(self.data, FILE_HEADER.size + number * TABLE_HEADER.size)
+            table = EndgameTable(name.rstrip(b'\0').decode())
+            if size != table.size:
+                raise ValueError(f"The {table.name} table of {path} is damaged.")
+            self.tables[tuple(sorted(table.pieces))] = (table, offset)
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self.data.close()
+
+    def probe(self, board: ChessBoard) -> Optional[Tuple[int, int, bool]]:
+        """Return (result, plies, distance_to_mate) for a position of the tables, None for other positions.
+        result: 1 if the side to move wins, -1 if it loses and 0 for a draw, plies: length of the won line,
+        distance_to_mate: whether the line ends with the checkmate (otherwise with a promotion)."""
+        if popcount(board.occupied) > ENDGAME_MAX_PIECES or any(board.castling_rights.values()):
+            return None
+        strong: str = 'black' if popcount(board.occupancy['white']) == 1 else 'white'
+        weak: str = 'white' if strong == 'black' else 'black'
+        if popcount(board.occupancy[weak]) != 1:
+            return None  # Both sides have pieces
+
+        bitboards: Dict[str, int] = board.bitboards[strong]
+        pieces: Tuple[str, ...] = tuple(sorted(piece_type for piece_type, bitboard in bitboards.items()
+                                               if bitboard and piece_type != 'king'))
+        entry = self.tables.get(pieces)
+        if entry is None or popcount(board.occupancy[strong]) != len(pieces) + 1:
+            return None
+        table, offset = entry
+
+        # The tables have the stronger side as white, a position with black as the stronger side is mirrored
+        squares: Tuple[int, ...] = (bitboards['king'].bit_length() - 1, board.bitboards[weak]['king'].bit_length() - 1,
+                                    *(bitboards[piece_type].bit_length() - 1 for piece_type in table.pieces))
+        if strong == 'black':
+            squares = tuple(square ^ 56 for square in squares)
+        side: int = WHITE if board.turn == strong else BLACK
+        if table.has_pawns and not 8 <= squares[2] < 56:
+            return None  # A pawn on the first or last rank, the index has no room for it
+
+        value: int = self.data[offset + table.index(squares, side)]
+        if value == ILLEGAL:
+            return None
+        if value == DRAW:
+            return 0, 0, table.distance_to_mate
+        return (1 if side == WHITE else -1), value - 1, table.distance_to_mate
+
+
+def load_endgame_tables(path: Optional[str] = ENDGAME_TABLE_PATH) -> Optional[EndgameTables]:
+    """Open the endgame table file, or return None if there is none (it is generated with "python3 endgame.py")."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return EndgameTables(path)
+    except (OSError, ValueError, struct.error):
+        return None  # A damaged file is ignored, the engine searches these endgames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the endgame tables of the engine by retrograde analysis.")
+    parser.add_argument("--tables", type=lambda value: value.upper().split(','), default=list(ENDGAME_TABLES),
+                        help=f"comma-separated tables to generate (default: {','.join(ENDGAME_TABLES)})")
+    parser.add_argument("--output", default=ENDGAME_TABLE_PATH, help=f"table file (default: {ENDGAME_TABLE_PATH})")
+
+    args = parser.parse_args()
+    unknown: list[str] = [name for name in args.tables if name not in ENDGAME_TABLES]
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(unknown)}")
+    generate_endgame_tables(args.tables, args.output, lambda message: print(message, file=sys.stderr))
+    print(f"Endgame tables written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,24 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, Callable, List
 from pieces.piece import ChessPiece
-from pieces.pawn import Pawn
 from pieces.king import King
 from math import inf
-from utils import to_square_notation
-from board import ChessBoard
+from concurrent.futures import ProcessPoolExecutor, Future, wait
+import multiprocessing
+import os
+import time
+from array import array
+from utils import parse_position
+from bitboard import (square_index, iter_squares, popcount, move_start, move_end, move_kind,
+                      move_to_uci, PROMOTION_TYPES, EN_PASSANT_FLAG, CAPTURE_FLAG)
+from psqt import PIECE_VALUES, EVALUATION_SCALE
+from board import ChessBoard, FIFTY_MOVE_PLIES
 from polyglot import Polyglot
+from transposition import TranspositionTable, SharedTranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from timecontrol import TimeManager
+from tablebase import SyzygyTablebase, WIN, LOSS
+from endgame import EndgameTables, load_endgame_tables, ENDGAME_MAX_PIECES
+from searchcache import SearchCache, DEFAULT_MAX_ENTRIES
 
 
 class PolyglotEngine:
@@ -23,14 +35,8 @@ class PolyglotEngine:
             best_move: Optional[str] = None
             best_weight: float = -10
 
-            # Change the format and unpack the variables
-            pieces, pawns = board.changePiecesFormat(board.pieces)
-            pieces: Dict[Tuple[int, int], Tuple[str, str]]
-            pawns: Dict[Tuple[int, int], str]
-            castling_rights: str = board.changeCastlingRightsFormat(board.castling_rights)
-            ep_square: Tuple[int, int] = board.changeEnPassantSquareFormat(board.en_passant_square)
-
-            for weight, uci_move in self.polyglot.reader(board, pieces, castling_rights, ep_square, board.turn, pawns):
+            # The board keeps the Polyglot Zobrist hash of the position up to date
+            for weight, uci_move in self.polyglot.find_entries(board.zobrist_key):
                 weight: float
                 uci_move: str
 
@@ -39,7 +45,14 @@ class PolyglotEngine:
                     best_move = uci_move
 
             if best_move:
-                return f"{best_move[:2]} {best_move[2:]}"  # Convert UCI 'e2e4' to 'e2 e4' format
+                start, end = parse_position(best_move[:2]), parse_position(best_move[2:4])
+                piece: Optional[ChessPiece] = board.board[start[0]][start[1]]
+                target_piece: Optional[ChessPiece] = board.board[end[0]][end[1]]
+
+                # Polyglot encodes castling as the king capturing its own rook (e.g., 'e1h1')
+                if isinstance(piece, King) and target_piece and target_piece.color == piece.color:
+                    return f"{best_move[:2]} {'g' if end[0] == 7 else 'c'}{best_move[3]}"
+                return f"{best_move[:2]} {best_move[2:]}"  # Convert UCI 'e2e4' to 'e2 e4' format ('e7e8q' to 'e7 e8q')
             return None
         except FileNotFoundError:
             print(f"Error: The file '{self.book_path}' was not found.")
@@ -49,354 +62,800 @@ class PolyglotEngine:
             return None
 
 
+MAX_DEPTH = 64  # Deepest iteration of a search that is only limited by time or nodes
+MATE_SCORE = 1000000000  # Score of a checkmate on the board, a mate n plies away scores MATE_SCORE - n
+MATE_THRESHOLD = MATE_SCORE - 1000  # Scores beyond this are mates, no search reaches 1000 plies
+TABLEBASE_WIN_SCORE = MATE_THRESHOLD - 1000  # Score of a tablebase win, below every mate (minus the ply of the position)
+
+# Move ordering scores, every group is searched before the next one
+HASH_MOVE_SCORE = 10000000  # Best move stored in the transposition table
+CAPTURE_SCORE = 1000000  # Captures and promotions, ordered by MVV-LVA
+KILLER_SCORE = 900000  # Quiet moves that caused a cutoff at the same ply
+HISTORY_LIMIT = 800000  # History scores of the quiet moves are kept below the killers
+DELTA_MARGIN = 6  # Safety margin of the delta pruning in evaluation units (two pawns)
+NULL_WINDOW = 0.0001  # Smallest difference between two evaluations (they are rounded to 4 decimals)
+NULL_MOVE_REDUCTION = 2  # Plies the search after a null move is reduced by, on top of the passed move
+NULL_MOVE_MIN_DEPTH = 3  # Shallowest remaining depth where null move pruning is tried
+LMR_REDUCTION = 1  # Plies a late quiet move is reduced by
+LMR_MIN_DEPTH = 3  # Shallowest remaining depth where late moves are reduced
+LMR_MIN_MOVES = 3  # Moves of a node searched with the full depth before the late ones are reduced
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening-book", "baron30.bin")
+
+
+class SearchStopped(Exception):
+    """Raised inside the search when it has to stop because of a stop request, the node limit or the deadline."""
+
+
 class ChessEngine:
     """Evaluate a chess board using a heuristic evaluation and perform Minimax with Alpha-Beta Pruning."""
 
-    def __init__(self) -> None:
+    def __init__(self, hash_size_mb: int = 16, book_path: str = BOOK_PATH) -> None:
         self.numberOfFinishNodes = 0
         self.polyFlag = True  # Should the engine look up the book
-
-        # Assign static values to pieces for the heuristic
-        self.piece_values = {
-            'pawn': 1,
-            'knight': 3,
-            'bishop': 3.5,
-            'rook': 5,
-            'queen': 9,
-            'king': 10000  # King is invaluable for evaluation
-        }
-
-        # Piece-tables. They ensure a quick evaluation of a piece's position
-        self.positional_values = {
-            'pawn': [
-                [0, 0, 0, 0, 0, 0, 0, 0],
-                [3, 3, 3, 3, 3, 3, 3, 3],
-                [1, 1, 2, 2.5, 2.5, 2, 1, 1],
-                [0.5, 0.5, 1, 2, 2, 1, 0.5, 0.5],
-                [0, 0, 0, 1.5, 1.5, 0, 0, 0],
-                [0.8, 0.7, 0.5, -0.5, -0.5, -1, 0.7, 0.8],
-                [0.7, 1, 1, -2, -2, 1, 1, 0.7],
-                [0, 0, 0, 0, 0, 0, 0, 0]
-            ],
-            'knight': [
-                [-5, -4, -3, -3, -3, -3, -4, -5],
-                [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
-                [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
-                [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
-                [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
-                [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
-                [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
-                [-5, -4, -3, -3, -3, -3, -4, -5]
-            ],
-            'bishop': [
-                [-2, -1, -1, -1, -1, -1, -1, -2],
-                [-1.5, 0, 0, 0, 0, 0, 0, -1.5],
-                [-1.5, 0, 0.5, 1, 1, 0.5, 0, -1.5],
-                [-1.5, 1, 0.5, 1, 1, 0.5, 1, -1.5],
-                [-1.5, 0, 1, 1, 1, 1, 0, -1.5],
-                [-1.5, 1, 1, 1, 1, 1, 1, -1.5],
-                [-1, 1, 0, 0, 0, 0, 1, -1],
-                [-1, -1, -1, -1, -1, -1, -1, -1]
-            ],
-            'rook': [
-                [0, 0, 0, 0, 0, 0, 0, 0],
-                [0.7, 1, 1, 1, 1, 1, 1, 0.7],
-                [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
-                [0, 0, 0.2, 0.5, 0.5, 0.2, 0, 0]
-            ],
-            'queen': [
-                [-2, -1, -0.5, -0.5, -0.5, -0.5, -1, -2],
-                [-1, 0, 0, 0, 0, 0, 0, -1],
-                [-1, 0, 0.5, 0.5, 0.5, 0.5, 0, -1],
-                [0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
-                [0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
-                [-1, 0.5, 0.5, 0.5, 0.5, 0.5, 0, -1],
-                [-1, 0, 0.5, 0, 0, 0, 0, -1],
-                [-2, -1, -0.5, -0.5, -0.5, -0.5, -1, -2]
-            ],
-            'king': [
-                [-3, -4, -4, -5, -5, -4, -4, -3],
-                [-3, -4, -4, -5, -5, -4, -4, -3],
-                [-3, -4, -4, -5, -5, -4, -4, -3],
-                [-3, -4, -4, -5, -5, -4, -4, -3],
-                [-2, -3, -3, -4, -4, -3, -3, -2],
-                [-1, -2, -2, -2, -2, -2, -2, -1],
-                [1.5, 1.5, -0.3, -0.3, -0.3, -0.3, 1.5, 1.5],
-                [2, 3, 3, -0.3, 0, 0.5, 3, 2]
-            ]
-        }
+        self.polyglot_engine = PolyglotEngine(book_path)  # Keeps the book memory-mapped between moves
+        self.transposition_table = TranspositionTable(hash_size_mb)  # Results of the positions already searched
+        self.nodes = 0  # Number of nodes visited by the current search
+        self.node_limit = inf  # Number of nodes after which the current search stops
+        self.deadline = None  # time.perf_counter() value after which the current search stops
+        self.stop_requested = False  # Set from another thread to stop the current search
+        self.info_callback: Optional[Callable[[str], None]] = None  # Receives an info line after every search
+        self.last_iteration: Optional[Tuple[int, float, int]] = None  # (depth, score for the side to move, best_move) of the last completed depth
+        self.root_ply = 0  # Length of the undo stack at the root, used to find the ply of a node
+        self.move_buffers: list[array] = []  # Move array of every ply, reused by the move generator
+        self.order_buffers: list[list[int]] = []  # Ordered moves of every ply, sorted in place by order_moves()
+        self.killer_moves: list[list[int]] = [[] for _ in range(MAX_DEPTH + 1)]  # Two quiet moves per ply that caused a cutoff
+        self.history: Dict[str, list[list[int]]] = {color: [[0] * 64 for _ in range(64)] for color in ('white', 'black')}  # Cutoffs of the quiet moves [color][start][end]
+        self.threads = 1  # Number of processes that search in parallel (Lazy SMP), including this one
+        self.helper_pool: Optional[ProcessPoolExecutor] = None  # Helper processes of the parallel search
+        self.helper_stop = None  # Shared flag that stops the helpers, also read by the search of a helper
+        self.root_split = False  # Should the helpers search the root moves in parallel instead of Lazy SMP
+        self.root_bound = None  # Shared value of the best root move found so far in the current root split iteration
+        self.pvs_enabled = True  # Search the moves after the first with a null window (principal variation search)
+        self.null_move_enabled = True  # Prune positions that stay good after passing the turn (null move pruning)
+        self.lmr_enabled = True  # Reduce the depth of quiet moves late in the move list (late move reductions)
+        self.tablebase: Optional[SyzygyTablebase] = None  # Syzygy tables that score the endgames with few pieces
+        self.tablebase_hits = 0  # Number of positions of the current search scored by the tablebase
+        self.endgame_tables: Optional[EndgameTables] = load_endgame_tables()  # Generated tables of KQK, KRK, KPK and KBNK, if any
+        self.search_cache: Optional[SearchCache] = None  # Results of earlier runs on disk, consulted before searching
+        self.piece_values = PIECE_VALUES  # Static values of the pieces for the heuristic
 
     def evaluate_board(self, board: ChessBoard) -> float:
         """Evaluate the board state based on material advantage and return the evaluation 
-        score where positive values favor white and negative values favor black."""
-        white_score = 0
-        black_score = 0
-
-        # Iterate over all pieces
-        board.pieces: Dict[str, Dict[Tuple[int, int], ChessPiece]]
-        for pos, piece in board.pieces['white'].items():
-            pos: Tuple[int, int]
-            piece: ChessPiece
-
-            white_score += self.evaluate_piece(piece, pos, 'white', board)
-
-        for pos, piece in board.pieces['black'].items():
-            pos: Tuple[int, int]
-            piece: ChessPiece
-
-            black_score += self.evaluate_piece(piece, pos, 'black', board)
+        score where positive values favor white and negative values favor black.
+        The material and piece-table values are the running totals kept by the board,
+        only the pawn structure and whether the kings are in check are computed here."""
+        white_score: float = board.psqt_scores['white'] / EVALUATION_SCALE + self.evaluate_dynamic_terms('white', board)
+        black_score: float = board.psqt_scores['black'] / EVALUATION_SCALE + self.evaluate_dynamic_terms('black', board)
 
         self.numberOfFinishNodes += 1
         # Positive score favors white, negative score favors black
-        return white_score - black_score
-
-    def evaluate_piece(self, piece: ChessPiece, position: Tuple[int, int], color: str, board: ChessBoard) -> float:
-        """Evaluate the value of a single piece, including material, position, and special rules."""
-        piece_type: str = type(piece).__name__.lower()
-        # Add material value
-        value = 3 * self.piece_values[piece_type]
-
-        # Add positional value
-        value += 0.1 * self.evaluate_position(piece_type, position, color)
-
-        # Special considerations for pawns
-        if piece_type == 'pawn':
-            value += self.evaluate_pawn_structure(position, color, board)
+        return round(white_score - black_score, 4)
 
-        # Add penalties for king safety
-        if piece_type == 'king':
-            value += 0.001 * self.evaluate_king_safety(position, color, board)
-
-        return round(value, 4)
-
-    def evaluate_position(self, piece_type: str, position: Tuple[int, int], color: str) -> float:
-        """Evaluate the positional value with bonuses/penalties based on piece-tables."""
-        x, y = position
-
-        # Get the positional value from the piece's table
-        positional_value = self.positional_values[piece_type][y][x]
-
-        # Variables to determine the importance of which piece the engine should move each time
-        if (piece_type == "Pawn"):
-            positional_value *= 0.8
-        elif (piece_type == "Knight"):
-            positional_value *= 0.7
-        elif (piece_type == "Bishop"):
-            positional_value *= 1.2
-        elif (piece_type == "Queen"):
-            positional_value *= 1.4
-
-        return positional_value
-
-    def evaluate_pawn_structure(self, position: Tuple[int, int], color: str, board: ChessBoard) -> float:
-        """Evaluate the pawn structure for penalties like doubled, isolated."""
-        x, y = position
+    def evaluate_dynamic_terms(self, color: str, board: ChessBoard) -> float:
+        """Evaluate the terms that can't be kept as running totals with the bitboards:
+        the doubled and isolated pawns and the king safety penalty of a king in check."""
+        pawns: int = board.bitboards[color]['pawn']
         penalty = 0
-        isolated = True
-
-        # Check for doubled pawns
-        for i in range(1, 4):
-            board.pieces[color]: Dict[Tuple[int, int], ChessPiece]
 
-            if (x, y + i) in board.pieces[color] and isinstance(board.pieces[color][(x, y + i)], Pawn):
-                penalty -= 0.5  # Doubled pawns are a weakness
-
-        # Check for isolated pawns
-        for pos, piece_type in board.pieces[color].items():
-            pos: Tuple[int, int]
-            piece_type: ChessPiece
-
-            if isinstance(piece_type, Pawn):
-                if (pos[1] - 1, pos[0]) in board.pieces[color] or (pos[1] + 1, pos[0]) in board.pieces[color]:
+        if pawns:
+            # Every pawn loses 0.5 for each own pawn one to three squares in front of it
+            for i in range(1, 4):
+                penalty -= 0.5 * popcount(pawns & (pawns >> (8 * i)))
+
+            # Every pawn loses 0.3 if no own pawn has an own piece on the square just above or below it
+            own: int = board.occupancy[color]
+            isolated = True
+            for square in iter_squares(pawns):
+                x, y = square & 7, square >> 3
+                if ((y >= 1 and own >> square_index((y - 1, x)) & 1) or
+                        (y <= 6 and own >> square_index((y + 1, x)) & 1)):
                     isolated = False
-        if isolated:
-            penalty -= 0.3  # Isolated pawns have no support and must be punished
+                    break
+            if isolated:
+                penalty -= 0.3 * popcount(pawns)
 
+        if board.is_in_check(color):
+            penalty -= 0.001 * 0.4
         return penalty
 
-    def evaluate_king_safety(self, position: Tuple[int, int], color: str, board: ChessBoard) -> float:
-        """Evaluate the king's safety by making sure that he is covered."""
-        x , y = position
-        penalty = 0
+    def negamax(self, board: ChessBoard, depth: int, alpha: float, beta: float, null_move_allowed: bool = True) -> float:
+        """Search the position with alpha-beta pruning in the negamax form and return its score from the
+        point of view of the side to move: the score of a move is the negated score of the position it leads to.
+        Every move is played with make_move() and taken back with unmake_move() so the board is left unchanged.
+        The moves after the first are searched with a null window (PVS) and the late quiet moves one ply
+        shallower (LMR), see search_child(). A position that stays good enough for the side to move even if
+        it passes the turn is cut off without searching its moves (null move pruning).
+        null_move_allowed: False right after a null move, so two null moves are never played in a row."""
+        # Stop the search if it has been requested or a limit has been reached
+        self.count_node()
 
-        # Calculate king safety from the king's table
-        positional_value = self.positional_values['king'][y][x] * 0.6
-
-        king: King = board.board[x][y]
-        if king.is_in_check(color, board):
-            penalty -= 0.4
-
-        return penalty + positional_value
-
-    def restoreBoardState(self, board: ChessBoard, original_board: ChessBoard) -> None:
-        """Restores every value of the chess board."""
-        board.board: list[list[Optional[ChessPiece]]] = original_board.board
-        board.pieces: Dict[str, Dict[Tuple[int, int], ChessPiece]] = original_board.pieces
-        board.white_king_position: Tuple[int, int] = original_board.white_king_position
-        board.black_king_position: Tuple[int, int] = original_board.black_king_position
-        board.turn: str = original_board.turn
-        board.castling_rights: Dict[str, bool] = original_board.castling_rights
-        board.en_passant_square: str = original_board.en_passant_square
-        board.halfmove_clock: int = original_board.halfmove_clock
-        board.fullmove_number: int = original_board.fullmove_number
-        board.repetition_count: Dict[int, int] = original_board.repetition_count
-        board.fen_stack: list[str] = original_board.fen_stack
-        board.stalemate: bool = original_board.stalemate
-
-    def minimax(self, board: ChessBoard, depth: int, alpha: float, beta: float, maximizing_player: str, original_board: ChessBoard) -> float:
-        """Perform the Minimax algorithm with alpha-beta pruning and return the 
-        evaluation score of the best move for the current player."""
-        # Game is solved
-        if (board.has_legal_moves(board.turn, True) is False and board.stalemate == False):
-            # Restore the board state
-            self.restoreBoardState(board, original_board)
-
-            mate_value = 1000000000 if board.turn == 'white' else -1000000000
-            return mate_value
-        elif (board.has_legal_moves(board.turn, True) is False and board.stalemate == True):
-            # Restore the board state
-            self.restoreBoardState(board, original_board)
-
-            return 0  # The game is a draw by stalemate
         if board.checkFiftyMoveRule(True):
-            # Restore the board state
-            self.restoreBoardState(board, original_board)
-
             return 0  # The game is a draw by fifty-move rule
         if board.checkThreefoldRepetition(True):
-            # Restore the board state
-            self.restoreBoardState(board, original_board)
-
             return 0  # The game is a draw by threefold repetition
 
-        # Final tree node
-        if (depth == 0):
-            evaluation = self.evaluate_board(board)
-
-            # Restore the board state
-            self.restoreBoardState(board, original_board)
-
-            return evaluation
-
-        if maximizing_player == 'white':
-            max_eval = -inf
-            legal_moves = board.generate_legal_moves('white', True)
-            for move in legal_moves:
-                move: Dict[str, Tuple[int, int]]
-
-                # Save the board state before making the move
-                original_board = board.clone()
-
-                # Make the move on the board
-                piece: ChessPiece = board.board[move['start'][0]][move['start'][1]]  # Save the moving piece
-                target_piece: Optional[ChessPiece] = board.board[move['end'][0]][move['end'][1]]  # Save the target piece (if any)
-                board.move_piece(move['start'], move['end'], 'white', False, True)
-
-                # Update the turn, en passant square, FEN stack and evaluate the state
-                board.updateTurn()
-                last_move = (move['start'], move['end'], piece)
-                board.updateEnPassantSquare(board.turn, last_move)
-                board.updateFENstack()
-                evaluation: float = self.minimax(board, depth - 1, alpha, beta, 'black', original_board)
-
-                # Restore the board state
-                self.restoreBoardState(board, original_board)
-
-                max_eval = max(max_eval, evaluation)
-                alpha = max(alpha, evaluation)
-                if beta <= alpha:
-                    break  # Beta cutoff
-            return max_eval
+        # Mate distance pruning: no line from here can mate faster than a mate already found closer to the root
+        ply: int = len(board.undo_stack) - self.root_ply
+        alpha = max(alpha, -MATE_SCORE + ply)
+        beta = min(beta, MATE_SCORE - ply - 1)
+        if alpha >= beta:
+            return alpha
+
+        # Endgames in the tablebase are scored exactly, without searching them
+        if self.tablebase and ply and popcount(board.occupied) <= self.tablebase.max_pieces:
+            wdl: Optional[int] = self.tablebase.probe_wdl(board)
+            if wdl is not None:
+                self.tablebase_hits += 1
+                return self.tablebase_score(wdl, ply)
+        if self.endgame_tables and ply and popcount(board.occupied) <= ENDGAME_MAX_PIECES:
+            result: Optional[Tuple[int, int, bool]] = self.endgame_tables.probe(board)
+            if result is not None:
+                self.tablebase_hits += 1
+                return self.endgame_table_score(board, *result, ply)
+
+        # Final tree node, resolve the captures before evaluating it
+        if (depth <= 0):
+            return self.quiescence(board, alpha, beta)
+
+        # Reuse the result of a previous search of the same position if it was searched deep enough
+        entry = self.transposition_table.probe(board.zobrist_key)
+        hash_move = entry[3] if entry else None
+        if entry and entry[0] >= depth:
+            tt_score, tt_bound = self.score_from_table(entry[1], ply), entry[2]
+            if tt_bound == EXACT:
+                return tt_score
+            elif tt_bound == LOWER_BOUND:
+                alpha = max(alpha, tt_score)
+            else:
+                beta = min(beta, tt_score)
+            if beta <= alpha:
+                return tt_score
+        alpha_original = alpha
+        color: str = board.turn
+        in_check: bool = board.is_in_check(color)
+
+        # Null move pruning: let the opponent move twice in a row, with a reduced depth. If the score still
+        # doesn't come back into the window, a real move would most likely fail too. It is unsound in zugzwang,
+        # which is common when the side to move has only its king and pawns, so these positions are skipped.
+        if (null_move_allowed and self.null_move_enabled and depth >= NULL_MOVE_MIN_DEPTH and not in_check and
+                beta < inf and self.has_non_pawn_material(board, color) and self.evaluate_relative(board) >= beta):
+            board.make_null_move()
+            score: float = -self.negamax(board, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + NULL_WINDOW, False)
+            board.unmake_null_move()
+            if score >= beta:
+                return beta
+
+        moves: array = board.generate_moves(color, False, self.move_buffer(board))
+        if not moves:
+            # The side to move is checkmated, or it is a draw by stalemate
+            return -MATE_SCORE + ply if in_check else 0
+
+        killers: list[int] = self.killer_moves[ply] if ply <= MAX_DEPTH else []
+        late_move_reductions: bool = self.lmr_enabled and depth >= LMR_MIN_DEPTH and not in_check
+        best_value = -inf
+        best_move = None
+        for index, move in enumerate(self.order_moves(board, moves, hash_move)):
+            move: int
+
+            # Quiet moves late in the list rarely cause a cutoff
+            reducible: bool = (late_move_reductions and index >= LMR_MIN_MOVES and not move & CAPTURE_FLAG and
+                               not 1 <= move_kind(move) <= 4 and move not in killers)
+
+            # Make the move on the board, evaluate the state and take the move back
+            board.make_compact_move(move)
+            score: float = self.search_child(board, depth - 1, alpha, beta, index == 0, reducible)
+            board.unmake_move()
+
+            if score > best_value:
+                best_value = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.record_cutoff(board, move, depth)
+                break  # Cutoff, the opponent avoids this position
+        self.store_result(board, depth, best_value, alpha_original, beta, best_move)
+        return best_value
+
+    def search_child(self, board: ChessBoard, depth: int, alpha: float, beta: float, first: bool, reducible: bool) -> float:
+        """Search the position after a move of negamax() with principal variation search and late move reductions,
+        and return its score for the side that made the move. The first move is searched with the full window.
+        The others are first searched with a null window just above alpha, and a reducible move that doesn't
+        give check one ply shallower. Only a move that beats alpha is searched again with the full depth and window."""
+        if first or not (self.pvs_enabled or reducible):
+            return -self.negamax(board, depth, -beta, -alpha)
+        reduction: int = LMR_REDUCTION if reducible and not board.is_in_check(board.turn) else 0
+        window_beta: float = alpha + NULL_WINDOW if self.pvs_enabled and alpha > -inf else beta
+
+        score: float = -self.negamax(board, depth - reduction, -window_beta, -alpha)
+        if reduction and score > alpha:
+            score = -self.negamax(board, depth, -window_beta, -alpha)
+        if window_beta < beta and alpha < score < beta:
+            score = -self.negamax(board, depth, -beta, -alpha)
+        return score
+
+    def tablebase_score(self, wdl: int, ply: int) -> float:
+        """Convert a tablebase win/draw/loss value to a search score. A win or loss the fifty-move rule
+        turns into a draw scores 0, and wins closer to the root score higher."""
+        if wdl == WIN:
+            return TABLEBASE_WIN_SCORE - ply
+        if wdl == LOSS:
+            return -TABLEBASE_WIN_SCORE + ply
+        return 0
+
+    def endgame_table_score(self, board: ChessBoard, result: int, plies: int, distance_to_mate: bool, ply: int) -> float:
+        """Convert a result of the generated endgame tables to a search score. A distance to mate gives the exact
+        mate score, and a mate the fifty-move rule comes first is a draw: the pawnless lines have no capture or
+        pawn move, and the search scores a position whose clock reaches FIFTY_MOVE_PLIES as a draw before
+        looking for a mate. A distance to the promotion of KPK scores like a tablebase win, the faster the higher."""
+        if result == 0 or (distance_to_mate and board.halfmove_clock + plies >= FIFTY_MOVE_PLIES):
+            return 0
+        if distance_to_mate:
+            return result * (MATE_SCORE - ply - plies)
+        return result * (TABLEBASE_WIN_SCORE - ply - plies)
+
+    def has_non_pawn_material(self, board: ChessBoard, color: str) -> bool:
+        """Check if the side has a piece other than its king and pawns, so it is unlikely to be in zugzwang."""
+        bitboards: Dict[str, int] = board.bitboards[color]
+        return bool(bitboards['knight'] | bitboards['bishop'] | bitboards['rook'] | bitboards['queen'])
+
+    def evaluate_relative(self, board: ChessBoard) -> float:
+        """Return evaluate_board() from the point of view of the side to move."""
+        score: float = self.evaluate_board(board)
+        return score if board.turn == 'white' else -score
+
+    def count_node(self) -> None:
+        """Count a visited node and stop the search if it has been requested or a limit has been reached
+        (the clock is read every 64 nodes)."""
+        self.nodes += 1
+        if (self.stop_requested or self.nodes >= self.node_limit or
+                (self.helper_stop is not None and self.helper_stop.value) or
+                (self.deadline and not self.nodes & 63 and time.perf_counter() >= self.deadline)):
+            raise SearchStopped()
+
+    def quiescence(self, board: ChessBoard, alpha: float, beta: float) -> float:
+        """Search only the captures and promotions from a leaf of negamax() until the position is quiet,
+        so that the evaluation is never taken in the middle of an exchange. The score is from the point of view
+        of the side to move. It can stand pat on the static evaluation, and captures that can't bring
+        the score back to alpha even with a safety margin are skipped (delta pruning).
+        A side in check can't stand pat, so all its moves are searched."""
+        self.count_node()
+
+        color: str = board.turn
+        if board.is_in_check(color):
+            moves = board.generate_moves(color, False, self.move_buffer(board))
+            if not moves:
+                return -MATE_SCORE + len(board.undo_stack) - self.root_ply  # Checkmate
+            stand_pat = -inf
         else:
-            min_eval = inf
-            legal_moves = board.generate_legal_moves('black', True)
-            for move in legal_moves:
-                move: Dict[str, Tuple[int, int]]
-
-                # Save the board state before making the move
-                original_board = board.clone()
-
-                # Make the move on the board
-                piece: ChessPiece = board.board[move['start'][0]][move['start'][1]]  # Save the moving piece
-                target_piece: Optional[ChessPiece] = board.board[move['end'][0]][move['end'][1]]  # Save the target piece (if any)
-                board.move_piece(move['start'], move['end'], 'black', False, True)
-
-                # Update the turn, en passant square, FEN stack and evaluate the state
-                board.updateTurn()
-                last_move = (move['start'], move['end'], piece)
-                board.updateEnPassantSquare(board.turn, last_move)
-                board.updateFENstack()
-                evaluation: float = self.minimax(board, depth - 1, alpha, beta, 'white', original_board)
-
-                # Restore the board state
-                self.restoreBoardState(board, original_board)
-
-                min_eval = min(min_eval, evaluation)
-                beta = min(beta, evaluation)
-                if beta <= alpha:
-                    break  # Alpha cutoff
-            return min_eval
-
-    def find_best_move(self, board: ChessBoard, depth: int) -> str:
+            moves = board.generate_captures(color, self.move_buffer(board))
+            stand_pat: float = self.evaluate_relative(board)
+
+            # The side to move doesn't have to capture, so the static evaluation is a lower bound of the score
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+
+        best_value: float = stand_pat
+        for move in self.order_moves(board, moves):
+            move: int
+
+            # Delta pruning: even winning the captured piece and a margin doesn't reach alpha
+            if stand_pat > -inf and stand_pat + 3 * self.capture_value(board, move) + DELTA_MARGIN <= alpha:
+                continue
+
+            board.make_compact_move(move)
+            score: float = -self.quiescence(board, -beta, -alpha)
+            board.unmake_move()
+
+            best_value = max(best_value, score)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_value
+
+    def capture_value(self, board: ChessBoard, move: int) -> float:
+        """Return the material a capture or promotion wins in pawns (piece_values)."""
+        victim: Optional[ChessPiece] = board.squares[move_end(move)]
+        value: float = self.piece_values[victim.piece_type] if victim else 0
+        kind: int = move_kind(move)
+        if kind == EN_PASSANT_FLAG:
+            value = self.piece_values['pawn']
+        elif 1 <= kind <= 4:
+            value += self.piece_values[PROMOTION_TYPES[kind]] - self.piece_values['pawn']
+        return value
+
+    def move_buffer(self, board: ChessBoard) -> array:
+        """Return the move array of the ply of the board, reused by every node of that ply
+        so the move generator doesn't allocate a new list per node."""
+        ply: int = len(board.undo_stack) - self.root_ply
+        while ply >= len(self.move_buffers):
+            self.move_buffers.append(array('H'))
+        return self.move_buffers[ply]
+
+    def order_moves(self, board: ChessBoard, moves: array, hash_move: Optional[int] = None) -> List[int]:
+        """Sort the moves so the ones most likely to cause a cutoff are searched first:
+        the hash move, then captures and queen promotions by MVV-LVA, then the killer moves of the ply,
+        then the quiet moves by their history score and the underpromotions last.
+        The moves are copied to the list of the ply, reused by every node of that ply like the move array,
+        and sorted there, so the array they were generated in can be reused by the child nodes."""
+        ply: int = len(board.undo_stack) - self.root_ply
+        killers: list[int] = self.killer_moves[ply] if ply <= MAX_DEPTH else []
+        history: list[list[int]] = self.history[board.turn]
+        squares: list[Optional[ChessPiece]] = board.squares
+
+        def move_score(move: int) -> int:
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            start_sq: int = (move >> 6) & 63
+            end_sq: int = move & 63
+            kind: int = (move >> 12) & 7
+            if 1 <= kind <= 3:
+                return -1  # Underpromotion, almost never better than the queen promotion
+
+            # Most valuable victim first, least valuable attacker breaks the ties
+            if move & CAPTURE_FLAG:
+                victim: Optional[ChessPiece] = squares[end_sq]
+                victim_value: float = self.piece_values[victim.piece_type] if victim else self.piece_values['pawn']
+                if kind == 4:
+                    victim_value += self.piece_values['queen']
+                return CAPTURE_SCORE + int(victim_value * 100) - min(int(self.piece_values[squares[start_sq].piece_type]), 10)
+            if kind == 4:
+                return CAPTURE_SCORE + int(self.piece_values['queen'] * 100)
+            if move in killers:
+                return KILLER_SCORE
+            return min(history[start_sq][end_sq], HISTORY_LIMIT)
+
+        while ply >= len(self.order_buffers):
+            self.order_buffers.append([])
+        ordered: list[int] = self.order_buffers[ply]
+        ordered[:] = moves
+        ordered.sort(key=move_score, reverse=True)
+        return ordered
+
+    def record_cutoff(self, board: ChessBoard, move: int, depth: int) -> None:
+        """Remember a quiet move that caused a cutoff as a killer of its ply and in the history table."""
+        if move & CAPTURE_FLAG or 1 <= move_kind(move) <= 4:
+            return  # Captures and promotions are already ordered by MVV-LVA
+        start_sq, end_sq = move_start(move), move_end(move)
+
+        ply: int = len(board.undo_stack) - self.root_ply
+        if ply <= MAX_DEPTH:
+            killers: list[int] = self.killer_moves[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[2:]
+        self.history[board.turn][start_sq][end_sq] += depth * depth
+
+    def reset_move_ordering(self) -> None:
+        """Forget the killer moves of the previous search and age its history scores."""
+        self.killer_moves = [[] for _ in range(MAX_DEPTH + 1)]
+        for table in self.history.values():
+            for row in table:
+                for end_sq in range(64):
+                    row[end_sq] //= 2
+
+    def store_result(self, board: ChessBoard, depth: int, score: float, alpha: float, beta: float, best_move: Optional[int]) -> None:
+        """Save the result of a search in the transposition table. The bound type is found by
+        comparing the score with the alpha-beta window the position was searched with."""
+        if score <= alpha:
+            bound = UPPER_BOUND
+        elif score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        ply: int = len(board.undo_stack) - self.root_ply
+        self.transposition_table.store(board.zobrist_key, depth, self.score_to_table(score, ply), bound, best_move)
+
+    def score_to_table(self, score: float, ply: int) -> float:
+        """Convert a mate score from the distance to the root to the distance to the position, as it is stored in the
+        transposition table, so the entry stays right when the position is reached at another ply."""
+        if score >= MATE_THRESHOLD:
+            return score + ply
+        if score <= -MATE_THRESHOLD:
+            return score - ply
+        return score
+
+    def score_from_table(self, score: float, ply: int) -> float:
+        """Convert a mate score read from the transposition table back to the distance to the root, see score_to_table()."""
+        if score >= MATE_THRESHOLD:
+            return score - ply
+        if score <= -MATE_THRESHOLD:
+            return score + ply
+        return score
+
+    def find_best_move(self, board: ChessBoard, depth: int, time_manager: Optional[TimeManager] = None, node_limit: Optional[int] = None) -> str:
         """Find the best move for the current player using the Polyglot book if possible 
         otherwise fallback to Minimax with Alpha-Beta Pruning and return the best move 
-        for the current player in the format "e2 e4"."""
+        for the current player in the format "e2 e4".
+        The search deepens iteratively from depth 1 up to depth and every iteration searches the best move
+        of the previous one first. It stops early when a limit is reached and plays the best move of the last
+        completed depth.
+        time_manager: the time budget, no new depth is started after its soft deadline and the running
+        one is aborted at its hard deadline.
+        node_limit: number of nodes after which the search stops."""
         if self.polyFlag:
-            polyglot_engine = PolyglotEngine("opening-book/baron30.bin")
-            move: str = polyglot_engine.find_move_from_book(board)
+            move: str = self.polyglot_engine.find_move_from_book(board)
 
             if move:
                 return move
             else:
                 self.polyFlag = False
 
-        best_move = None
-        best_value = -inf if board.turn == 'white' else inf
+        # A result of an earlier run that was searched deep enough is played without searching again
+        cached_move: Optional[str] = self.find_cached_move(board, depth) if self.search_cache else None
+        if cached_move:
+            return cached_move
 
-        legal_moves = board.generate_legal_moves(board.turn, True)
-        for move in legal_moves:
-            move: Dict[str, Tuple[int, int]]
-
-            # Save the board state before making the move
-            original_board = board.clone()
-
-            # Make the move on the board
-            piece: ChessPiece = board.board[move['start'][0]][move['start'][1]]  # Save the moving piece
-            target_piece: Optional[ChessPiece] = board.board[move['end'][0]][move['end'][1]]  # Save the target piece (if any)
-            board.move_piece(move['start'], move['end'], board.turn, False, True)
-
-            # Update the turn, en passant square, FEN stack and evaluate the state
-            board.updateTurn()
-            last_move = (move['start'], move['end'], piece)
-            board.updateEnPassantSquare(board.turn, last_move)
-            board.updateFENstack()
-            board.stalemate = False
-            evaluation: float = self.minimax(board, depth - 1, -inf, inf, board.turn, original_board)
-
-            # Restore the board state
-            self.restoreBoardState(board, original_board)
-
-            # Update the best move based on evaluation
-            if board.turn == 'white':
-                if evaluation > best_value:
-                    best_value = evaluation
-                    best_move = move
-            else:
-                if evaluation < best_value:
-                    best_value = evaluation
-                    best_move = move
+        # The helper processes search the same position and share their results through the transposition table
+        helpers: list[Future] = self.start_helpers(board, depth) if self.helper_pool and not self.root_split else []
+        try:
+            move = self.iterative_deepening(board, depth, time_manager, node_limit)
+        finally:
+            self.stop_helpers(helpers)
+        if self.search_cache and self.last_iteration and not board.is_repetition():
+            self.search_cache.store(board.zobrist_key, *self.last_iteration)
+        return move
+
+    def find_cached_move(self, board: ChessBoard, depth: int) -> Optional[str]:
+        """Return the best move of the position stored in the search cache in the format "e2 e4", or None if it
+        isn't cached at depth or deeper. The cached result becomes the last iteration, as if it had been searched.
+        A search limited by time asks for MAX_DEPTH, so it is only answered by a cached forced mate.
+        A position that repeats an earlier one isn't looked up, its score depends on the game."""
+        if board.is_repetition():
+            return None
+        cached: Optional[Tuple[int, float, int]] = self.search_cache.probe(board.zobrist_key)
+        if not cached or (cached[0] < depth and abs(cached[1]) < MATE_THRESHOLD):
+            return None  # Too shallow, a forced mate is final whatever its depth
+        if cached[2] not in board.generate_moves(board.turn):
+            return None  # A collision of the key with another position
+
+        self.nodes = 0
+        self.tablebase_hits = 0
+        self.last_iteration = cached
+        if self.info_callback:
+            self.info_callback(self.search_info(board, cached[0], cached[1], cached[2], 0))
+        uci_move: str = move_to_uci(cached[2])
+        return f"{uci_move[:2]} {uci_move[2:]}"
+
+    def iterative_deepening(self, board: ChessBoard, depth: int, time_manager: Optional[TimeManager] = None, node_limit: Optional[int] = None) -> str:
+        """Search the position with depths 1 to depth and return the best move of the
+        last completed depth in the format "e2 e4", see find_best_move()."""
+        self.nodes = 0
+        self.deadline = time_manager.hard_deadline if time_manager else None
+        self.node_limit = node_limit if node_limit else inf
+        self.last_iteration = None
+        start_time = time.perf_counter()
+
+        self.tablebase_hits = 0
+        self.root_ply = len(board.undo_stack)
+        self.reset_move_ordering()
+
+        entry = self.transposition_table.probe(board.zobrist_key)
+        legal_moves = list(self.order_moves(board, board.generate_moves(board.turn), entry[3] if entry else None))  # Kept for every iteration
+        if not legal_moves:
+            return None  # No valid moves available
+        best_move = legal_moves[0]  # Played if not even the first depth can be completed
+
+        # A root position in the tablebase is solved by the DTZ tables, there is nothing to search
+        root_result: Optional[Tuple[int, int]] = self.tablebase.probe_root(board, legal_moves) if self.tablebase else None
+        if root_result:
+            best_move = root_result[0]
+            self.tablebase_hits += 1
+            self.last_iteration = (1, self.tablebase_score(root_result[1], 0), best_move)
+            if self.info_callback:
+                self.info_callback(self.search_info(board, 1, self.last_iteration[1], best_move, time.perf_counter() - start_time))
+            depth = 0
+
+        for current_depth in range(1, depth + 1):
+            try:
+                if self.helper_pool and self.root_split:
+                    best_move, best_value = self.search_root_parallel(board, legal_moves, current_depth)
+                else:
+                    best_move, best_value = self.search_root(board, legal_moves, current_depth)
+            except SearchStopped:
+                break
+
+            # Search the best move first in the next iteration
+            legal_moves.remove(best_move)
+            legal_moves.insert(0, best_move)
 
-        # Convert the best move to the "e2 e4" format
-        if best_move:
             # print("Nodes: ", self.numberOfFinishNodes)  # Debugging
+            self.last_iteration = (current_depth, best_value, best_move)
+            if self.info_callback:
+                self.info_callback(self.search_info(board, current_depth, best_value, best_move, time.perf_counter() - start_time))
+
+            if abs(best_value) >= MATE_THRESHOLD:
+                break  # A forced mate has been found, a deeper search can't change the result
+            if time_manager and time_manager.soft_limit_reached():
+                break  # A new iteration would most likely not finish in time
+
+        # Convert the best move to the "e2 e4" format, with the promotion letter for promotions ("e7 e8q")
+        uci_move: str = move_to_uci(best_move)
+        return f"{uci_move[:2]} {uci_move[2:]}"
+
+    def set_threads(self, threads: int, root_split: Optional[bool] = None) -> None:
+        """Set the number of processes of the search. With more than one, threads - 1 helper processes
+        search the same position (Lazy SMP) and all of them use a transposition table in shared memory.
+        root_split: if set, threads helper processes search the root moves in parallel instead and
+        this process only collects their results (None keeps the current mode)."""
+        if (not isinstance(threads, int) or threads < 1):
+            raise ValueError("The number of threads must be a positive integer.")
+        self.close_helpers()
+        self.threads = threads
+        if root_split is not None:
+            self.root_split = root_split
+        size_mb: int = self.transposition_table.size_mb
+
+        if threads == 1:
+            if isinstance(self.transposition_table, SharedTranspositionTable):
+                self.transposition_table.close()
+                self.transposition_table = TranspositionTable(size_mb)
+            return
+
+        if not isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table = SharedTranspositionTable(size_mb)
+        # The helpers are spawned rather than forked: a fork from the search thread of the UCI front end
+        # can copy a lock of the main thread (e.g. stdin) in its locked state into the child
+        context = multiprocessing.get_context('spawn')
+        helper_count: int = threads if self.root_split else threads - 1
+        self.helper_stop = context.Value('b', 0, lock=False)
+        self.root_bound = context.Value('d', 0.0)
+        self.helper_pool = ProcessPoolExecutor(max_workers=helper_count, mp_context=context, initializer=init_helper,
+                                               initargs=(self.transposition_table.name, size_mb,
+                                                         self.transposition_table.bucket_count, self.helper_stop,
+                                                         self.root_bound))
+        # Start the processes now so that the first search doesn't pay for it
+        wait([self.helper_pool.submit(os.getpid) for _ in range(helper_count)])
+
+    def set_hash_size(self, size_mb: int) -> None:
+        """Reallocate the transposition table with a new memory budget in MB. The helper processes
+        are restarted so that they attach to the new table."""
+        self.transposition_table.resize(size_mb)
+        if self.helper_pool:
+            self.set_threads(self.threads)
+
+    def search_options(self) -> Tuple[bool, bool, bool, Optional[str]]:
+        """Return the switches of the search techniques (PVS, null move pruning, LMR) and the tablebase directory,
+        sent to the helper processes."""
+        return self.pvs_enabled, self.null_move_enabled, self.lmr_enabled, self.tablebase.path if self.tablebase else None
+
+    def set_search_options(self, options: Tuple[bool, bool, bool, Optional[str]]) -> None:
+        """Apply the options of search_options(), the tablebase is only opened again if its directory changed."""
+        self.pvs_enabled, self.null_move_enabled, self.lmr_enabled, tablebase_path = options
+        if tablebase_path != (self.tablebase.path if self.tablebase else None):
+            self.set_tablebase_path(tablebase_path)
+
+    def set_search_cache(self, path: Optional[str], max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """Consult and fill the persistent search cache of the file from now on (None or "" to stop using it)."""
+        if self.search_cache:
+            self.search_cache.close()
+            self.search_cache = None
+        if path:
+            self.search_cache = SearchCache(path, max_entries)
+
+    def set_tablebase_path(self, path: Optional[str]) -> None:
+        """Probe the Syzygy tables of the directory from now on (None or "" to stop probing).
+        Raises ImportError if python-chess isn't installed."""
+        if self.tablebase:
+            self.tablebase.close()
+            self.tablebase = None
+        if path:
+            self.tablebase = SyzygyTablebase(path)
+
+    def start_helpers(self, board: ChessBoard, depth: int) -> List[Future]:
+        """Start the search of the position on every helper process. Every other helper searches
+        one ply deeper, so the helpers fill the table with entries the main search needs next."""
+        self.helper_stop.value = 0
+        fen: str = board.to_fen()
+        return [self.helper_pool.submit(helper_search, fen, board.repetition_count, min(depth + helper % 2, MAX_DEPTH),
+                                        self.search_options()) for helper in range(1, self.threads)]
+
+    def search_root_parallel(self, board: ChessBoard, legal_moves: List[int], depth: int) -> Tuple[int, float]:
+        """Search the root moves on the helper processes and return the best move with its score for the side to move.
+        The first move is searched alone to set the bound, then the other moves are spread over the
+        helpers. Every helper reads the best value found so far from the shared root bound when it starts
+        a move, so the moves searched later get a narrower window. A move that fails low under that bound
+        only has an upper bound, it is searched again with a full window if it could still be the best move.
+        The node budget left is given to the first move, then split between the moves searched after it.
+        The positions are sent as FEN strings, the helpers keep their own boards and engines.
+        Raises SearchStopped if the search is stopped before every move has been searched."""
+        fen: str = board.to_fen()
+        self.helper_stop.value = 0
+        self.root_bound.value = -inf
+        remaining_time: Optional[float] = self.deadline - time.perf_counter() if self.deadline else None
+
+        def search_moves(moves: List[int], full_window: bool) -> List[Tuple[float, bool]]:
+            # Every move gets an equal share of the nodes left, so the helpers together stay within the limit
+            move_nodes: float = (self.node_limit - self.nodes) / len(moves)
+            futures: list[Future] = [self.helper_pool.submit(root_move_search, fen, board.repetition_count, move, depth,
+                                                             remaining_time, move_nodes, full_window, self.search_options())
+                                     for move in moves]
+            self.wait_helpers(futures)
+            results: list[Tuple[float, bool]] = []
+            for future in futures:
+                score, exact, nodes = future.result()
+                self.nodes += nodes
+                if score is None:
+                    raise SearchStopped()  # A helper reached the deadline or the node limit
+                results.append((score, exact))
+            return results
+
+        results: Dict[int, Tuple[float, bool]] = dict(zip(legal_moves[:1], search_moves(legal_moves[:1], True)))
+        if len(legal_moves) > 1:
+            results.update(zip(legal_moves[1:], search_moves(legal_moves[1:], False)))
+
+        # A fail-low score is at most the value of the best move, a move can only tie with it and is searched again
+        best_value: float = max(score for score, exact in results.values() if exact)
+        failed_low: list[int] = [move for move in legal_moves if not results[move][1] and results[move][0] >= best_value]
+        if failed_low:
+            results.update(zip(failed_low, search_moves(failed_low, True)))
+
+        # Ties go to the move that comes first, as in search_root()
+        best_move = None
+        best_value = -inf
+        for move in legal_moves:
+            score: float = results[move][0]
+            if best_move is None or score > best_value:
+                best_value = score
+                best_move = move
+        return best_move, best_value
+
+    def wait_helpers(self, futures: List[Future]) -> None:
+        """Wait for the searches of the helpers, stop them and raise SearchStopped on a stop request,
+        the deadline or the node limit."""
+        while True:
+            done, pending = wait(futures, timeout=0.01)
+            if not pending:
+                return
+            if (self.stop_requested or (self.deadline and time.perf_counter() >= self.deadline)):
+                self.stop_helpers(futures)
+                raise SearchStopped()
+
+    def stop_helpers(self, helpers: List[Future]) -> None:
+        """Stop the helper processes and wait until all of them are idle."""
+        if not helpers:
+            return
+        self.helper_stop.value = 1
+        wait(helpers)
+
+    def close_helpers(self) -> None:
+        """Shut down the helper processes, if any."""
+        if self.helper_pool:
+            self.helper_pool.shutdown()
+            self.helper_pool = None
+            self.helper_stop = None
+
+    def close(self) -> None:
+        """Shut down the helper processes, free the shared transposition table and close the tablebases and the search cache."""
+        self.close_helpers()
+        self.set_tablebase_path(None)
+        self.set_search_cache(None)
+        if self.endgame_tables:
+            self.endgame_tables.close()
+            self.endgame_tables = None
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table.close()
+
+    def search_root(self, board: ChessBoard, legal_moves: List[int], depth: int) -> Tuple[int, float]:
+        """Search every root move to the given depth and return the best move with its score for the side to move.
+        If the search is stopped the moves made are taken back and SearchStopped is raised again."""
+        root_ply: int = len(board.undo_stack)
+        best_move = None
+        best_value = -inf
+
+        try:
+            for move in legal_moves:
+                move: int
 
-            start_square = to_square_notation(best_move['start'])
-            end_square = to_square_notation(best_move['end'])
-            return f"{start_square} {end_square}"
+                # Only a move better than the best one so far matters, so the window is bounded by its value
+                board.make_compact_move(move)
+                score: float = -self.negamax(board, depth - 1, -inf, -best_value)
+                board.unmake_move()
 
-        # No valid moves available
-        return None
+                if score > best_value or best_move is None:
+                    best_value = score
+                    best_move = move
+        except SearchStopped:
+            # Take back the moves (and null moves) of the interrupted search
+            board.unmake_to(root_ply)
+            raise
+
+        return best_move, best_value
+
+    def search_info(self, board: ChessBoard, depth: int, score: float, best_move: int, elapsed_time: float) -> str:
+        """Describe a finished search in the UCI "info" format (depth, score, nodes, nps, time and principal variation).
+        A forced mate is reported as "score mate <moves>", negative when the side to move is mated."""
+        mate: Optional[int] = self.mate_in(score)
+        score_text: str = f"mate {mate}" if mate is not None else f"cp {self.centipawns(score)}"
+        nps = int(self.nodes / elapsed_time) if elapsed_time > 0 else 0
+        pv: str = ' '.join(self.principal_variation(board, best_move, depth))
+        return (f"depth {depth} score {score_text} nodes {self.nodes} nps {nps} tbhits {self.tablebase_hits} "
+                f"time {int(elapsed_time * 1000)} pv {pv}")
+
+    def mate_in(self, score: float) -> Optional[int]:
+        """Return the number of moves to a forced mate of a search score (negative if the side to move
+        gets mated), or None if the score isn't a mate."""
+        if abs(score) < MATE_THRESHOLD:
+            return None
+        plies: int = int(MATE_SCORE - abs(score))
+        return (plies + 1) // 2 if score > 0 else -(plies // 2)
+
+    def centipawns(self, score: float) -> int:
+        """Convert a score of the search, from the point of view of the side to move, to centipawns as UCI expects."""
+        # A pawn is worth 3
+        return int(max(-32000, min(32000, score * 100 / 3)))
+
+    def principal_variation(self, board: ChessBoard, best_move: int, depth: int) -> List[str]:
+        """Return the expected line of play in UCI "e2e4" format, following the best moves stored in the transposition table."""
+        pv = []
+        move = best_move
+        while move is not None and len(pv) < depth:
+            pv.append(move_to_uci(move))
+            board.make_compact_move(move)
+
+            # The stored move may come from another position with the same index, so make sure it is legal here
+            entry = self.transposition_table.probe(board.zobrist_key)
+            move = entry[3] if entry else None
+            if move is not None and move not in board.generate_moves(board.turn):
+                move = None
+
+        for _ in pv:
+            board.unmake_move()
+        return pv
+
+
+helper_engine: Optional[ChessEngine] = None  # Engine of a helper process of the parallel search
+
+
+def init_helper(table_name: str, size_mb: int, bucket_count: int, helper_stop, root_bound) -> None:
+    """Create the engine of a helper process, attached to the shared transposition table of the main engine."""
+    global helper_engine
+    helper_engine = ChessEngine(hash_size_mb=1)
+    helper_engine.polyFlag = False
+    helper_engine.transposition_table = SharedTranspositionTable(size_mb, table_name, bucket_count)
+    helper_engine.helper_stop = helper_stop
+    helper_engine.root_bound = root_bound
+
+
+def helper_search(fen: str, repetition_count: Dict[int, int], depth: int, options: Tuple[bool, bool, bool, Optional[str]]) -> int:
+    """Search a position on a helper process until the main engine stops it and return the number of nodes.
+    options: the search options of the main engine (see ChessEngine.search_options())."""
+    helper_engine.set_search_options(options)
+    board = ChessBoard()
+    board.from_fen(fen)
+    board.repetition_count = repetition_count
+    helper_engine.iterative_deepening(board, depth)
+    return helper_engine.nodes
+
+
+def root_move_search(fen: str, repetition_count: Dict[int, int], move: int, depth: int,
+                     remaining_time: Optional[float], remaining_nodes: float, full_window: bool,
+                     options: Tuple[bool, bool, bool, Optional[str]]) -> Tuple[Optional[float], bool, int]:
+    """Search one root move on a helper process, with a full window or the window given by the shared root bound,
+    and return its score for the side to move at the root (None if the search was stopped), whether the score is
+    exact (otherwise it failed low and is only an upper bound) and the number of nodes."""
+    engine: ChessEngine = helper_engine
+    engine.set_search_options(options)
+    board = ChessBoard()
+    board.from_fen(fen)
+    board.repetition_count = repetition_count
+    engine.nodes = 0
+    engine.node_limit = remaining_nodes
+    engine.deadline = time.perf_counter() + remaining_time if remaining_time is not None else None
+    engine.root_ply = len(board.undo_stack)
+    engine.reset_move_ordering()
+
+    bound: float = -inf if full_window else engine.root_bound.value
+    board.make_compact_move(move)
+    try:
+        score: float = -engine.negamax(board, depth - 1, -inf, -bound)
+    except SearchStopped:
+        return None, False, engine.nodes
+    if score <= bound:
+        return score, False, engine.nodes
+
+    # Share the value with the helpers that start a root move after this one
+    with engine.root_bound.get_lock():
+        if score > engine.root_bound.value:
+            engine.root_bound.value = score
+    return score, True, engine.nodes
@@ -2,21 +2,34 @@
 
 from board import ChessBoard
 from utils import parse_position, to_square_notation
-from evaluate import ChessEngine
-from pieces.rook import Rook
-from pieces.king import King
+from evaluate import ChessEngine, MAX_DEPTH
+from timecontrol import TimeManager
+from uci import PROMOTIONS
+from bitboard import square_index, encode_move, move_promotion, is_capture, PROMOTION_CODES
+from pgn import write_game, START_FEN
+from typing import Optional, List
+import argparse
 import time
 
+ENGINE_MOVE_TIME = 2.0  # Seconds the engine thinks per move when no depth is chosen
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Play a game against the engine.")
+    parser.add_argument("--pgn", default=None, help="append the game to this PGN file when it ends")
+    args = parser.parse_args()
+
     board = ChessBoard()
     engine = ChessEngine()
     last_move = None  # To track last move for en passant
     update_threefold_repetition = True
     intErrorFlag = False
-    dynamicDepth = False
+    timedSearch = False
     depth = None
     color = None
+    start_fen = START_FEN  # Start position and moves of the game, written to the PGN file
+    moves = []
+    result = '*'
 
     # Player chooses depth
     while depth not in ["1", "2", "3", "4", "5", ""]:
@@ -25,8 +38,8 @@ def main():
         depth = input("Choose the depth of the engine: ").strip()
         intErrorFlag = True
     if (depth == ""):
-        dynamicDepth = True
-        depth = "3"
+        timedSearch = True
+        depth = str(MAX_DEPTH)
 
     # Player chooses color
     while color not in ['white', 'black', 'w', 'b', '']:
@@ -44,19 +57,23 @@ def main():
 
         # Check for threefold repetition
         if (update_threefold_repetition and board.checkThreefoldRepetition()):
+            result = '1/2-1/2'
             break
         update_threefold_repetition = False
 
         # Check for fifty-move rule
         if board.checkFiftyMoveRule():
+            result = '1/2-1/2'
             break
 
         # Check for checkmate or stalemate
         if not board.has_legal_moves(turn):
+            result = ('0-1' if turn == 'white' else '1-0') if board.is_in_check(turn) else '1/2-1/2'
             break
 
         if board.checkInsufficientMaterial():
             print("Draw by Insufficient Material.")
+            result = '1/2-1/2'
             break
 
         # Update turn
@@ -71,7 +88,8 @@ def main():
             start_time = time.time()
 
             print("Engine is thinking...\n")
-            move = engine.find_best_move(board, depth=int(depth))
+            time_manager = TimeManager(movetime=ENGINE_MOVE_TIME) if timedSearch else None
+            move = engine.find_best_move(board, depth=int(depth), time_manager=time_manager)
 
             # End the timer
             end_time = time.time()
@@ -79,57 +97,41 @@ def main():
 
             # Print the time taken
             print(f"Engine took {elapsed_time:.2f} seconds to decide on the move.")
-
-            # If the dynamic depth is enabled check if the depth of the search can be increased
-            if (dynamicDepth and board.fullmove_number >= 16 and elapsed_time < 0.25):
-                depth = int(depth) + 1
         else:
             move = input("Enter your move: ").strip().lower()
 
         if (move == 'resign' or move == 'r'):
             print(f"{turn.capitalize()} resigns. {('Black' if turn == 'white' else 'White')} wins!")
+            result = '0-1' if turn == 'white' else '1-0'
             break
 
         if (move == 'fen'):
             board.from_fen(input("Enter FEN: "))
+            start_fen = board.to_fen()  # A new game starts from the position
+            moves = []
             continue
 
         try:
             start_str, end_str = move.split()
             start = parse_position(start_str)
-            end = parse_position(end_str)
+            end = parse_position(end_str[:2])
+            promotion = PROMOTIONS.get(end_str[2:3])  # The engine's promotions come as "e7 e8q"
             piece = board.board[start[0]][start[1]]
 
             if (piece and piece.color == turn):
-                if board.move_piece(start, end, turn, False, engineFlag):
+                compact_move: int = board.compact_move(square_index(start), square_index(end), promotion or 'queen')
+                if board.move_piece(start, end, turn, False, engineFlag, promotion):
+                    if move_promotion(compact_move):
+                        # A promotion typed without its letter was chosen on the board, record the piece put there
+                        promoted: str = board.squares[square_index(end)].piece_type
+                        compact_move = encode_move(square_index(start), square_index(end), PROMOTION_CODES[promoted],
+                                                   is_capture(compact_move))
+                    moves.append(compact_move)
                     turn = board.updateTurn()
                     last_move = (start, end, piece)
                     board.updateEnPassantSquare(turn, last_move)
                     board.updateFENstack()
                     update_threefold_repetition = True
-
-                    # Update the has_move atributes for the engine's color in case the engine played a move
-                    # Player's has_move atributes are been updated inside the move_piece_helper() function
-                    if (engineFlag):
-                        x, y = end
-                        if isinstance(board.board[x][y], King):
-                            board.board[x][y].has_moved = True
-                            # Castling move
-                            if (abs(start[0] - end[0]) == 2):
-                                if (end[0] == 6):  # Kingside
-                                    if (turn == 'white'):
-                                        rook: Rook = board.pieces[color][(5, 0)]  # It's (5, 0) because the castling move has already been played
-                                    else:
-                                        print(board.pieces[color])
-                                        rook: Rook = board.pieces[color][(5, 7)]
-                                elif (end[0] == 2):  # Queenside
-                                    if (turn == 'white'):
-                                        rook: Rook = board.pieces[color][(3, 0)]
-                                    else:
-                                        rook: Rook = board.pieces[color][(3, 7)]
-                                rook.has_moved = True
-                        elif isinstance(board.board[x][y], Rook):
-                            board.board[x][y].has_moved = True
                 else:
                     print("""
 Invalid move, try again.""")
@@ -140,5 +142,21 @@ No valid piece to move at that position.""")
             print("""
 Invalid input, format should be 'e2 e4'.""")
 
+    if args.pgn:
+        record_game(args.pgn, start_fen, moves, result, color)
+
+
+def record_game(path: str, start_fen: str, moves: List[int], result: str, color: Optional[str]) -> None:
+    """Append the game to a PGN file, with the player and the engine as White and Black."""
+    headers = {'Event': "Game against the engine", 'Date': time.strftime('%Y.%m.%d'),
+               'White': "Player" if color == 'white' else "Engine",
+               'Black': "Player" if color == 'black' else "Engine", 'Result': result}
+    if start_fen != START_FEN:
+        headers['FEN'] = start_fen
+    with open(path, 'a') as output:
+        write_game(output, headers, moves)
+    print(f"Game saved to {path}")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+# Streaming reader and writer of PGN game collections. The games are read one at a time, so a file of millions
+# of games is parsed in constant memory, and SAN moves are parsed and generated with the legal move generator.
+
+import re
+from typing import Optional, Dict, Tuple, Iterable, Iterator, TextIO, List
+from bitboard import move_start, move_end, move_kind, move_promotion, is_capture, CASTLING_FLAG, EN_PASSANT_FLAG
+from board import ChessBoard
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+SAN_PIECES = {'N': 'knight', 'B': 'bishop', 'R': 'rook', 'Q': 'queen', 'K': 'king'}
+SAN_LETTERS = {piece_type: letter for letter, piece_type in SAN_PIECES.items()}
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')  # Headers every game has, in this order
+LINE_LENGTH = 79  # Longest movetext line written
+
+HEADER_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+COMMENT_PATTERN = re.compile(r'\{[^}]*\}|;[^\n]*')  # Brace comments and rest-of-line comments
+VARIATION_PATTERN = re.compile(r'\([^()]*\)')  # Innermost variation, removed until none is left
+MOVE_NUMBER_PATTERN = re.compile(r'^\d+\.+')
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+
+def split_games(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the text of every game of a PGN stream (its header lines and its movetext). A game ends
+    where the header of the next one starts, so only one game is held in memory."""
+    game: list[str] = []
+    in_movetext = False
+    for line in lines:
+        if line.startswith('%'):
+            continue  # Escaped line, ignored by PGN readers
+        if line.startswith('['):
+            if in_movetext:
+                yield ''.join(game)
+                game = []
+                in_movetext = False
+        elif line.strip():
+            in_movetext = True
+        game.append(line)
+    if any(line.strip() for line in game):
+        yield ''.join(game)
+
+
+def parse_game(text: str) -> Tuple[Dict[str, str], List[str]]:
+    """Split the text of a game into its headers ({"White": "...", ...}) and its main line of SAN moves,
+    without the move numbers, comments, variations, annotations and the result."""
+    headers: Dict[str, str] = {}
+    movetext: list[str] = []
+    for line in text.splitlines():
+        header = HEADER_PATTERN.match(line.strip()) if line.startswith('[') else None
+        if header:
+            headers[header.group(1)] = header.group(2).replace('\\"', '"').replace('\\\\', '\\')
+        else:
+            movetext.append(line)
+
+    moves_text: str = COMMENT_PATTERN.sub(' ', '\n'.join(movetext))
+    previous = None
+    while previous != moves_text:
+        previous, moves_text = moves_text, VARIATION_PATTERN.sub(' ', moves_text)
+
+    moves: list[str] = []
+    for token in moves_text.split():
+        token = MOVE_NUMBER_PATTERN.sub('', token).rstrip('+#!?')
+        if token and not token.startswith('$') and token not in RESULTS:
+            moves.append(token)
+    return headers, moves
+
+
+def start_board(headers: Dict[str, str], board: Optional[ChessBoard] = None) -> ChessBoard:
+    """Set up the start position of a game, the FEN header if there is one, on the board (a new board if None)."""
+    if board is None:
+        board = ChessBoard()
+    board.from_fen(headers.get('FEN', START_FEN))
+    return board
+
+
+def parse_san(board: ChessBoard, san: str) -> int:
+    """Return the compact move of a SAN move ("Nbd7", "exd8=Q", "O-O") in the position of the board.
+    It is looked up among the legal moves, so a SAN move matches exactly one of them.
+    Raises ValueError if the move isn't legal or is ambiguous."""
+    san = san.rstrip('+#!?')
+    moves = board.generate_moves(board.turn)
+    if san.replace('0', 'O') in ('O-O', 'O-O-O'):
+        file: int = 6 if san.replace('0', 'O') == 'O-O' else 2
+        matches = [move for move in moves if move_kind(move) == CASTLING_FLAG and move_end(move) & 7 == file]
+    else:
+        parts = SAN_PATTERN.match(san)
+        if not parts:
+            raise ValueError(f"Invalid SAN move: {san}")
+        piece_letter, from_file, from_rank, capture, target, promotion_letter = parts.groups()
+        piece_type: str = SAN_PIECES[piece_letter] if piece_letter else 'pawn'
+        if piece_type == 'pawn' and not from_file:
+            from_file = target[0]  # A pawn move without its file ("e4") stays on the file, captures name it ("exd5")
+        end: int = (ord(target[0]) - ord('a')) + 8 * (int(target[1]) - 1)
+        promotion: Optional[str] = SAN_PIECES[promotion_letter] if promotion_letter else None
+        pieces: int = board.bitboards[board.turn][piece_type]
+        matches = [move for move in moves
+                   if move_end(move) == end and (pieces >> move_start(move)) & 1
+                   and move_kind(move) != CASTLING_FLAG and move_promotion(move) == promotion
+                   and bool(capture) == (is_capture(move) or move_kind(move) == EN_PASSANT_FLAG)
+                   and (not from_file or move_start(move) & 7 == ord(from_file) - ord('a'))
+                   and (not from_rank or move_start(move) >> 3 == int(from_rank) - 1)]
+    if len(matches) != 1:
+        raise ValueError(f"{'Ambiguous' if matches else 'Illegal'} SAN move: {san}")
+    return matches[0]
+
+
+def read_games(lines: Iterable[str]) -> Iterator[Tuple[Dict[str, str], List[int]]]:
+    """Yield the headers and the compact moves of every game of a PGN stream (an open file or any iterable
+    of lines), one game at a time. The moves of a game stop at the first one that isn't legal."""
+    board = ChessBoard()
+    for text in split_games(lines):
+        headers, san_moves = parse_game(text)
+        moves: list[int] = []
+        try:
+            start_board(headers, board)
+            for san in san_moves:
+                move: int = parse_san(board, san)
+                board.make_compact_move(move)
+                moves.append(move)
+        except (ValueError, IndexError, KeyError):
+            pass  # An illegal move or FEN, the game is cut there
+        yield headers, moves
+
+
+def move_to_san(board: ChessBoard, move: int) -> str:
+    """Return the SAN of a legal move in the position of the board ("Nbd7", "exd8=Q+", "O-O#"). The start square
+    is only given as far as another legal move of the same piece type to the same square needs it."""
+    start: int = move_start(move)
+    end: int = move_end(move)
+    target: str = f"{chr(ord('a') + (end & 7))}{(end >> 3) + 1}"
+    piece_type: str = board.squares[start].piece_type
+    capture: bool = is_capture(move) or move_kind(move) == EN_PASSANT_FLAG
+
+    if move_kind(move) == CASTLING_FLAG:
+        san: str = 'O-O' if end & 7 == 6 else 'O-O-O'
+    elif piece_type == 'pawn':
+        san = (f"{chr(ord('a') + (start & 7))}x" if capture else '') + target
+        if move_promotion(move):
+            san += '=' + SAN_LETTERS[move_promotion(move)]
+    else:
+        pieces: int = board.bitboards[board.turn][piece_type]
+        rivals: list[int] = [move_start(other) for other in board.generate_moves(board.turn)
+                             if move_end(other) == end and move_start(other) != start and (pieces >> move_start(other)) & 1]
+        disambiguation = ''
+        if rivals:
+            if all(rival & 7 != start & 7 for rival in rivals):
+                disambiguation = chr(ord('a') + (start & 7))
+            elif all(rival >> 3 != start >> 3 for rival in rivals):
+                disambiguation = str((start >> 3) + 1)
+            else:
+                disambiguation = f"{chr(ord('a') + (start & 7))}{(start >> 3) + 1}"
+        san = SAN_LETTERS[piece_type] + disambiguation + ('x' if capture else '') + target
+
+    # The check and checkmate suffixes need the position after the move
+    board.make_compact_move(move)
+    if board.is_in_check(board.turn):
+        san += '+' if board.generate_moves(board.turn) else '#'
+    board.unmake_move()
+    return san
+
+
+def format_game(headers: Dict[str, str], moves: Iterable[int]) -> str:
+    """Return the PGN text of a game: its headers (the seven tag roster first, "?" when missing) and its
+    moves in SAN from the start position of the headers (the FEN header if there is one), ended by the result."""
+    headers = dict(headers)
+    if 'FEN' in headers:
+        headers.setdefault('SetUp', '1')
+    lines: list[str] = []
+    for name in SEVEN_TAG_ROSTER + tuple(name for name in headers if name not in SEVEN_TAG_ROSTER):
+        value: str = headers.get(name, '*' if name == 'Result' else '?')
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'[{name} "{value}"]')
+    lines.append('')
+
+    board: ChessBoard = start_board(headers)
+    tokens: list[str] = []
+    for move in moves:
+        if board.turn == 'white' or not tokens:
+            tokens.append(f"{board.fullmove_number}." if board.turn == 'white' else f"{board.fullmove_number}...")
+        tokens.append(move_to_san(board, move))
+        board.make_compact_move(move)
+    tokens.append(headers.get('Result', '*'))
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def write_game(output: TextIO, headers: Dict[str, str], moves: Iterable[int]) -> None:
+    """Append a game to an open PGN file, see format_game()."""
+    output.write(format_game(headers, moves))
+    output.flush()
@@ -1,16 +1,17 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 from .piece import ChessPiece
 from .pawn import Pawn
-from .rook import Rook
 from .knight import Knight
 from .bishop import Bishop
 from .queen import Queen
+from bitboard import square_index, square_position
 
 class King(ChessPiece):
+    piece_type = 'king'
+
     def __init__(self, color: str) -> None:
         super().__init__(color)
-        self.has_moved = False
 
     def __name__(self) -> str:
         return 'King'
@@ -18,7 +19,7 @@ class King(ChessPiece):
     def __str__(self) -> str:
         return '♚' if self.color == 'white' else '♔'
 
-    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]], board_instance=None) -> bool:
+    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]], board_instance=None) -> bool:
         """A king can move one square in any direction. It can also castle if certain conditions are met."""
         dx: int = abs(start[0] - end[0])
         dy: int = abs(start[1] - end[1])
@@ -27,41 +28,16 @@ class King(ChessPiece):
         if (max(dx, dy) == 1):
             return True
 
-        # Castling move
-        if dx == 2 and dy == 0 and not self.has_moved:
-            row: int = start[1]
-
-            # Kingside castling
-            if end[0] == 6:
-                if isinstance(board[7][row], Rook) and not board[7][row].has_moved and board_instance:  # Check if rook is there and hasn't moved
-                    # Check if path is clear and safe (f1 and g1 for white, f8 and g8 for black)
-                    if (board[5][row] is None and board[6][row] is None and
-                        not board_instance.is_square_under_attack((5, row), self.color) and
-                        not board_instance.is_square_under_attack((6, row), self.color)):
-                        return True
-
-            # Queenside castling
-            elif end[0] == 2:
-                if isinstance(board[0][row], Rook) and not board[0][row].has_moved and board_instance:  # Check if rook is there and hasn't moved
-                    # Check if path is clear and safe (d1, c1, and b1 for white; d8, c8, and b8 for black)
-                    if (board[1][row] is None and board[2][row] is None and board[3][row] is None and
-                        not board_instance.is_square_under_attack((2, row), self.color) and
-                        not board_instance.is_square_under_attack((3, row), self.color)):
-                        return True
+        # Castling move (the castling rights, the empty path and the attacked squares are checked by the board)
+        if dx == 2 and dy == 0 and board_instance:
+            return bool(board_instance.castling_targets(self.color) & (1 << square_index(end)))
         return False
 
     def is_in_check(self, color: str, chessboard_instance: 'ChessBoard') -> bool:
         """Determine if the king of the given color is in check."""
-        king_position = chessboard_instance.white_king_position if color == 'white' else chessboard_instance.black_king_position
-        opponent_color = 'black' if color == 'white' else 'white'
-
-        # Check if any of the opponent's pieces can move to the king's position
-        for pos, piece in chessboard_instance.pieces[opponent_color].items():
-            if piece.is_valid_move(pos, king_position, chessboard_instance.board):
-                return True  # King is in check
-        return False
+        return chessboard_instance.is_in_check(color)
 
-    def get_blocking_squares(self, king_position: Tuple[int, int], checking_position: Tuple[int, int]) -> list[Tuple[int, int]]:
+    def get_blocking_squares(self, king_position: Tuple[int, int], checking_position: Tuple[int, int]) -> List[Tuple[int, int]]:
         """Return a list of squares between the king and the checking piece that could potentially block the check."""
         blocking_squares = []
         king_x, king_y = king_position
@@ -78,14 +54,14 @@ class King(ChessPiece):
 
     def get_checking_piece(self, king_position: Tuple[int, int], opponent_color: str, chessboard_instance: 'ChessBoard') -> Tuple[Optional[Tuple[int, int]], Optional[ChessPiece]]:
         """Return the position and piece that is checking the king, if any."""
-        for pos, piece in chessboard_instance.pieces[opponent_color].items():
-            pos: Tuple[int, int]
-            piece: ChessPiece
-            if not isinstance(piece, King) and piece.is_valid_move(pos, king_position, chessboard_instance.board):
-                return pos, piece
+        checkers: int = chessboard_instance.attackers_to(square_index(king_position), opponent_color)
+        checkers &= ~chessboard_instance.bitboards[opponent_color]['king']
+        if checkers:
+            pos: Tuple[int, int] = square_position((checkers & -checkers).bit_length() - 1)
+            return pos, chessboard_instance.board[pos[0]][pos[1]]
         return None, None
 
-    def legal_moves(self, position: Tuple[int, int], color: str) -> list[Tuple[int, int]]:
+    def legal_moves(self, position: Tuple[int, int], color: str) -> List[Tuple[int, int]]:
         """Generate all the possible legal moves for a king in a given position."""
         x, y = position
         moves = []
@@ -1,8 +1,10 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 from .piece import ChessPiece
 
 class Knight(ChessPiece):
+    piece_type = 'knight'
+
     def __init__(self, color: str) -> None:
         super().__init__(color)
 
@@ -12,13 +14,13 @@ class Knight(ChessPiece):
     def __str__(self) -> str:
         return '♞' if self.color == 'white' else '♘'
 
-    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]]) -> bool:
+    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]]) -> bool:
         """A knight can move 2 squares in one direction and 1 square in a perpendicular direction."""
         dx = abs(start[0] - end[0])
         dy = abs(start[1] - end[1])
         return (dx, dy) in [(1, 2), (2, 1)]
 
-    def legal_moves(self, position: Tuple[int, int], color: str) -> list[Tuple[int, int]]:
+    def legal_moves(self, position: Tuple[int, int], color: str) -> List[Tuple[int, int]]:
         """Generate all the possible legal moves for a knight in a given position."""
         x, y = position
         moves = []
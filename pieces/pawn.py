@@ -1,5 +1,5 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 from .piece import ChessPiece
 from .rook import Rook
 from .knight import Knight
@@ -8,6 +8,8 @@ from .queen import Queen
 from utils import parse_position
 
 class Pawn(ChessPiece):
+    piece_type = 'pawn'
+
     def __init__(self, color: str) -> None:
         super().__init__(color)
 
@@ -17,7 +19,7 @@ class Pawn(ChessPiece):
     def __str__(self) -> str:
         return '♟' if self.color == 'white' else '♙'
 
-    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]], chessboard_instance: Optional['ChessBoard'] = None) -> bool:
+    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]], chessboard_instance: Optional['ChessBoard'] = None) -> bool:
         """A pawn can move forward one square, or two squares from its starting position. It captures diagonally."""
         direction = 1 if self.color == 'white' else -1
         start_x, start_y = start
@@ -34,39 +36,36 @@ class Pawn(ChessPiece):
             # Standard capture
             if board[end_x][end_y] is not None:
                 return True
-            # En passant capture
+            # En passant capture (the captured pawn is removed by the board when the move is played)
             if chessboard_instance:
                 en_passant_square: str = chessboard_instance.en_passant_square
                 if en_passant_square and end == parse_position(en_passant_square):
-                    # Remove the en-passant-captured pawn
-                    board[end_x][start_y] = None
                     return True
         return False
 
     def promote_pawn(self, position: Tuple[int, int], color: str, chessboard_instance: 'ChessBoard') -> None:
         """Promote a pawn that reaches the final rank to a new piece chosen by the player."""
-        x, y = position
         while True:
             choice = input("Promote pawn to (Q)ueen, (R)ook, (B)ishop, or (K)night: ").strip().upper()
             if choice == 'Q':
-                chessboard_instance.board[x][y] = Queen(color)
+                promoted_piece = Queen(color)
                 break
             elif choice == 'R':
-                chessboard_instance.board[x][y] = Rook(color)
+                promoted_piece = Rook(color)
                 break
             elif choice == 'B':
-                chessboard_instance.board[x][y] = Bishop(color)
+                promoted_piece = Bishop(color)
                 break
             elif choice == 'K':
-                chessboard_instance.board[x][y] = Knight(color)
+                promoted_piece = Knight(color)
                 break
             else:
                 print("Invalid choice. Please select Q, R, B, or K.")
-        
-        # Update pieces dictionary to reflect the promoted piece
-        chessboard_instance.pieces[color][position] = chessboard_instance.board[x][y]
 
-    def legal_moves(self, position: Tuple[int, int], color: str) -> list[Tuple[int, int]]:
+        # Replace the pawn on the board (and its bitboards) with the promoted piece
+        chessboard_instance.set_piece(position, promoted_piece)
+
+    def legal_moves(self, position: Tuple[int, int], color: str) -> List[Tuple[int, int]]:
         """Generate all the posible legal moves for a pawn in a given position."""
         direction = 1 if self.color == 'white' else -1
         x, y = position
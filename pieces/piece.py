@@ -1,7 +1,9 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 
 class ChessPiece:
+    piece_type = None  # Name of the bitboard that tracks the piece, e.g. 'pawn'
+
     def __init__(self, color: str) -> None:
         self.color = color
 
@@ -11,5 +13,5 @@ class ChessPiece:
     def __str__(self) -> str:
         raise NotImplementedError("This method should be implemented by subclasses.")
 
-    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional['ChessPiece']]]) -> bool:
+    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional['ChessPiece']]]) -> bool:
         raise NotImplementedError("This method should be implemented by subclasses.")
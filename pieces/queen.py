@@ -1,8 +1,10 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 from .piece import ChessPiece
 
 class Queen(ChessPiece):
+    piece_type = 'queen'
+
     def __init__(self, color: str) -> None:
         super().__init__(color)
 
@@ -12,7 +14,7 @@ class Queen(ChessPiece):
     def __str__(self) -> str:
         return '♛' if self.color == 'white' else '♕'
 
-    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]]) -> bool:
+    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]]) -> bool:
         """A queen can move horizontally, vertically, or diagonally as long as the path is clear."""
         start_x, start_y = start
         end_x, end_y = end
@@ -27,7 +29,7 @@ class Queen(ChessPiece):
 
         return False
 
-    def is_path_clear(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]]) -> bool:
+    def is_path_clear(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]]) -> bool:
         """Helper function to check if all squares between start and end are empty."""
         x, y = start
         x2, y2 = end
@@ -42,7 +44,7 @@ class Queen(ChessPiece):
             x, y = x + dx, y + dy  # Move to the next square
         return True
 
-    def legal_moves(self, position: Tuple[int, int], color: str) -> list[Tuple[int, int]]:
+    def legal_moves(self, position: Tuple[int, int], color: str) -> List[Tuple[int, int]]:
         """Generate all the posible legal moves for a queen in a given position."""
         x, y = position
         moves = []
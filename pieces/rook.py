@@ -1,11 +1,12 @@
 
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 from .piece import ChessPiece
 
 class Rook(ChessPiece):
+    piece_type = 'rook'
+
     def __init__(self, color: str) -> None:
         super().__init__(color)
-        self.has_moved = False
 
     def __name__(self) -> str:
         return 'Rook'
@@ -13,7 +14,7 @@ class Rook(ChessPiece):
     def __str__(self) -> str:
         return '♜' if self.color == 'white' else '♖'
 
-    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]]) -> bool:
+    def is_valid_move(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]]) -> bool:
         """A rook can move horizontally or vertically as long as the path is clear."""
         start_x, start_y = start
         end_x, end_y = end
@@ -22,7 +23,7 @@ class Rook(ChessPiece):
                 return True
         return False
 
-    def is_path_clear(self, start: Tuple[int, int], end: Tuple[int, int], board: list[list[Optional[ChessPiece]]]) -> bool:
+    def is_path_clear(self, start: Tuple[int, int], end: Tuple[int, int], board: List[List[Optional[ChessPiece]]]) -> bool:
         """Helper function to check if all squares between start and end are empty."""
         x, y = start
         x2, y2 = end
@@ -37,7 +38,7 @@ class Rook(ChessPiece):
             x, y = x + dx, y + dy  # Move to the next square
         return True
 
-    def legal_moves(self, position: Tuple[int, int], color: str) -> list[Tuple[int, int]]:
+    def legal_moves(self, position: Tuple[int, int], color: str) -> List[Tuple[int, int]]:
         """Generate all the posible legal moves for a rook in a given position."""
         x, y = position
         moves = []
@@ -1,8 +1,10 @@
 
 # This file is heavily inspired from the python-chess library
 
+import mmap
+import os
 import struct
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, Iterator, List
 
 
 # 781 random 64-bit integers from python-chess library. They ensure a uniform distribution and a low collision probability
@@ -205,10 +207,22 @@ POLYGLOT_RANDOM_ARRAY = [
     0xF8D626AAAF278509
 ]
 
+# The same random values split by color and piece type so that the board can update its hash incrementally
+ZOBRIST_PIECE_KEYS = {
+    color: {
+        piece_type: [POLYGLOT_RANDOM_ARRAY[64 * (index * 2 + (1 if color == 'white' else 0)) + square] for square in range(64)]
+        for index, piece_type in enumerate(('pawn', 'knight', 'bishop', 'rook', 'queen', 'king'))
+    }
+    for color in ('white', 'black')
+}
+ZOBRIST_CASTLING_KEYS = {'K': POLYGLOT_RANDOM_ARRAY[768], 'Q': POLYGLOT_RANDOM_ARRAY[769], 'k': POLYGLOT_RANDOM_ARRAY[770], 'q': POLYGLOT_RANDOM_ARRAY[771]}
+ZOBRIST_EN_PASSANT_KEYS = POLYGLOT_RANDOM_ARRAY[772:780]  # One value per file
+ZOBRIST_TURN_KEY = POLYGLOT_RANDOM_ARRAY[780]
+
 
 class ZobristHasher:
 
-    def __init__(self, array: list[int]) -> None:
+    def __init__(self, array: List[int]) -> None:
         """Initialize the Zobrist hasher with a predefined random array.
         array: A list of 781 64-bit integers representing the Zobrist hashing 
         values for pieces, castling rights, en passant files, and turn."""
@@ -274,10 +288,40 @@ class ZobristHasher:
 class Polyglot:
     """Class to handle reading Polyglot opening books."""
 
+    ENTRY_SIZE = 16  # Every entry is a big-endian 64-bit key, 16-bit move, 16-bit weight and 32-bit learn value
+    ENTRY_FORMAT = struct.Struct(">QHHI")
+
     def __init__(self, book_path: Optional[str] = None) -> None:
         """Initialize the Polyglot reader. Sometimes we don't pass a book_path
         because we only care about the zobristHash() method."""
         self.book_path = book_path
+        self.book = None  # Open file handle of the book
+        self.mapped_book = None  # Memory map of the whole book, shared by every probe
+        self.entry_count = 0
+
+    def open(self) -> None:
+        """Open and memory-map the book once. Later probes reuse the same map."""
+        if self.mapped_book is not None:
+            return
+        try:
+            self.book = open(self.book_path, "rb")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Polyglot file not found: {self.book_path}")
+        self.entry_count = os.fstat(self.book.fileno()).st_size // self.ENTRY_SIZE
+        if self.entry_count:
+            self.mapped_book = mmap.mmap(self.book.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.mapped_book = b''  # An empty file can't be memory-mapped
+
+    def close(self) -> None:
+        """Release the memory map and the file handle."""
+        if isinstance(self.mapped_book, mmap.mmap):
+            self.mapped_book.close()
+        if self.book:
+            self.book.close()
+        self.book = None
+        self.mapped_book = None
+        self.entry_count = 0
 
     def zobristHash(self, board, pieces: Dict[Tuple[int, int], Tuple[str, str]], castling_rights: str, ep_square: Optional[Tuple[int, int]], turn: str, pawns: Dict[Tuple[int, int], str]) -> int:
         """Compute the Polyglot Zobrist hash for a given board state using the ZobristHasher.
@@ -290,41 +334,55 @@ class Polyglot:
 
         return hash_value
 
-    def reader(self, board, pieces: Dict[Tuple[int, int], Tuple[str, str]], castling_rights: str, ep_square: Optional[Tuple[int, int]], turn: str, pawns: Dict[Tuple[int, int], str]) -> None:
+    def reader(self, board, pieces: Dict[Tuple[int, int], Tuple[str, str]], castling_rights: str, ep_square: Optional[Tuple[int, int]], turn: str, pawns: Dict[Tuple[int, int], str]) -> Iterator[Tuple[int, str]]:
         """Query the Polyglot book for the current board state.
         Yields a Tuple[int, str]: (Weight in int, Move in UCI "e2e4" format)."""
-        try:
-            zobrist_hash: int = self.zobristHash(board, pieces, castling_rights, ep_square, turn, pawns)
-            with open(self.book_path, "rb") as book:
-                # Read entries in the book
-                while True:
-                    data = book.read(16)
-                    if not data:
-                        break
+        zobrist_hash: int = self.zobristHash(board, pieces, castling_rights, ep_square, turn, pawns)
+        yield from self.find_entries(zobrist_hash)
 
-                    entry = struct.unpack(">QHHI", data)
-                    entry_hash, move, weight, learn = entry
-
-                    if entry_hash == zobrist_hash:
-                        # Extract origin and destination squares
-                        from_file = (move >> 6) & 7
-                        from_rank = (move >> 9) & 7
-                        to_file = (move >> 0) & 7
-                        to_rank = (move >> 3) & 7
-
-                        # Convert move to UCI "e2e4" format
-                        from_square = f"{chr(from_file + ord('a'))}{from_rank + 1}"
-                        to_square = f"{chr(to_file + ord('a'))}{to_rank + 1}"
+    def find_entries(self, zobrist_hash: int) -> Iterator[Tuple[int, str]]:
+        """Query the Polyglot book for a position by its Zobrist hash. The entries of a book are sorted by key,
+        so a binary search finds the first matching entry and only the run of matching entries is read.
+        Yields a Tuple[int, str]: (Weight in int, Move in UCI "e2e4" format)."""
+        try:
+            self.open()
+            book = self.mapped_book
+            unpack_from = self.ENTRY_FORMAT.unpack_from
 
-                        promotion = (move >> 12) & 7
-                        if promotion:
-                            promo_piece = "nbrq"[promotion - 1]
-                            uci_move = f"{from_square}{to_square}{promo_piece}"
-                        else:
-                            uci_move = f"{from_square}{to_square}"
+            # Binary search for the first entry with the key
+            low, high = 0, self.entry_count
+            while low < high:
+                middle = (low + high) // 2
+                if unpack_from(book, middle * self.ENTRY_SIZE)[0] < zobrist_hash:
+                    low = middle + 1
+                else:
+                    high = middle
 
-                        yield weight, uci_move
+            # Read the entries in the book
+            for index in range(low, self.entry_count):
+                entry_hash, move, weight, learn = unpack_from(book, index * self.ENTRY_SIZE)
+                if entry_hash != zobrist_hash:
+                    break
+                yield weight, self.decode_move(move)
         except FileNotFoundError:
-            raise FileNotFoundError(f"Polyglot file not found: {self.book_path}")
+            raise
         except Exception as e:
             raise RuntimeError(f"Error reading Polyglot file: {e}")
+
+    def decode_move(self, move: int) -> str:
+        """Convert a 16-bit Polyglot move to UCI "e2e4" format."""
+        # Extract origin and destination squares
+        from_file = (move >> 6) & 7
+        from_rank = (move >> 9) & 7
+        to_file = (move >> 0) & 7
+        to_rank = (move >> 3) & 7
+
+        # Convert move to UCI "e2e4" format
+        from_square = f"{chr(from_file + ord('a'))}{from_rank + 1}"
+        to_square = f"{chr(to_file + ord('a'))}{to_rank + 1}"
+
+        promotion = (move >> 12) & 7
+        if promotion:
+            promo_piece = "nbrq"[promotion - 1]
+            return f"{from_square}{to_square}{promo_piece}"
+        return f"{from_square}{to_square}"
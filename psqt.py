@@ -0,0 +1,97 @@
+# Contains the piece values and the piece-square tables of the evaluation, and the combined
+# per-square scores that the board keeps as running totals.
+
+from typing import Dict, List
+
+# Assign static values to pieces for the heuristic
+PIECE_VALUES = {
+    'pawn': 1,
+    'knight': 3,
+    'bishop': 3.5,
+    'rook': 5,
+    'queen': 9,
+    'king': 10000  # King is invaluable for evaluation
+}
+
+# Piece-tables. They ensure a quick evaluation of a piece's position
+POSITIONAL_VALUES = {
+    'pawn': [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [3, 3, 3, 3, 3, 3, 3, 3],
+        [1, 1, 2, 2.5, 2.5, 2, 1, 1],
+        [0.5, 0.5, 1, 2, 2, 1, 0.5, 0.5],
+        [0, 0, 0, 1.5, 1.5, 0, 0, 0],
+        [0.8, 0.7, 0.5, -0.5, -0.5, -1, 0.7, 0.8],
+        [0.7, 1, 1, -2, -2, 1, 1, 0.7],
+        [0, 0, 0, 0, 0, 0, 0, 0]
+    ],
+    'knight': [
+        [-5, -4, -3, -3, -3, -3, -4, -5],
+        [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
+        [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
+        [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
+        [-3, 0.5, 1.5, 2, 2, 1.5, 0.5, -3],
+        [-3, 0, 1, 1.5, 1.5, 1, 0, -3],
+        [-4, -2, 0, 0.5, 0.5, 0, -2, -4],
+        [-5, -4, -3, -3, -3, -3, -4, -5]
+    ],
+    'bishop': [
+        [-2, -1, -1, -1, -1, -1, -1, -2],
+        [-1.5, 0, 0, 0, 0, 0, 0, -1.5],
+        [-1.5, 0, 0.5, 1, 1, 0.5, 0, -1.5],
+        [-1.5, 1, 0.5, 1, 1, 0.5, 1, -1.5],
+        [-1.5, 0, 1, 1, 1, 1, 0, -1.5],
+        [-1.5, 1, 1, 1, 1, 1, 1, -1.5],
+        [-1, 1, 0, 0, 0, 0, 1, -1],
+        [-1, -1, -1, -1, -1, -1, -1, -1]
+    ],
+    'rook': [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0.7, 1, 1, 1, 1, 1, 1, 0.7],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [-0.5, 0, 0, 0, 0, 0, 0, -0.5],
+        [0, 0, 0.2, 0.5, 0.5, 0.2, 0, 0]
+    ],
+    'queen': [
+        [-2, -1, -0.5, -0.5, -0.5, -0.5, -1, -2],
+        [-1, 0, 0, 0, 0, 0, 0, -1],
+        [-1, 0, 0.5, 0.5, 0.5, 0.5, 0, -1],
+        [0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
+        [0, 0, 0.5, 0.5, 0.5, 0.5, 0, -0.5],
+        [-1, 0.5, 0.5, 0.5, 0.5, 0.5, 0, -1],
+        [-1, 0, 0.5, 0, 0, 0, 0, -1],
+        [-2, -1, -0.5, -0.5, -0.5, -0.5, -1, -2]
+    ],
+    'king': [
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-3, -4, -4, -5, -5, -4, -4, -3],
+        [-2, -3, -3, -4, -4, -3, -3, -2],
+        [-1, -2, -2, -2, -2, -2, -2, -1],
+        [1.5, 1.5, -0.3, -0.3, -0.3, -0.3, 1.5, 1.5],
+        [2, 3, 3, -0.3, 0, 0.5, 3, 2]
+    ]
+}
+
+EVALUATION_SCALE = 10000  # The running totals are integers in 1/10000 of an evaluation unit, so they never drift
+
+
+def piece_square_score(piece_type: str, square: int) -> int:
+    """Return the part of a piece's evaluation that depends only on its type and square:
+    the material, the piece-table value and, for kings, the table part of the king safety."""
+    x, y = square & 7, square >> 3
+    positional_value: float = POSITIONAL_VALUES[piece_type][y][x]
+    value: float = 3 * PIECE_VALUES[piece_type] + 0.1 * positional_value
+    if piece_type == 'king':
+        value += 0.001 * positional_value * 0.6
+    return round(value * EVALUATION_SCALE)
+
+
+# Score of every piece type on every square index
+PIECE_SQUARE_SCORES: Dict[str, List[int]] = {
+    piece_type: [piece_square_score(piece_type, square) for square in range(64)] for piece_type in PIECE_VALUES
+}
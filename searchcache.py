@@ -0,0 +1,90 @@
+# Persistent cache of search results, shared by all runs of the engine on the same machine.
+# A result (depth, score and best move of a completed search) is stored under the Polyglot Zobrist key of
+# its position in a SQLite file, so a batch job that analyses a position again skips the search when the
+# cached depth is deep enough. The least recently used entries are removed when the cache is full.
+# Only searches to a fixed depth are answered from the cache: a search limited by time asks for the maximum
+# depth, which no cached result reaches, but its result is still stored for the later searches to a depth.
+
+import os
+import sqlite3
+import time
+from typing import Optional, Tuple
+from bitboard import ATTACK_CACHE_PATH
+
+SEARCH_CACHE_VERSION = 2  # Increase when the evaluation or the move encoding changes, older results are dropped
+SEARCH_CACHE_PATH = os.path.join(os.path.dirname(ATTACK_CACHE_PATH), 'search-cache.sqlite')
+DEFAULT_MAX_ENTRIES = 1_000_000  # About 50 MB on disk
+EVICTION_BATCH = 1024  # Entries removed at once when the cache is full, so eviction runs rarely
+
+
+def signed_key(key: int) -> int:
+    """Return the 64-bit Zobrist key as a signed integer, the type of an SQLite integer."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class SearchCache:
+    """Search results stored on disk by Zobrist key, with the least recently used entries evicted
+    beyond max_entries. The file can be used by several processes at the same time.
+    The number of entries is counted when the file is opened and kept up to date by this process only, so
+    the entries of other processes are noticed when the count reaches max_entries and the table is counted again.
+    An entry is marked with the time of its last use, which orders the uses of all the processes."""
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        if max_entries < 1:
+            raise ValueError("The search cache must hold at least one entry.")
+        self.path = path  # SQLite file of the cache
+        self.max_entries = max_entries  # Entries kept, the least recently used ones are removed first
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)  # Autocommit, every write is durable
+        self.connection.execute('PRAGMA journal_mode=WAL')  # Readers don't block the writer of another process
+
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != SEARCH_CACHE_VERSION:
+            self.connection.execute('DROP TABLE IF EXISTS results')
+            self.connection.execute(f'PRAGMA user_version = {SEARCH_CACHE_VERSION}')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (key INTEGER PRIMARY KEY, depth INTEGER NOT NULL, '
+                                'score REAL NOT NULL, best_move INTEGER NOT NULL, used INTEGER NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+        self.entry_count: int = self.usage()  # Entries known to this process, counted again when it reaches max_entries
+
+    def close(self) -> None:
+        """Close the file."""
+        self.connection.close()
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self.connection.execute('DELETE FROM results')
+        self.entry_count = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, float, int]]:
+        """Return (depth, score for the side to move, best_move) of the position with the Zobrist key,
+        or None if it isn't cached. The entry is marked as the most recently used."""
+        row = self.connection.execute('SELECT depth, score, best_move FROM results WHERE key = ?',
+                                      (signed_key(key),)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute('UPDATE results SET used = ? WHERE key = ?', (time.time_ns(), signed_key(key)))
+        return row[0], row[1], row[2]
+
+    def store(self, key: int, depth: int, score: float, best_move: int) -> None:
+        """Store the result of a search of the position with the Zobrist key, unless a deeper one is cached."""
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')  # Other processes can't write between the check and the insert
+            if self.connection.execute('SELECT 1 FROM results WHERE key = ?', (signed_key(key),)).fetchone() is None:
+                self.entry_count += 1
+            self.connection.execute('INSERT INTO results VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                                    'depth = excluded.depth, score = excluded.score, best_move = excluded.best_move, '
+                                    'used = excluded.used WHERE excluded.depth >= results.depth',
+                                    (signed_key(key), depth, score, best_move, time.time_ns()))
+            if self.entry_count > self.max_entries:
+                # Evict a batch at once, so the table is only counted (a full scan) every EVICTION_BATCH stores
+                self.entry_count = self.usage()
+                excess: int = self.entry_count - self.max_entries
+                if excess > 0:
+                    removed: int = excess + min(EVICTION_BATCH, self.max_entries // 16)
+                    self.connection.execute('DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)',
+                                            (removed,))
+                    self.entry_count = max(0, self.entry_count - removed)
+
+    def usage(self) -> int:
+        """Return the number of cached entries, counted in the file."""
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
@@ -0,0 +1,93 @@
+# Probing of Syzygy endgame tablebases, read from a local directory of .rtbw (WDL) and .rtbz (DTZ) files.
+# The tables are decoded by python-chess ("pip install chess"), an optional dependency: without it
+# no tablebase can be opened and the engine searches every position.
+# The directory can hold any subset of the tables, positions of missing tables are searched. The "syzygy"
+# directory of the project holds the three-piece KQvK, KRvK and KPvK tables, used by the tests.
+# This project doesn't generate Syzygy files, the tables of endgame.py have their own format and are probed separately.
+
+from typing import Optional, Tuple, List
+from bitboard import popcount, move_start, is_capture
+from board import ChessBoard, FIFTY_MOVE_PLIES
+
+try:
+    import chess
+    import chess.syzygy
+except ImportError:
+    chess = None
+
+# Win/draw/loss values of a position for the side to move. A cursed win or a blessed loss
+# is a win or a loss that the fifty-move rule turns into a draw.
+WIN, CURSED_WIN, DRAW, BLESSED_LOSS, LOSS = 2, 1, 0, -1, -2
+
+DEFAULT_MAX_PIECES = 5  # Positions with more pieces (kings included) are never probed
+
+
+class SyzygyTablebase:
+    """Syzygy tables of a local directory, probed for positions with few pieces and no castling rights."""
+
+    def __init__(self, path: str, max_pieces: int = DEFAULT_MAX_PIECES) -> None:
+        if chess is None:
+            raise ImportError("Probing Syzygy tablebases needs python-chess (pip install chess).")
+        self.path = path  # Directory of the table files
+        self.tablebase = chess.syzygy.open_tablebase(path)
+
+        # Table names like "KQvK" count the pieces of both sides, so the largest table bounds the probes
+        largest: int = max((len(name) - 1 for name in self.tablebase.wdl), default=0)
+        self.max_pieces = min(max_pieces, largest)  # Positions with more pieces are never probed
+
+    def close(self) -> None:
+        """Close the table files."""
+        self.tablebase.close()
+
+    def can_probe(self, board: ChessBoard) -> bool:
+        """Check if the position has few enough pieces for the tables and no castling rights."""
+        return popcount(board.occupied) <= self.max_pieces and not any(board.castling_rights.values())
+
+    def probe_wdl(self, board: ChessBoard) -> Optional[int]:
+        """Return the win/draw/loss value of the position for the side to move (WIN, CURSED_WIN, DRAW,
+        BLESSED_LOSS or LOSS), or None if it isn't in the tables."""
+        if not self.can_probe(board):
+            return None
+        try:
+            return self.tablebase.probe_wdl(chess.Board(board.to_fen()))
+        except KeyError:
+            return None  # The table of the material is missing
+
+    def probe_dtz(self, board: ChessBoard) -> Optional[int]:
+        """Return the distance to zeroing (plies to the next capture or pawn move of the winning line, negative when
+        the side to move loses, 0 for a draw) of the position, or None if it isn't in the tables."""
+        if not self.can_probe(board):
+            return None
+        try:
+            return self.tablebase.probe_dtz(chess.Board(board.to_fen()))
+        except KeyError:
+            return None
+
+    def probe_root(self, board: ChessBoard, moves: List[int]) -> Optional[Tuple[int, int]]:
+        """Choose the best of the legal moves with the DTZ tables and return it with the win/draw/loss value of the
+        position, or None if a move can't be probed. A checkmate comes first, then a winning move reaches the
+        next zeroing move (capture or pawn move) as fast as possible, a zeroing move itself being the fastest,
+        and a losing move delays it as long as possible, so the fifty-move rule is respected. A win or a loss whose
+        zeroing move comes after the halfmove clock reaches FIFTY_MOVE_PLIES is a draw."""
+        if not self.can_probe(board):
+            return None
+        best: Optional[Tuple[Tuple[int, bool, int], int]] = None
+        for move in moves:
+            zeroing: bool = is_capture(move) or board.squares[move_start(move)].piece_type == 'pawn'
+            board.make_compact_move(move)
+            mate: bool = board.is_in_check(board.turn) and not board.generate_moves(board.turn)
+            wdl: Optional[int] = LOSS if mate else self.probe_wdl(board)
+            dtz: Optional[int] = 0 if mate or zeroing else self.probe_dtz(board)
+            board.unmake_move()
+            if wdl is None or dtz is None:
+                return None
+
+            # The values are those of the opponent after the move, the distance counts from this position
+            value: int = -wdl
+            distance: int = 1 if zeroing or mate else abs(dtz) + 1
+            if board.halfmove_clock + distance > FIFTY_MOVE_PLIES:
+                value = DRAW
+            rank: Tuple[int, bool, int] = (value, mate, -distance if value > 0 else distance if value < 0 else 0)
+            if best is None or rank > best[0]:
+                best = (rank, move)
+        return (best[1], best[0][0]) if best else None
@@ -0,0 +1,42 @@
+# Tests of the move generator: perft node counts of the standard positions and the board left unchanged.
+# Run with "python3 -m unittest" or "python3 -m pytest".
+
+import unittest
+from board import ChessBoard
+from benchmark import PERFT_POSITIONS
+
+PERFT_DEPTH = 3  # Deepest perft of the tests, about 270000 nodes over all the positions
+
+
+class PerftTest(unittest.TestCase):
+    def test_perft_counts(self):
+        for name, fen, expected_counts in PERFT_POSITIONS:
+            board = ChessBoard()
+            board.from_fen(fen)
+            for depth in range(1, PERFT_DEPTH + 1):
+                with self.subTest(position=name, depth=depth):
+                    self.assertEqual(board.perft(depth), expected_counts[depth - 1])
+
+    def test_divide_adds_up_to_perft(self):
+        for name, fen, expected_counts in PERFT_POSITIONS:
+            board = ChessBoard()
+            board.from_fen(fen)
+            with self.subTest(position=name):
+                counts = board.divide(2)
+                self.assertEqual(len(counts), expected_counts[0])
+                self.assertEqual(sum(counts.values()), expected_counts[1])
+
+    def test_moves_are_taken_back(self):
+        for name, fen, _ in PERFT_POSITIONS:
+            board = ChessBoard()
+            board.from_fen(fen)
+            key = board.zobrist_key
+            board.perft(PERFT_DEPTH)
+            with self.subTest(position=name):
+                self.assertEqual(board.to_fen(), fen)
+                self.assertEqual(board.zobrist_key, key)
+                self.assertEqual(board.undo_stack, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
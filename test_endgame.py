@@ -0,0 +1,48 @@
+# Tests of the endgame table generator on the KRK table (a few seconds to generate) and of its probes.
+# Run with "python3 -m unittest" or "python3 -m pytest".
+
+import os
+import tempfile
+import unittest
+from board import ChessBoard
+from endgame import EndgameTables, generate_endgame_tables
+
+
+def board_from_fen(fen: str) -> ChessBoard:
+    board = ChessBoard()
+    board.from_fen(fen)
+    return board
+
+
+class EndgameTablesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, 'endgame.bin')
+        generate_endgame_tables(['KRK'], path)
+        cls.tables = EndgameTables(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tables.close()
+        cls.directory.cleanup()
+
+    def test_mate_in_one(self):
+        self.assertEqual(self.tables.probe(board_from_fen("7k/8/6K1/8/8/8/8/R7 w - - 0 1")), (1, 1, True))
+
+    def test_mated_side_to_move(self):
+        self.assertEqual(self.tables.probe(board_from_fen("7k/8/6K1/8/8/8/8/R7 b - - 0 1")), (-1, 2, True))
+
+    def test_black_as_the_stronger_side(self):
+        self.assertEqual(self.tables.probe(board_from_fen("r7/8/8/8/8/6k1/8/7K b - - 0 1")), (1, 1, True))
+
+    def test_rook_taken_is_a_draw(self):
+        self.assertEqual(self.tables.probe(board_from_fen("8/8/8/8/8/8/6kR/K7 b - - 0 1")), (0, 0, True))
+
+    def test_positions_outside_the_tables(self):
+        self.assertIsNone(self.tables.probe(board_from_fen("8/8/4k3/8/8/8/8/KQ6 w - - 0 1")))  # KQK isn't generated
+        self.assertIsNone(self.tables.probe(board_from_fen("8/8/8/8/8/8/8/R3K2k w Q - 0 1")))  # Castling rights
+
+
+if __name__ == '__main__':
+    unittest.main()
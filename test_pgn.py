@@ -0,0 +1,84 @@
+# Tests of the PGN reader and writer: SAN parsing and a parse/format round trip.
+# Run with "python3 -m unittest" or "python3 -m pytest".
+
+import io
+import unittest
+from board import ChessBoard
+from bitboard import move_to_uci
+from pgn import parse_game, parse_san, read_games, format_game, move_to_san, START_FEN
+
+# En passant (3. exf6), a capture promoting to a knight (5. gxh8=N), both castlings and a move
+# that needs the file of its knight (10. Nbd2), with a comment, a variation and an annotation to skip
+GAME = """[Event "Test"]
+[Site "?"]
+[Date "2026.10.17"]
+[Round "1"]
+[White "White"]
+[Black "Black"]
+[Result "*"]
+
+1. e4 d5 2. e5 f5 3. exf6 {en passant} Nc6 4. fxg7 Bf5 5. gxh8=N Qd7 6. Nf3 O-O-O
+7. Be2 (7. Bb5 a6) e5 8. O-O Nge7 9. d3 h5 10. Nbd2 $1 Bg4 11. Ng6 Nxg6 12. h3 Bxf3
+13. Nxf3 Qxh3 14. gxh3 Nf4 15. Bxf4 exf4 *
+"""
+FINAL_FEN = "2kr1b2/ppp5/2n5/3p3p/5p2/3P1N1P/PPP1BP2/R2Q1RK1 w - - 0 16"
+
+
+class PgnTest(unittest.TestCase):
+    def test_parse_game(self):
+        headers, moves = parse_game(GAME)
+        self.assertEqual(headers['Event'], "Test")
+        self.assertEqual(len(moves), 30)
+        self.assertEqual(moves[:5], ['e4', 'd5', 'e5', 'f5', 'exf6'])
+        self.assertNotIn('Bb5', moves)
+
+    def test_read_games(self):
+        games = list(read_games(io.StringIO(GAME + "\n" + GAME)))
+        self.assertEqual(len(games), 2)
+        headers, moves = games[0]
+        self.assertEqual(len(moves), 30)
+        self.assertEqual(move_to_uci(moves[8]), 'g7h8n')
+
+        board = ChessBoard()
+        board.from_fen(START_FEN)
+        for move in moves:
+            board.make_compact_move(move)
+        self.assertEqual(board.to_fen(), FINAL_FEN)
+
+    def test_round_trip(self):
+        headers, moves = next(read_games(io.StringIO(GAME)))
+        text = format_game(headers, moves)
+        self.assertIn("1. e4 d5 2. e5 f5 3. exf6 Nc6", text)
+        self.assertIn("5. gxh8=N", text)
+        self.assertIn("10. Nbd2", text)
+
+        headers_again, moves_again = next(read_games(io.StringIO(text)))
+        self.assertEqual(headers_again, headers)
+        self.assertEqual(moves_again, moves)
+        self.assertEqual(format_game(headers_again, moves_again), text)
+
+    def test_check_and_checkmate_suffixes(self):
+        headers, moves = next(read_games(io.StringIO('[Result "0-1"]\n\n1. f3 e5 2. g4 Qh4# 0-1\n')))
+        board = ChessBoard()
+        board.from_fen(START_FEN)
+        sans = []
+        for move in moves:
+            sans.append(move_to_san(board, move))
+            board.make_compact_move(move)
+        self.assertEqual(sans, ['f3', 'e5', 'g4', 'Qh4#'])
+
+    def test_capture_marker_must_match(self):
+        board = ChessBoard()
+        board.from_fen(START_FEN)
+        self.assertEqual(move_to_uci(parse_san(board, 'Nf3')), 'g1f3')
+        self.assertRaises(ValueError, parse_san, board, 'Nxf3')
+        self.assertRaises(ValueError, parse_san, board, 'exd3')
+
+        board.from_fen("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+        self.assertEqual(move_to_uci(parse_san(board, 'exd5')), 'e4d5')
+        self.assertRaises(ValueError, parse_san, board, 'd5')
+        self.assertRaises(ValueError, parse_san, board, 'ed5')
+
+
+if __name__ == '__main__':
+    unittest.main()
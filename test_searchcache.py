@@ -0,0 +1,53 @@
+# Tests of the persistent search cache: storing, probing and evicting the least recently used entries.
+# Run with "python3 -m unittest" or "python3 -m pytest".
+
+import os
+import tempfile
+import unittest
+from searchcache import SearchCache
+
+
+class SearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite')
+        self.cache = SearchCache(self.path, max_entries=16)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_store_and_probe(self):
+        key = 0xF000000000000001  # Above the signed 64-bit range of SQLite
+        self.assertIsNone(self.cache.probe(key))
+        self.cache.store(key, 4, 0.25, 796)
+        self.assertEqual(self.cache.probe(key), (4, 0.25, 796))
+
+    def test_deeper_result_is_kept(self):
+        self.cache.store(1, 6, 1.5, 100)
+        self.cache.store(1, 3, -2.0, 200)
+        self.assertEqual(self.cache.probe(1), (6, 1.5, 100))
+        self.cache.store(1, 7, 0.5, 300)
+        self.assertEqual(self.cache.probe(1), (7, 0.5, 300))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in range(16):
+            self.cache.store(key, 1, 0.0, key)
+        self.cache.probe(0)  # Used again, so key 1 is now the least recently used
+
+        self.cache.store(16, 1, 0.0, 16)
+        self.assertLessEqual(self.cache.usage(), 16)
+        self.assertIsNotNone(self.cache.probe(0))
+        self.assertIsNone(self.cache.probe(1))
+        self.assertIsNotNone(self.cache.probe(16))
+
+    def test_entries_persist(self):
+        self.cache.store(5, 2, 0.75, 42)
+        self.cache.close()
+        self.cache = SearchCache(self.path, max_entries=16)
+        self.assertEqual(self.cache.usage(), 1)
+        self.assertEqual(self.cache.probe(5), (2, 0.75, 42))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# Tests of the Syzygy probing against the small table set of the "syzygy" directory (KQvK, KRvK and KPvK).
+# They need python-chess and are skipped without it. Run with "python3 -m unittest" or "python3 -m pytest".
+
+import os
+import unittest
+from board import ChessBoard
+from bitboard import move_to_uci
+import tablebase
+from tablebase import SyzygyTablebase, WIN, DRAW, LOSS
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'syzygy')
+
+
+def board_from_fen(fen: str) -> ChessBoard:
+    board = ChessBoard()
+    board.from_fen(fen)
+    return board
+
+
+@unittest.skipIf(tablebase.chess is None, "python-chess isn't installed")
+class SyzygyTablebaseTest(unittest.TestCase):
+    def setUp(self):
+        self.tablebase = SyzygyTablebase(TABLE_PATH)
+
+    def tearDown(self):
+        self.tablebase.close()
+
+    def test_max_pieces(self):
+        self.assertEqual(self.tablebase.max_pieces, 3)
+
+    def test_probe_wdl(self):
+        self.assertEqual(self.tablebase.probe_wdl(board_from_fen("7k/8/6K1/8/8/8/8/R7 w - - 0 1")), WIN)
+        self.assertEqual(self.tablebase.probe_wdl(board_from_fen("K7/8/1k6/8/8/8/8/7r w - - 0 1")), LOSS)
+        self.assertEqual(self.tablebase.probe_wdl(board_from_fen("4k3/4P3/4K3/8/8/8/8/8 b - - 0 1")), DRAW)
+
+    def test_probe_dtz(self):
+        self.assertEqual(self.tablebase.probe_dtz(board_from_fen("7k/8/6K1/8/8/8/8/R7 w - - 0 1")), 1)
+        self.assertEqual(self.tablebase.probe_dtz(board_from_fen("K7/8/1k6/8/8/8/8/7r w - - 0 1")), -2)
+        self.assertEqual(self.tablebase.probe_dtz(board_from_fen("4k3/8/8/8/8/8/4P3/4K3 w - - 0 1")), 9)
+
+    def test_positions_outside_the_tables(self):
+        self.assertIsNone(self.tablebase.probe_wdl(board_from_fen("4k3/8/8/8/8/8/8/2B1K3 w - - 0 1")))  # No KBvK table
+        self.assertIsNone(self.tablebase.probe_wdl(board_from_fen("4k3/8/8/8/8/8/8/3QK2r w - - 0 1")))  # Four pieces
+        self.assertIsNone(self.tablebase.probe_dtz(board_from_fen("4k3/8/8/8/8/8/8/4K2R w K - 0 1")))  # Castling rights
+
+    def test_probe_root(self):
+        board = board_from_fen("7k/8/6K1/8/8/8/8/R7 w - - 0 1")
+        move, value = self.tablebase.probe_root(board, list(board.generate_moves(board.turn)))
+        self.assertEqual((move_to_uci(move), value), ('a1a8', WIN))  # The checkmate
+
+        board = board_from_fen("4k3/8/8/8/8/8/4P3/4K3 w - - 0 1")
+        move, value = self.tablebase.probe_root(board, list(board.generate_moves(board.turn)))
+        self.assertEqual((move_to_uci(move), value), ('e1d2', WIN))
+        self.assertEqual(board.to_fen(), "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1")
+
+    def test_probe_root_fifty_move_rule(self):
+        # The win needs king moves before the next pawn move, which the fifty-move rule doesn't leave time for
+        board = board_from_fen("4k3/8/8/8/8/8/4P3/4K3 w - - 98 1")
+        _, value = self.tablebase.probe_root(board, list(board.generate_moves(board.turn)))
+        self.assertEqual(value, DRAW)
+
+        # A checkmate ends the game before the rule applies
+        board = board_from_fen("7k/8/6K1/8/8/8/8/R7 w - - 99 1")
+        move, value = self.tablebase.probe_root(board, list(board.generate_moves(board.turn)))
+        self.assertEqual((move_to_uci(move), value), ('a1a8', WIN))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# Tests of the UCI front end: the position, setoption and go commands.
+# Run with "python3 -m unittest" or "python3 -m pytest".
+
+import unittest
+from uci import UCIEngine
+
+
+class UCIEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.uci = UCIEngine()
+        self.output = []
+        self.uci.send = self.output.append  # Keep the lines sent to the GUI
+
+    def tearDown(self):
+        self.uci.handle_command("quit")
+        self.uci.stop_search()
+        self.uci.engine.close()
+
+    def test_position_startpos_moves(self):
+        self.uci.handle_command("position startpos moves e2e4 e7e5 g1f3")
+        self.assertEqual(self.uci.board.to_fen(), "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2")
+
+    def test_position_fen_with_promotion(self):
+        self.uci.handle_command("position fen 4k3/P7/8/8/8/8/8/4K3 w - - 0 1 moves a7a8n")
+        self.assertEqual(self.uci.board.to_fen(), "N3k3/8/8/8/8/8/8/4K3 b - - 0 1")
+
+    def test_illegal_move_stops_the_moves(self):
+        self.uci.handle_command("position startpos moves e2e4 e2e4 e7e5")
+        self.assertEqual(self.output, ["info string illegal move e2e4"])
+        self.assertEqual(self.uci.board.to_fen(), "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+
+    def test_setoption(self):
+        self.uci.handle_command("setoption name Book value false")
+        self.uci.handle_command("setoption name NullMove value false")
+        self.uci.handle_command("setoption name Hash value many")
+        self.assertFalse(self.uci.use_book)
+        self.assertFalse(self.uci.engine.null_move_enabled)
+        self.assertEqual(self.output, ["info string invalid value many for option hash"])
+
+    def test_time_limits(self):
+        self.uci.handle_command("position startpos moves e2e4")
+        self.assertIsNone(self.uci.create_time_manager({"depth": 3}))
+        self.assertIsNotNone(self.uci.create_time_manager({"movetime": 100}))
+        self.assertIsNone(self.uci.create_time_manager({"wtime": 1000}))  # Black to move
+        self.assertIsNotNone(self.uci.create_time_manager({"btime": 1000, "binc": 10}))
+
+    def test_go_depth(self):
+        self.uci.handle_command("setoption name Book value false")
+        self.uci.handle_command("position fen 7k/8/6K1/8/8/8/8/R7 w - - 0 1")
+        self.uci.handle_command("go depth 2")
+        self.uci.search_thread.join()
+        self.assertEqual(self.output[-1], "bestmove a1a8")
+        self.assertTrue(any(line.startswith("info depth 1 score mate 1") for line in self.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# Contains the time management of the engine's searches.
+
+import time
+from typing import Optional
+
+MOVE_OVERHEAD = 0.05  # Seconds kept aside for the communication with the GUI
+DEFAULT_MOVES_TO_GO = 30  # Number of moves the remaining clock time is spread over when it isn't known
+
+
+class TimeManager:
+    """Turns a time budget into two deadlines for an iterative deepening search.
+    soft_deadline: no new iteration is started after it, because it would most likely not finish in time.
+    hard_deadline: the running iteration is aborted and the move of the last completed depth is played."""
+
+    def __init__(self, movetime: Optional[float] = None, time_left: Optional[float] = None, increment: float = 0.0,
+                 moves_to_go: Optional[int] = None, overhead: float = MOVE_OVERHEAD) -> None:
+        """movetime: exact number of seconds for the move.
+        time_left, increment, moves_to_go: the remaining clock time and increment in seconds and the number
+        of moves until the next time control, used when there is no movetime."""
+        self.start_time: float = time.perf_counter()
+
+        if movetime is not None:
+            hard_limit: float = max(0.01, movetime - overhead)
+            soft_limit: float = hard_limit * 0.6
+        elif time_left is not None:
+            available: float = max(0.01, time_left - overhead)
+            soft_limit: float = min(available / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * 0.8, available)
+            hard_limit: float = min(soft_limit * 3, available * 0.5 if available > soft_limit * 2 else available)
+            hard_limit = max(hard_limit, soft_limit)
+        else:
+            raise ValueError("TimeManager needs a movetime or the remaining clock time.")
+
+        self.soft_deadline: float = self.start_time + soft_limit
+        self.hard_deadline: float = self.start_time + hard_limit
+
+    def elapsed(self) -> float:
+        """Seconds since the search started."""
+        return time.perf_counter() - self.start_time
+
+    def soft_limit_reached(self) -> bool:
+        """Check if there is no time left to start a new iteration."""
+        return time.perf_counter() >= self.soft_deadline
+
+    def hard_limit_reached(self) -> bool:
+        """Check if the search must be aborted."""
+        return time.perf_counter() >= self.hard_deadline
@@ -0,0 +1,174 @@
+# Contains the transposition table used by the engine to reuse the results of positions it has already searched.
+
+import struct
+from multiprocessing import shared_memory
+from typing import Optional, Tuple, Any
+
+# Bound types of a stored score
+EXACT = 0  # The score is the exact value of the position
+LOWER_BOUND = 1  # The search failed high, the value of the position is at least the score
+UPPER_BOUND = 2  # The search failed low, the value of the position is at most the score
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed by the Zobrist hash of the position.
+    Every bucket has two slots: a depth-preferred slot that keeps the deepest search and
+    an always-replace slot that keeps the most recent one."""
+
+    ENTRY_SIZE = 96  # Approximate memory used by one entry in bytes (the tuple and its values)
+
+    def __init__(self, size_mb: int = 16) -> None:
+        """Allocate the table with a memory budget in MB."""
+        self.resize(size_mb)
+
+    def resize(self, size_mb: int) -> None:
+        """Reallocate the table with a new memory budget in MB. All entries are lost."""
+        if (not isinstance(size_mb, int) or size_mb < 1):
+            raise ValueError("Transposition table size must be a positive number of MB.")
+        self.size_mb = size_mb
+        self.bucket_count: int = max(1, size_mb * 1024 * 1024 // (2 * self.ENTRY_SIZE))
+        self.clear()
+
+    def clear(self) -> None:
+        """Remove every entry from the table."""
+        self.depth_slots: list[Optional[Tuple]] = [None] * self.bucket_count
+        self.recent_slots: list[Optional[Tuple]] = [None] * self.bucket_count
+
+    def probe(self, key: int) -> Optional[Tuple[int, float, int, Any]]:
+        """Return the (depth, score, bound, best_move) stored for the position, or None if it isn't in the table."""
+        index: int = key % self.bucket_count
+        entry = self.depth_slots[index]
+        if entry and entry[0] == key:
+            return entry[1:]
+        entry = self.recent_slots[index]
+        if entry and entry[0] == key:
+            return entry[1:]
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: Any) -> None:
+        """Store the result of a search. The depth-preferred slot is replaced only by an equal or deeper
+        search of any position, otherwise the entry goes to the always-replace slot."""
+        index: int = key % self.bucket_count
+        entry = (key, depth, score, bound, best_move)
+        deepest = self.depth_slots[index]
+        if deepest is None or depth >= deepest[1] or deepest[0] == key:
+            self.depth_slots[index] = entry
+        else:
+            self.recent_slots[index] = entry
+
+    def usage(self) -> int:
+        """Return the permille of the depth-preferred slots that are in use (hashfull)."""
+        sample: int = min(1000, self.bucket_count)
+        return sum(1 for entry in self.depth_slots[:sample] if entry) * 1000 // sample
+
+
+NO_MOVE = 0xFFFF  # Move field of an entry without a best move
+
+
+class SharedTranspositionTable:
+    """Transposition table in shared memory so that the processes of a parallel search fill and
+    read the same table. It has the same interface and replacement scheme as TranspositionTable.
+    Every slot holds three 64-bit words: the key XOR the two data words, the score and the
+    depth/bound/move. Slots are written without a lock; a slot that was torn by two processes
+    writing at the same time doesn't give back its key, so it is ignored by probe()."""
+
+    ENTRY_SIZE = 24  # Bytes used by one slot
+
+    def __init__(self, size_mb: int = 16, name: Optional[str] = None, bucket_count: Optional[int] = None) -> None:
+        """Allocate the table with a memory budget in MB, or attach to the table of another
+        process when the name and bucket_count of its shared memory block are given."""
+        self.shared_memory: Optional[shared_memory.SharedMemory] = None
+        self.owner = name is None  # Only the process that created the block frees it
+        if name is None:
+            self.resize(size_mb)
+        else:
+            self.size_mb = size_mb
+            self.bucket_count = bucket_count
+            self.attach(shared_memory.SharedMemory(name=name))
+
+    def attach(self, block: 'shared_memory.SharedMemory') -> None:
+        """Use a shared memory block as the storage of the table."""
+        self.shared_memory = block
+        self.words = block.buf.cast('Q')  # Three words per slot, the depth-preferred slot comes first
+
+    def resize(self, size_mb: int) -> None:
+        """Reallocate the table with a new memory budget in MB. All entries are lost."""
+        if (not isinstance(size_mb, int) or size_mb < 1):
+            raise ValueError("Transposition table size must be a positive number of MB.")
+        self.close()
+        self.owner = True
+        self.size_mb = size_mb
+        self.bucket_count: int = max(1, size_mb * 1024 * 1024 // (2 * self.ENTRY_SIZE))
+        self.attach(shared_memory.SharedMemory(create=True, size=self.bucket_count * 2 * self.ENTRY_SIZE))
+        self.clear()
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block, used by the other processes to attach to the table."""
+        return self.shared_memory.name
+
+    def clear(self) -> None:
+        """Remove every entry from the table."""
+        self.shared_memory.buf[:] = bytes(len(self.shared_memory.buf))
+
+    def close(self) -> None:
+        """Detach from the shared memory block and free it if this process created it."""
+        if self.shared_memory is None:
+            return
+        self.words.release()
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+        self.shared_memory = None
+
+    def read_slot(self, offset: int, key: int) -> Optional[Tuple[int, float, int, Any]]:
+        """Decode the slot starting at a word offset if it holds the key."""
+        words = self.words
+        score_word: int = words[offset + 1]
+        data: int = words[offset + 2]
+        if not data or words[offset] ^ score_word ^ data != key:
+            return None
+        move: int = data & 0xFFFF
+        return ((data >> 24) - 1, unpack_score(score_word), (data >> 16) & 0xFF, None if move == NO_MOVE else move)
+
+    def probe(self, key: int) -> Optional[Tuple[int, float, int, Any]]:
+        """Return the (depth, score, bound, best_move) stored for the position, or None if it isn't in the table."""
+        offset: int = (key % self.bucket_count) * 6
+        return self.read_slot(offset, key) or self.read_slot(offset + 3, key)
+
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: Optional[int]) -> None:
+        """Store the result of a search. The depth-preferred slot is replaced only by an equal or deeper
+        search of any position, otherwise the entry goes to the always-replace slot.
+        best_move: compact move (see bitboard.encode_move()) or None."""
+        words = self.words
+        offset: int = (key % self.bucket_count) * 6
+        move: int = NO_MOVE if best_move is None else best_move
+        # The depth is stored plus one so that a used slot never has a zero data word
+        data: int = (depth + 1) << 24 | bound << 16 | move
+        score_word: int = pack_score(score)
+
+        deepest_data: int = words[offset + 2]
+        deepest_key: int = words[offset] ^ words[offset + 1] ^ deepest_data
+        if not deepest_data or depth >= (deepest_data >> 24) - 1 or deepest_key == key:
+            words[offset + 1] = score_word
+            words[offset + 2] = data
+            words[offset] = key ^ score_word ^ data
+        else:
+            words[offset + 4] = score_word
+            words[offset + 5] = data
+            words[offset + 3] = key ^ score_word ^ data
+
+    def usage(self) -> int:
+        """Return the permille of the depth-preferred slots that are in use (hashfull)."""
+        sample: int = min(1000, self.bucket_count)
+        return sum(1 for bucket in range(sample) if self.words[bucket * 6 + 2]) * 1000 // sample
+
+
+def pack_score(score: float) -> int:
+    """Return the bits of a score as a 64-bit word."""
+    return int.from_bytes(struct.pack('<d', score), 'little')
+
+
+def unpack_score(word: int) -> float:
+    """Return the score stored in a 64-bit word."""
+    return struct.unpack('<d', word.to_bytes(8, 'little'))[0]
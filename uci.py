@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+# UCI (Universal Chess Interface) front end of the engine, so it can be driven by chess GUIs and tournament managers.
+# Run "python3 uci.py" and talk to it through stdin/stdout.
+
+import sys
+import threading
+from typing import Optional, Dict, Tuple, List
+from board import ChessBoard
+from evaluate import ChessEngine, MAX_DEPTH
+from timecontrol import TimeManager
+from utils import parse_position
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+PROMOTIONS = {'q': 'queen', 'r': 'rook', 'b': 'bishop', 'n': 'knight'}
+MAX_THREADS = 256  # Highest value of the Threads option
+
+
+class UCIEngine:
+    """Reads UCI commands and runs the searches of a ChessEngine on a worker thread
+    so that "stop" and "isready" are answered while the engine is thinking."""
+
+    def __init__(self) -> None:
+        self.engine = ChessEngine()
+        self.engine.info_callback = lambda info: self.send(f"info {info}")
+        self.board = ChessBoard()
+        self.use_book = True
+        self.search_thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()  # Set when the GUI sends "stop", releases infinite searches
+        self.output_lock = threading.Lock()
+
+    def send(self, message: str) -> None:
+        """Write a line to the GUI."""
+        with self.output_lock:
+            sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+
+    def run(self) -> None:
+        """Process commands until "quit" or the end of the input."""
+        for line in sys.stdin:
+            if not self.handle_command(line.strip()):
+                break
+        self.stop_search()
+        self.engine.close()
+
+    def handle_command(self, line: str) -> bool:
+        """Process a single command. Returns False when the engine must quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+
+        if command == "uci":
+            self.send("id name Chess Engine")
+            self.send("id author Thanos-png")
+            self.send(f"option name Hash type spin default {self.engine.transposition_table.size_mb} min 1 max 4096")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name RootSplit type check default false")
+            self.send("option name Book type check default true")
+            self.send("option name PVS type check default true")
+            self.send("option name NullMove type check default true")
+            self.send("option name LMR type check default true")
+            self.send("option name SyzygyPath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(tokens[1:])
+        elif command == "ucinewgame":
+            self.stop_search()
+            self.engine.transposition_table.clear()
+            self.board = ChessBoard()
+        elif command == "position":
+            self.stop_search()
+            self.set_position(tokens[1:])
+        elif command == "go":
+            self.stop_search()
+            self.start_search(tokens[1:])
+        elif command == "stop":
+            self.stop_search()
+        elif command == "quit":
+            return False
+        return True
+
+    def set_option(self, tokens: List[str]) -> None:
+        """Handle "setoption name <name> value <value>"."""
+        if "name" not in tokens:
+            return
+        value_index: int = tokens.index("value") if "value" in tokens else len(tokens)
+        name: str = ' '.join(tokens[tokens.index("name") + 1:value_index]).lower()
+        value: str = ' '.join(tokens[value_index + 1:])
+
+        try:
+            if name == "hash":
+                self.stop_search()
+                self.engine.set_hash_size(int(value))
+            elif name == "threads":
+                self.stop_search()
+                self.engine.set_threads(min(int(value), MAX_THREADS))
+            elif name == "rootsplit":
+                self.stop_search()
+                self.engine.set_threads(self.engine.threads, value.lower() == "true")
+            elif name == "book":
+                self.use_book = value.lower() == "true"
+            elif name == "pvs":
+                self.stop_search()
+                self.engine.pvs_enabled = value.lower() == "true"
+            elif name == "nullmove":
+                self.stop_search()
+                self.engine.null_move_enabled = value.lower() == "true"
+            elif name == "lmr":
+                self.stop_search()
+                self.engine.lmr_enabled = value.lower() == "true"
+            elif name == "syzygypath":
+                self.stop_search()
+                self.engine.set_tablebase_path(value if value and value != "<empty>" else None)
+            else:
+                self.send(f"info string unknown option {name}")
+        except ValueError:
+            self.send(f"info string invalid value {value} for option {name}")
+        except (ImportError, OSError) as error:
+            self.send(f"info string can't set option {name}: {error}")
+
+    def set_position(self, tokens: List[str]) -> None:
+        """Handle "position startpos|fen <fen> [moves <move> ...]"."""
+        moves_index: int = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board = ChessBoard()
+        if tokens and tokens[0] == "fen":
+            board.from_fen(' '.join(tokens[1:moves_index]))
+        else:
+            board.from_fen(START_FEN)
+        board.record_position()
+
+        for uci_move in tokens[moves_index + 1:]:
+            if not self.play_uci_move(board, uci_move):
+                self.send(f"info string illegal move {uci_move}")
+                break
+        self.board = board
+
+    def play_uci_move(self, board: ChessBoard, uci_move: str) -> bool:
+        """Play a move in UCI "e2e4" or "e7e8q" format on the board and add it to the game history."""
+        try:
+            start: Tuple[int, int] = parse_position(uci_move[0:2])
+            end: Tuple[int, int] = parse_position(uci_move[2:4])
+        except (ValueError, IndexError):
+            return False
+        promotion: Optional[str] = PROMOTIONS.get(uci_move[4:5])
+        piece = board.board[start[0]][start[1]] if 0 <= start[0] <= 7 and 0 <= start[1] <= 7 else None
+
+        if not board.move_piece(start, end, board.turn, False, True, promotion):
+            return False
+        turn: str = board.updateTurn()
+        board.updateEnPassantSquare(turn, (start, end, piece))
+        board.record_position()
+        return True
+
+    def start_search(self, tokens: List[str]) -> None:
+        """Handle "go" with depth, movetime, wtime, btime, winc, binc, nodes and infinite."""
+        limits: Dict[str, int] = {}
+        infinite = False
+        for index, token in enumerate(tokens):
+            if token == "infinite":
+                infinite = True
+            elif token in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes") and index + 1 < len(tokens):
+                limits[token] = int(tokens[index + 1])
+
+        depth: int = limits.get("depth", MAX_DEPTH)
+        time_manager: Optional[TimeManager] = self.create_time_manager(limits)
+
+        self.engine.polyFlag = self.use_book
+        self.engine.stop_requested = False
+        self.stop_event.clear()
+        self.search_thread = threading.Thread(target=self.search, args=(self.board.clone(), depth, time_manager, limits.get("nodes"), infinite), daemon=True)
+        self.search_thread.start()
+
+    def create_time_manager(self, limits: Dict[str, int]) -> Optional[TimeManager]:
+        """Return the time budget of the search, or None if it isn't limited by time."""
+        if "movetime" in limits:
+            return TimeManager(movetime=limits["movetime"] / 1000)
+        clock_key, increment_key = ("wtime", "winc") if self.board.turn == 'white' else ("btime", "binc")
+        if clock_key in limits:
+            return TimeManager(time_left=limits[clock_key] / 1000, increment=limits.get(increment_key, 0) / 1000,
+                               moves_to_go=limits.get("movestogo"))
+        return None
+
+    def search(self, board: ChessBoard, depth: int, time_manager: Optional[TimeManager], node_limit: Optional[int], infinite: bool) -> None:
+        """Run the search on the worker thread and send the best move."""
+        move: Optional[str] = self.engine.find_best_move(board, depth, time_manager, node_limit)
+
+        # An infinite search only reports its move after the GUI sends "stop"
+        if infinite:
+            self.stop_event.wait()
+        self.send(f"bestmove {self.to_uci(move)}")
+
+    def stop_search(self) -> None:
+        """Stop the running search, if any, and wait for it to send its best move."""
+        if self.search_thread and self.search_thread.is_alive():
+            self.engine.stop_requested = True
+            self.stop_event.set()
+            self.search_thread.join()
+        self.search_thread = None
+
+    def to_uci(self, move: Optional[str]) -> str:
+        """Convert a move in "e2 e4" format to UCI "e2e4" format."""
+        return to_uci_move(move)
+
+
+def to_uci_move(move: Optional[str]) -> str:
+    """Convert a move in "e2 e4" or "e7 e8q" format to UCI "e2e4" format, "0000" if there is no move."""
+    if not move:
+        return "0000"
+    return move.replace(" ", "")
+
+
+def main():
+    UCIEngine().run()
+
+
+if __name__ == "__main__":
+    main()